@@ -142,16 +142,20 @@ class CustomLoginView(LoginView):
         response = super().form_valid(form)
 
         # Перенос корзины анонима в корзину пользователя
-        if session_key_before:
-            from cart.models import Cart
-            from cart.utils import get_or_create_cart, merge_carts
+        from cart.models import Cart
+        from cart.session import SESSION_CART_KEY
+        from cart.utils import get_or_create_cart, merge_carts
 
+        session_cart = None
+        if session_key_before:
             session_cart = Cart.objects.filter(
                 session_key=session_key_before,
                 user__isnull=True,
             ).first()
+        if session_cart or self.request.session.get(SESSION_CART_KEY):
+            # get_or_create_cart сам переносит корзину, хранившуюся в сессии
+            user_cart = get_or_create_cart(self.request)
             if session_cart:
-                user_cart = get_or_create_cart(self.request)
                 merge_carts(session_cart, user_cart)
 
         return response
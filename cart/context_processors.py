@@ -8,10 +8,10 @@ def cart(request):
     if not hasattr(request, "session"):
         return {"cart_count": 0}
 
-    from .utils import get_or_create_cart
+    from .utils import get_cart
 
     try:
-        cart_obj = get_or_create_cart(request)
+        cart_obj = get_cart(request)
         count = cart_obj.total_quantity
     except Exception:
         count = 0
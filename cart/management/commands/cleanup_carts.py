@@ -0,0 +1,156 @@
+"""
+Management-команда для удаления брошенных анонимных корзин и истёкших сессий.
+
+Анонимная корзина считается брошенной, если её сессии больше нет
+в django_session (или она истекла). Удаление идёт пакетами по диапазонам pk,
+каждый пакет — в отдельной короткой транзакции, чтобы не держать блокировки
+на cart_cartitem во время работы магазина.
+
+Запуск вместе с cleanup_unpaid_orders (контейнер cleanup-orders):
+  python manage.py cleanup_carts
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+
+DB_SESSION_ENGINES = (
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.backends.cached_db",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет анонимные корзины, сессии которых уже нет, "
+        "и истёкшие сессии. Работает пакетами по диапазонам pk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Ширина диапазона pk в одном пакете (по умолчанию 1000).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Пауза между пакетами в секундах.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать, что было бы удалено, не удалять.",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = max(options["batch_size"], 1)
+        self.pause = options["sleep"]
+        self.dry_run = options["dry_run"]
+        now = timezone.now()
+
+        carts, items, elapsed = self._run_batches(
+            Cart.objects.filter(self._abandoned_carts_q(now)),
+            self._delete_carts,
+        )
+        self._report("корзин", carts, elapsed, extra=f", позиций: {items}")
+
+        if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+            sessions, _, elapsed = self._run_batches(
+                Session.objects.filter(expire_date__lt=now),
+                self._delete_sessions,
+                pk_field="session_key",
+            )
+            self._report("сессий", sessions, elapsed)
+
+    def _abandoned_carts_q(self, now):
+        """Анонимные корзины без живой сессии."""
+        anonymous = Q(user__isnull=True)
+        if settings.SESSION_ENGINE not in DB_SESSION_ENGINES:
+            # Сессии не в БД — сверить нельзя, ориентируемся на возраст.
+            cutoff = now - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+            return anonymous & Q(updated_at__lt=cutoff)
+        live_session = Session.objects.filter(
+            session_key=OuterRef("session_key"), expire_date__gte=now
+        )
+        return anonymous & ~Exists(live_session)
+
+    def _run_batches(self, qs, delete, pk_field="pk"):
+        """
+        Проходит qs окнами [lo, lo + batch_size) по pk и удаляет найденное.
+        Для строковых ключей (сессии) окно — batch_size первых ключей.
+        Возвращает (удалено основных строк, удалено зависимых, секунды).
+        """
+        started = time.monotonic()
+        total = dependent = 0
+        if pk_field == "pk":
+            bounds = qs.aggregate(lo=Min("pk"), hi=Max("pk"))
+            lo, hi = bounds["lo"], bounds["hi"]
+            while lo is not None and lo <= hi:
+                ids = list(
+                    qs.filter(pk__gte=lo, pk__lt=lo + self.batch_size)
+                    .values_list("pk", flat=True)
+                )
+                lo += self.batch_size
+                if ids:
+                    rows, extra = delete(ids)
+                    total += rows
+                    dependent += extra
+                    self._pause()
+        else:
+            last = ""
+            while True:
+                keys = list(
+                    qs.filter(**{f"{pk_field}__gt": last})
+                    .order_by(pk_field)
+                    .values_list(pk_field, flat=True)[: self.batch_size]
+                )
+                if not keys:
+                    break
+                last = keys[-1]
+                rows, extra = delete(keys)
+                total += rows
+                dependent += extra
+                self._pause()
+        return total, dependent, time.monotonic() - started
+
+    def _pause(self):
+        if self.pause and not self.dry_run:
+            time.sleep(self.pause)
+
+    def _delete_carts(self, ids):
+        if self.dry_run:
+            items = CartItem.objects.filter(cart_id__in=ids).count()
+            return len(ids), items
+        with transaction.atomic():
+            _, per_model = Cart.objects.filter(pk__in=ids).delete()
+        return (
+            per_model.get(Cart._meta.label, 0),
+            per_model.get(CartItem._meta.label, 0),
+        )
+
+    def _delete_sessions(self, keys):
+        if self.dry_run:
+            return len(keys), 0
+        with transaction.atomic():
+            rows, _ = Session.objects.filter(session_key__in=keys).delete()
+        return rows, 0
+
+    def _report(self, what, count, elapsed, extra=""):
+        rate = count / elapsed if elapsed > 0 else 0
+        prefix = "Dry-run: к удалению" if self.dry_run else "Удалено"
+        message = (
+            f"{prefix} {what}: {count}{extra} "
+            f"за {elapsed:.2f} с ({rate:.0f} строк/с)"
+        )
+        style = self.style.WARNING if self.dry_run else self.style.SUCCESS
+        self.stdout.write(style(message))
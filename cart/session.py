@@ -0,0 +1,193 @@
+"""
+Корзина анонимного пользователя в сессии (без строк Cart/CartItem).
+
+Включается настройкой CART_ANONYMOUS_STORAGE = "session". В сессии хранится
+компактный словарь {"<variant_id>": quantity}; цены и активность вариантов
+берутся из кэша (снимки вариантов), поэтому счётчик в шапке и итоги не
+требуют запросов к БД. В строки БД корзина переносится при входе
+(merge_carts) — в том числе перед оформлением заказа.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+
+SESSION_CART_KEY = "cart"
+VARIANT_SNAPSHOT_KEY_PREFIX = "cart_variant_"
+VARIANT_SNAPSHOT_TIMEOUT = 300  # 5 минут
+
+
+def _snapshot_key(variant_id):
+    return f"{VARIANT_SNAPSHOT_KEY_PREFIX}{variant_id}"
+
+
+def get_variant_snapshots(variant_ids):
+    """
+    Возвращает {variant_id: {"price": Decimal, "active": bool}}.
+    Отсутствующие в кэше варианты читаются из БД одним запросом.
+    Несуществующие варианты в результат не попадают.
+    """
+    variant_ids = [int(v) for v in variant_ids]
+    if not variant_ids:
+        return {}
+    cached = cache.get_many([_snapshot_key(v) for v in variant_ids])
+    result = {}
+    missing = []
+    for variant_id in variant_ids:
+        snapshot = cached.get(_snapshot_key(variant_id))
+        if snapshot is None:
+            missing.append(variant_id)
+        else:
+            result[variant_id] = {
+                "price": Decimal(snapshot["price"]),
+                "active": snapshot["active"],
+            }
+    if missing:
+        from catalog.models import ProductVariant
+
+        fresh = {}
+        for variant in ProductVariant.objects.filter(
+            pk__in=missing
+        ).select_related("product"):
+            active = variant.is_active and variant.product.is_active
+            price = variant.discounted_price
+            fresh[_snapshot_key(variant.pk)] = {
+                "price": str(price),
+                "active": active,
+            }
+            result[variant.pk] = {"price": price, "active": active}
+        if fresh:
+            cache.set_many(fresh, VARIANT_SNAPSHOT_TIMEOUT)
+    return result
+
+
+def invalidate_variant_snapshots(variant_ids):
+    """Сбрасывает снимки вариантов после изменения цены или активности."""
+    keys = [_snapshot_key(v) for v in variant_ids]
+    if keys:
+        cache.delete_many(keys)
+
+
+class SessionCartItem:
+    """Позиция сессионной корзины; интерфейс совпадает с CartItem."""
+
+    def __init__(self, cart, variant, quantity):
+        self.cart = cart
+        self.variant = variant
+        self.variant_id = variant.pk
+        self.quantity = quantity
+
+    @property
+    def line_total(self):
+        """Сумма по позиции (цена со скидкой × количество)."""
+        return self.variant.discounted_price * self.quantity
+
+    def delete(self):
+        self.cart.remove(self.variant_id)
+
+
+class SessionCart:
+    """Корзина анонимного пользователя, хранящаяся в request.session."""
+
+    pk = None
+    user_id = None
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def lines(self):
+        """Позиции корзины: {variant_id: quantity} в порядке добавления."""
+        raw = self.session.get(SESSION_CART_KEY) or {}
+        return {int(k): int(v) for k, v in raw.items()}
+
+    def _save(self, lines):
+        if lines:
+            self.session[SESSION_CART_KEY] = {
+                str(k): v for k, v in lines.items()
+            }
+        else:
+            self.session.pop(SESSION_CART_KEY, None)
+        self.session.modified = True
+
+    def __bool__(self):
+        return bool(self.session.get(SESSION_CART_KEY))
+
+    def _active_lines(self):
+        lines = self.lines
+        snapshots = get_variant_snapshots(lines)
+        for variant_id, quantity in lines.items():
+            snapshot = snapshots.get(variant_id)
+            if snapshot and snapshot["active"]:
+                yield snapshot, quantity
+
+    @property
+    def total_quantity(self):
+        """Количество активных товаров (по кэшу снимков, без БД)."""
+        return sum(quantity for _, quantity in self._active_lines())
+
+    @property
+    def total_price(self):
+        """Сумма по активным позициям (по кэшу снимков, без БД)."""
+        total = Decimal("0")
+        for snapshot, quantity in self._active_lines():
+            total += snapshot["price"] * quantity
+        return total
+
+    def add(self, variant_id, quantity, max_quantity):
+        """Добавляет товар; возвращает итоговое количество позиции."""
+        lines = self.lines
+        lines[variant_id] = min(
+            lines.get(variant_id, 0) + quantity, max_quantity
+        )
+        self._save(lines)
+        return lines[variant_id]
+
+    def set_quantity(self, variant_id, quantity, max_quantity):
+        """Устанавливает количество; возвращает 0, если позиции нет."""
+        lines = self.lines
+        if variant_id not in lines:
+            return 0
+        if quantity < 1:
+            del lines[variant_id]
+        else:
+            lines[variant_id] = min(quantity, max_quantity)
+        self._save(lines)
+        return 1
+
+    def remove(self, variant_id):
+        """Удаляет позицию; возвращает 0, если позиции нет."""
+        lines = self.lines
+        if lines.pop(variant_id, None) is None:
+            return 0
+        self._save(lines)
+        return 1
+
+    def discard(self, variant_ids):
+        """Удаляет несколько позиций за одно сохранение сессии."""
+        variant_ids = set(variant_ids)
+        lines = self.lines
+        self._save({k: v for k, v in lines.items() if k not in variant_ids})
+
+    def clear(self):
+        self._save({})
+
+    def get_items(self):
+        """
+        Позиции с загруженными вариантами (product и фото), в порядке
+        добавления. Удалённые из каталога варианты выбрасываются из сессии.
+        """
+        from catalog.models import ProductVariant
+
+        lines = self.lines
+        if not lines:
+            return []
+        variants = ProductVariant.objects.select_related(
+            "product"
+        ).prefetch_related("images").in_bulk(list(lines))
+        if len(variants) != len(lines):
+            self._save({k: v for k, v in lines.items() if k in variants})
+        return [
+            SessionCartItem(self, variants[variant_id], quantity)
+            for variant_id, quantity in lines.items()
+            if variant_id in variants
+        ]
@@ -0,0 +1,24 @@
+"""
+Сигналы корзины: сброс кэшированных снимков вариантов при изменении каталога.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.models import Product, ProductVariant
+
+from .session import invalidate_variant_snapshots
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def variant_changed(sender, instance, **kwargs):
+    """Цена или активность варианта могли измениться."""
+    invalidate_variant_snapshots([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """Активность товара влияет на все его варианты."""
+    invalidate_variant_snapshots(
+        instance.variants.values_list("pk", flat=True)
+    )
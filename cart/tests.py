@@ -0,0 +1,286 @@
+"""
+Тесты корзины: действия с позициями и JSON-ответы.
+"""
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Category, Product, ProductVariant
+
+from .models import Cart, CartItem
+from .session import SESSION_CART_KEY
+from .utils import MAX_QUANTITY_PER_ITEM, add_to_cart
+
+pytestmark = pytest.mark.django_db
+
+JSON_HEADERS = {"HTTP_ACCEPT": "application/json"}
+
+
+def _create_variant(price=1000, slug="test") -> ProductVariant:
+    category = Category.objects.create(name="Тест", slug=slug, order=0)
+    product = Product.objects.create(
+        name="Тестовый товар",
+        category=category,
+        is_active=True,
+    )
+    return ProductVariant.objects.create(
+        product=product,
+        price=price,
+        discount_percent=0,
+        is_active=True,
+    )
+
+
+def _session_cart(client) -> Cart:
+    return Cart.objects.get(session_key=client.session.session_key)
+
+
+class TestCartJsonApi:
+    """JSON-ответы действий корзины (прогрессивное улучшение форм)."""
+
+    def test_add_without_json_redirects(self, client):
+        variant = _create_variant()
+        response = client.post(reverse("cart:add", args=[variant.pk]))
+        assert response.status_code == 302
+        assert response.url == variant.product.get_absolute_url()
+
+    def test_add_returns_line_summary_and_mini_cart(self, client):
+        variant = _create_variant(price=1500)
+        url = reverse("cart:add", args=[variant.pk])
+        client.post(url, {"quantity": 1}, **JSON_HEADERS)
+        response = client.post(url, {"quantity": 2}, **JSON_HEADERS)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["ok"] is True
+        assert data["item"]["variant_id"] == variant.pk
+        assert data["item"]["quantity"] == 3
+        assert data["item"]["line_total_display"] == "4500 ₽"
+        assert data["cart"]["count"] == 3
+        assert data["cart"]["total_display"] == "4500 ₽"
+        assert 'id="mini-cart"' in data["mini_cart_html"]
+        assert 'data-count="3"' in data["mini_cart_html"]
+
+    def test_update_to_zero_removes_item(self, client):
+        variant = _create_variant()
+        client.post(reverse("cart:add", args=[variant.pk]))
+        response = client.post(
+            reverse("cart:update", args=[variant.pk]),
+            {"quantity": 0},
+            **JSON_HEADERS,
+        )
+        data = response.json()
+        assert data["item"] is None
+        assert data["cart"]["count"] == 0
+        assert not CartItem.objects.filter(cart=_session_cart(client)).exists()
+
+    def test_remove_missing_item_returns_404_json(self, client):
+        variant = _create_variant()
+        response = client.post(
+            reverse("cart:remove", args=[variant.pk]),
+            **JSON_HEADERS,
+        )
+        assert response.status_code == 404
+        assert response.json()["ok"] is False
+
+    def test_clear_returns_empty_summary(self, client):
+        variant = _create_variant()
+        client.post(reverse("cart:add", args=[variant.pk]))
+        response = client.post(reverse("cart:clear"), **JSON_HEADERS)
+        data = response.json()
+        assert data["cart"] == {
+            "count": 0,
+            "total": "0",
+            "total_display": "0 ₽",
+        }
+        assert "data-count" not in data["mini_cart_html"]
+
+
+class TestInactiveItemsPruning:
+    """Неактивные товары удаляются из корзины при открытии страницы."""
+
+    def test_inactive_items_removed_in_one_delete(self, client):
+        active = _create_variant(slug="active")
+        inactive = _create_variant(slug="inactive")
+        for variant in (active, inactive):
+            client.post(reverse("cart:add", args=[variant.pk]))
+        inactive.product.is_active = False
+        inactive.product.save()
+
+        response = client.get(reverse("cart:detail"))
+
+        assert response.context["removed_product_names"] == [
+            "Тестовый товар"
+        ]
+        assert [it.variant_id for it in response.context["items"]] == [
+            active.pk
+        ]
+        assert list(
+            CartItem.objects.values_list("variant_id", flat=True)
+        ) == [active.pk]
+
+
+class TestAtomicCartQuantity:
+    """Атомарное изменение количества: один запрос, лимит в SQL."""
+
+    def test_add_clamps_to_max_quantity(self, client):
+        variant = _create_variant()
+        url = reverse("cart:add", args=[variant.pk])
+        client.post(url, {"quantity": 7})
+        client.post(url, {"quantity": 7})
+        item = CartItem.objects.get(cart=_session_cart(client))
+        assert item.quantity == MAX_QUANTITY_PER_ITEM
+
+    def test_add_to_cart_is_single_statement(
+        self, django_assert_num_queries
+    ):
+        variant = _create_variant()
+        cart = Cart.objects.create(session_key="s" * 32)
+        add_to_cart(cart, variant.pk, 2)
+        with django_assert_num_queries(1):
+            quantity = add_to_cart(cart, variant.pk, 3)
+        assert quantity == 5
+
+    def test_update_missing_item_returns_404(self, client):
+        variant = _create_variant()
+        response = client.post(
+            reverse("cart:update", args=[variant.pk]), {"quantity": 2}
+        )
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_adds_do_not_lose_updates():
+    """Параллельные добавления одного варианта суммируются без потерь."""
+    variant = _create_variant()
+    cart = Cart.objects.create(session_key="p" * 32)
+    workers = 4
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def worker():
+        try:
+            barrier.wait()
+            # SQLite (тестовая БД) не допускает параллельных писателей и
+            # отвечает «table is locked» без выполнения запроса — повторяем.
+            for _ in range(50):
+                try:
+                    add_to_cart(cart, variant.pk, 2)
+                    break
+                except OperationalError as exc:
+                    if "locked" not in str(exc):
+                        raise
+                    time.sleep(0.01)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert CartItem.objects.get(cart=cart).quantity == 2 * workers
+
+
+class TestSessionCartStorage:
+    """Анонимная корзина в сессии (CART_ANONYMOUS_STORAGE = "session")."""
+
+    @pytest.fixture(autouse=True)
+    def _session_storage(self, settings):
+        settings.CART_ANONYMOUS_STORAGE = "session"
+
+    def test_anonymous_add_does_not_create_cart_rows(self, client):
+        variant = _create_variant(price=700)
+        response = client.post(
+            reverse("cart:add", args=[variant.pk]),
+            {"quantity": 2},
+            **JSON_HEADERS,
+        )
+        data = response.json()
+        assert data["item"]["quantity"] == 2
+        assert data["cart"]["total_display"] == "1400 ₽"
+        assert not Cart.objects.exists()
+        assert not CartItem.objects.exists()
+        assert client.session[SESSION_CART_KEY] == {str(variant.pk): 2}
+
+    def test_inactive_variant_not_counted(self, client):
+        variant = _create_variant()
+        client.post(reverse("cart:add", args=[variant.pk]))
+        variant.is_active = False
+        variant.save()
+        response = client.get(reverse("cart:detail"))
+        assert response.context["cart_count"] == 0
+        assert response.context["removed_product_names"] == [
+            "Тестовый товар"
+        ]
+        assert SESSION_CART_KEY not in client.session
+
+    def test_login_materializes_session_cart(self, client):
+        variant = _create_variant()
+        client.post(reverse("cart:add", args=[variant.pk]), {"quantity": 3})
+        user = get_user_model().objects.create_user(
+            username="buyer", email="buyer@example.com", password="pass"
+        )
+        client.force_login(user)
+        client.get(reverse("cart:detail"))
+        item = CartItem.objects.get(cart__user=user)
+        assert item.variant_id == variant.pk
+        assert item.quantity == 3
+        assert SESSION_CART_KEY not in client.session
+
+
+class TestCleanupCartsCommand:
+    """Команда cleanup_carts: брошенные корзины и истёкшие сессии."""
+
+    def _session(self, key, expires_in):
+        return Session.objects.create(
+            session_key=key,
+            session_data="",
+            expire_date=timezone.now() + timedelta(seconds=expires_in),
+        )
+
+    def test_deletes_abandoned_carts_in_batches(self):
+        variant = _create_variant()
+        self._session("live", 3600)
+        self._session("expired", -3600)
+        live = Cart.objects.create(session_key="live")
+        expired = Cart.objects.create(session_key="expired")
+        gone = Cart.objects.create(session_key="gone")
+        user = get_user_model().objects.create_user(
+            username="owner", email="owner@example.com", password="pass"
+        )
+        user_cart = Cart.objects.create(user=user)
+        for cart in (live, expired, gone, user_cart):
+            CartItem.objects.create(cart=cart, variant=variant, quantity=1)
+
+        out = StringIO()
+        call_command("cleanup_carts", batch_size=1, stdout=out)
+
+        assert set(Cart.objects.values_list("pk", flat=True)) == {
+            live.pk,
+            user_cart.pk,
+        }
+        assert CartItem.objects.count() == 2
+        assert list(Session.objects.values_list("session_key", flat=True)) == [
+            "live"
+        ]
+        assert "Удалено корзин: 2, позиций: 2" in out.getvalue()
+
+    def test_dry_run_keeps_rows(self):
+        Cart.objects.create(session_key="gone")
+        out = StringIO()
+        call_command("cleanup_carts", dry_run=True, stdout=out)
+        assert Cart.objects.count() == 1
+        assert "Dry-run: к удалению корзин: 1" in out.getvalue()
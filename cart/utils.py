@@ -1,19 +1,48 @@
 """
-Утилиты корзины: получение/создание корзины, перенос при входе.
+Утилиты корзины: получение/создание корзины, перенос при входе,
+атомарное изменение количества.
+
+Корзина — либо модель Cart (пользователь или аноним при хранении в БД),
+либо SessionCart (аноним при CART_ANONYMOUS_STORAGE = "session").
+Функции ниже принимают оба варианта.
 """
-from .models import Cart
+from django.conf import settings
+from django.db import connection
+
+from .models import Cart, CartItem
+from .session import SESSION_CART_KEY, SessionCart, get_variant_snapshots
+
+MAX_QUANTITY_PER_ITEM = 10
+
+
+def uses_session_storage():
+    """Анонимные корзины хранятся в сессии, а не в таблицах корзины."""
+    return getattr(settings, "CART_ANONYMOUS_STORAGE", "db") == "session"
+
+
+def get_cart(request):
+    """
+    Корзина для текущего запроса без лишних записей в БД:
+    для анонима в режиме "session" — SessionCart, иначе модель Cart.
+    """
+    if not request.user.is_authenticated and uses_session_storage():
+        return SessionCart(request.session)
+    return get_or_create_cart(request)
 
 
 def get_or_create_cart(request):
     """
     Возвращает корзину для текущего запроса (по user или session_key).
-    Создаёт новую при отсутствии.
+    Создаёт новую при отсутствии. Для пользователя сессионная корзина
+    (если осталась после входа) сразу переносится в БД.
     """
     if request.user.is_authenticated:
         cart, _ = Cart.objects.get_or_create(
             user=request.user,
             defaults={},
         )
+        if request.session.get(SESSION_CART_KEY):
+            merge_carts(SessionCart(request.session), cart)
         return cart
 
     if not request.session.session_key:
@@ -30,7 +59,19 @@ def merge_carts(session_cart, user_cart):
     """
     Переносит позиции из корзины сессии в корзину пользователя.
     Совпадающие товары складываются по quantity, затем session_cart удаляется.
+    Для SessionCart переносятся только активные варианты, после чего
+    данные корзины удаляются из сессии.
     """
+    if isinstance(session_cart, SessionCart):
+        lines = session_cart.lines
+        snapshots = get_variant_snapshots(lines)
+        for variant_id, quantity in lines.items():
+            snapshot = snapshots.get(variant_id)
+            if snapshot and snapshot["active"]:
+                add_to_cart(user_cart, variant_id, quantity)
+        session_cart.clear()
+        return
+
     if session_cart.pk == user_cart.pk:
         return
 
@@ -43,3 +84,156 @@ def merge_carts(session_cart, user_cart):
             item.cart = user_cart
             item.save()
     session_cart.delete()
+
+
+def get_cart_items(cart):
+    """Позиции корзины с вариантом, товаром и фото (для страницы корзины)."""
+    if isinstance(cart, SessionCart):
+        return cart.get_items()
+    return list(
+        cart.items.select_related("variant__product")
+        .prefetch_related("variant__images")
+        .order_by("id")
+    )
+
+
+def prune_inactive_items(cart, items):
+    """
+    Убирает из корзины позиции с неактивным вариантом или товаром.
+    Проверка идёт по уже загруженным items, удаление — одним DELETE по id
+    (без повторной выборки). Возвращает (активные позиции, названия
+    удалённых товаров).
+    """
+    active, inactive = [], []
+    for item in items:
+        if item.variant.is_active and item.variant.product.is_active:
+            active.append(item)
+        else:
+            inactive.append(item)
+    if not inactive:
+        return items, []
+    if isinstance(cart, SessionCart):
+        cart.discard(item.variant_id for item in inactive)
+    else:
+        CartItem.objects.filter(pk__in=[item.pk for item in inactive]).delete()
+    return active, [item.variant.product.name for item in inactive]
+
+
+def get_cart_lines(cart):
+    """Позиции корзины с вариантом — для подсчёта итогов."""
+    if isinstance(cart, SessionCart):
+        return cart.get_items()
+    return cart.items.select_related("variant")
+
+
+def _least_sql():
+    """Имя скалярной функции минимума: LEAST в PostgreSQL, MIN в SQLite."""
+    return "LEAST" if connection.vendor == "postgresql" else "MIN"
+
+
+def add_to_cart(cart, variant_id, quantity):
+    """
+    Добавляет quantity единиц варианта в корзину одним запросом
+    INSERT ... ON CONFLICT DO UPDATE. Сумма с уже лежащим количеством
+    ограничивается MAX_QUANTITY_PER_ITEM в самой БД, поэтому параллельные
+    добавления (двойной клик) не теряют обновления.
+    Возвращает итоговое количество позиции.
+    """
+    quantity = max(1, min(int(quantity), MAX_QUANTITY_PER_ITEM))
+    if isinstance(cart, SessionCart):
+        return cart.add(variant_id, quantity, MAX_QUANTITY_PER_ITEM)
+    qn = connection.ops.quote_name
+    table = qn(CartItem._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} ({qn('cart_id')}, {qn('variant_id')}, "
+        f"{qn('quantity')}) VALUES (%s, %s, %s) "
+        f"ON CONFLICT ({qn('cart_id')}, {qn('variant_id')}) DO UPDATE SET "
+        f"{qn('quantity')} = {_least_sql()}("
+        f"{table}.{qn('quantity')} + EXCLUDED.{qn('quantity')}, %s) "
+        f"RETURNING {qn('quantity')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [cart.pk, variant_id, quantity, MAX_QUANTITY_PER_ITEM]
+        )
+        return cursor.fetchone()[0]
+
+
+def add_order_items_to_cart(cart, order_id):
+    """
+    Добавляет в корзину все позиции заказа одним запросом
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE: неактивные варианты
+    и товары отфильтровываются, количества суммируются с лежащими в корзине
+    и ограничиваются MAX_QUANTITY_PER_ITEM в самой БД.
+    Возвращает число добавленных или обновлённых позиций.
+    """
+    from catalog.models import Product, ProductVariant
+    from orders.models import OrderItem
+
+    qn = connection.ops.quote_name
+    table = qn(CartItem._meta.db_table)
+    order_items = qn(OrderItem._meta.db_table)
+    variants = qn(ProductVariant._meta.db_table)
+    products = qn(Product._meta.db_table)
+    least = _least_sql()
+    # WHERE у SELECT обязателен: без него SQLite путает ON CONFLICT с JOIN ON.
+    sql = (
+        f"INSERT INTO {table} ({qn('cart_id')}, {qn('variant_id')}, "
+        f"{qn('quantity')}) "
+        f"SELECT %s, oi.{qn('variant_id')}, "
+        f"{least}(SUM(oi.{qn('quantity')}), %s) "
+        f"FROM {order_items} oi "
+        f"JOIN {variants} v ON v.{qn('id')} = oi.{qn('variant_id')} "
+        f"JOIN {products} p ON p.{qn('id')} = v.{qn('product_id')} "
+        f"WHERE oi.{qn('order_id')} = %s "
+        f"AND v.{qn('is_active')} = %s AND p.{qn('is_active')} = %s "
+        f"GROUP BY oi.{qn('variant_id')} "
+        f"ON CONFLICT ({qn('cart_id')}, {qn('variant_id')}) DO UPDATE SET "
+        f"{qn('quantity')} = {least}("
+        f"{table}.{qn('quantity')} + EXCLUDED.{qn('quantity')}, %s)"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            [
+                cart.pk,
+                MAX_QUANTITY_PER_ITEM,
+                order_id,
+                True,
+                True,
+                MAX_QUANTITY_PER_ITEM,
+            ],
+        )
+        return cursor.rowcount
+
+
+def set_cart_quantity(cart, variant_id, quantity):
+    """
+    Устанавливает количество позиции одним UPDATE (или DELETE при
+    quantity < 1). Возвращает число затронутых строк (0 — позиции нет).
+    """
+    if isinstance(cart, SessionCart):
+        return cart.set_quantity(variant_id, quantity, MAX_QUANTITY_PER_ITEM)
+    items = CartItem.objects.filter(cart=cart, variant_id=variant_id)
+    if quantity < 1:
+        deleted, _ = items.delete()
+        return deleted
+    return items.update(quantity=min(quantity, MAX_QUANTITY_PER_ITEM))
+
+
+def remove_from_cart(cart, variant_id):
+    """Удаляет позицию. Возвращает 0, если позиции в корзине нет."""
+    if isinstance(cart, SessionCart):
+        return cart.remove(variant_id)
+    deleted, _ = CartItem.objects.filter(
+        cart=cart, variant_id=variant_id
+    ).delete()
+    return deleted
+
+
+def clear_cart(cart):
+    """Удаляет все позиции корзины."""
+    if isinstance(cart, SessionCart):
+        cart.clear()
+    else:
+        cart.items.all().delete()
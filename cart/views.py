@@ -1,15 +1,90 @@
 """
 Представления корзины.
+
+Действия add/update/remove/clear работают как обычные POST-формы с
+редиректом, а при запросе с заголовком Accept: application/json отвечают
+JSON с обновлённой позицией, итогами корзины и HTML мини-корзины.
 """
+from decimal import Decimal
+
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.defaultfilters import floatformat
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_http_methods, require_POST
 
 from catalog.models import ProductVariant
 
-from .models import CartItem
-from .utils import get_or_create_cart
+from .utils import (
+    add_to_cart,
+    clear_cart,
+    get_cart,
+    get_cart_items,
+    get_cart_lines,
+    prune_inactive_items,
+    remove_from_cart,
+    set_cart_quantity,
+)
+
+
+def _wants_json(request):
+    """Запрос от скрипта страницы (fetch), ожидающего JSON вместо редиректа."""
+    return "application/json" in request.headers.get("Accept", "")
+
+
+def _format_rub(value):
+    """Сумма в формате шаблонов: «1234 ₽»."""
+    return f"{floatformat(value, 0)} ₽"
+
+
+def _cart_json_response(request, cart, variant_id=None):
+    """
+    JSON-ответ после изменения корзины.
+
+    Позиции корзины читаются одним запросом: из них считаются итоги и берётся
+    изменённая позиция (item = None, если она удалена или корзина очищена).
+    """
+    count = 0
+    total = Decimal("0")
+    item = None
+    for it in get_cart_lines(cart):
+        count += it.quantity
+        total += it.line_total
+        if it.variant_id == variant_id:
+            item = it
+
+    item_data = None
+    if item is not None:
+        item_data = {
+            "variant_id": item.variant_id,
+            "quantity": item.quantity,
+            "line_total": str(item.line_total),
+            "line_total_display": _format_rub(item.line_total),
+        }
+    return JsonResponse(
+        {
+            "ok": True,
+            "variant_id": variant_id,
+            "item": item_data,
+            "cart": {
+                "count": count,
+                "total": str(total),
+                "total_display": _format_rub(total),
+            },
+            "mini_cart_html": render_to_string(
+                "cart/_mini_cart.html",
+                {"cart_count": count},
+                request=request,
+            ),
+        }
+    )
+
 
-MAX_QUANTITY_PER_ITEM = 10
+def _item_not_found_response():
+    return JsonResponse(
+        {"ok": False, "error": "Позиция не найдена в корзине."},
+        status=404,
+    )
 
 
 @require_http_methods(["GET", "POST"])
@@ -21,34 +96,17 @@ def cart_detail(request):
     Неактивные товары удаляются из корзины; их названия передаются в шаблон
     для показа модального окна.
     """
-    cart = get_or_create_cart(request)
-    items = list(
-        cart.items.select_related("variant__product")
-        .prefetch_related("variant__images")
-        .order_by("id")
+    cart = get_cart(request)
+    items, removed_product_names = prune_inactive_items(
+        cart, get_cart_items(cart)
     )
 
-    removed_product_names = []
-    inactive_items = [
-        it for it in items if not it.variant.is_active
-        or not it.variant.product.is_active
-    ]
-    if inactive_items:
-        for it in inactive_items:
-            removed_product_names.append(it.variant.product.name)
-            it.delete()
-        items = list(
-            cart.items.select_related("variant__product")
-            .prefetch_related("variant__images")
-            .order_by("id")
-        )
-
     checkout_context = None
     if request.user.is_authenticated and items:
         from orders.views import _get_checkout_context
 
         redirect_response, checkout_context = _get_checkout_context(
-            request, cart, items, cart.total_price
+            request, cart, items, sum(it.line_total for it in items)
         )
         if redirect_response is not None:
             return redirect_response
@@ -75,23 +133,12 @@ def cart_add(request, variant_id):
         ).select_related("product"),
         pk=variant_id,
     )
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
     quantity = int(request.POST.get("quantity", 1))
-    if quantity < 1:
-        quantity = 1
-    quantity = min(quantity, MAX_QUANTITY_PER_ITEM)
-
-    item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        variant=variant,
-        defaults={"quantity": quantity},
-    )
-    if not created:
-        item.quantity = min(
-            item.quantity + quantity,
-            MAX_QUANTITY_PER_ITEM,
-        )
-        item.save(update_fields=["quantity"])
+    add_to_cart(cart, variant.pk, quantity)
+
+    if _wants_json(request):
+        return _cart_json_response(request, cart, variant_id=variant.pk)
 
     redirect_url = (
         request.POST.get("next")
@@ -104,33 +151,36 @@ def cart_add(request, variant_id):
 @require_POST
 def cart_update(request, variant_id):
     """Изменить количество товара в корзине (POST)."""
-    cart = get_or_create_cart(request)
-    item = get_object_or_404(
-        CartItem.objects.filter(cart=cart, variant_id=variant_id)
-    )
+    cart = get_cart(request)
     quantity = int(request.POST.get("quantity", 1))
-    if quantity < 1:
-        item.delete()
-    else:
-        item.quantity = min(quantity, MAX_QUANTITY_PER_ITEM)
-        item.save(update_fields=["quantity"])
+    if not set_cart_quantity(cart, variant_id, quantity):
+        if _wants_json(request):
+            return _item_not_found_response()
+        raise Http404
+    if _wants_json(request):
+        return _cart_json_response(request, cart, variant_id=variant_id)
     return redirect("cart:detail")
 
 
 @require_POST
 def cart_remove(request, variant_id):
     """Удалить позицию из корзины (POST)."""
-    cart = get_or_create_cart(request)
-    item = get_object_or_404(
-        CartItem.objects.filter(cart=cart, variant_id=variant_id)
-    )
-    item.delete()
+    cart = get_cart(request)
+    deleted = remove_from_cart(cart, variant_id)
+    if _wants_json(request):
+        if not deleted:
+            return _item_not_found_response()
+        return _cart_json_response(request, cart, variant_id=variant_id)
+    if not deleted:
+        raise Http404
     return redirect("cart:detail")
 
 
 @require_POST
 def cart_clear(request):
     """Очистить корзину (POST)."""
-    cart = get_or_create_cart(request)
-    cart.items.all().delete()
+    cart = get_cart(request)
+    clear_cart(cart)
+    if _wants_json(request):
+        return _cart_json_response(request, cart)
     return redirect("cart:detail")
@@ -1,7 +1,11 @@
 from decimal import Decimal
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+
+from cdek.models import DeliveryEstimate
 
 from .models import Category, Product, ProductVariant
 from .templatetags.catalog_html import sanitize_product_description
@@ -76,6 +80,27 @@ class CatalogViewsTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 404)
 
+    @override_settings(CDEK_ESTIMATE_CITY_CODE=44)
+    def test_product_detail_shows_delivery_estimate(self):
+        # Товар без габаритов: 500 г и 10×10×10 см → категория «до 500 г».
+        DeliveryEstimate.objects.create(
+            city_code=44,
+            city_name="Москва",
+            weight_bucket_g=500,
+            delivery_sum=Decimal("330.00"),
+            period_min=3,
+            period_max=5,
+            updated_at=timezone.now(),
+        )
+        url = reverse(
+            "catalog:product_detail",
+            kwargs={"slug_or_pk": str(self.product.pk)},
+        )
+        with mock.patch("cdek.services.get_client") as get_client:
+            response = self.client.get(url)
+        get_client.assert_not_called()
+        self.assertContains(response, "Доставка СДЭК от 330 ₽ (Москва)")
+
 
 class ProductDescriptionSanitizeTestCase(TestCase):
     def test_allows_youtube_vk_rutube_iframe(self):
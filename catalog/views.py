@@ -1,7 +1,11 @@
 import uuid
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404, render
 
+from cdek.services import get_delivery_estimate
+from orders.models import Order
+
 from .models import Category, Product
 
 
@@ -53,6 +57,23 @@ def _is_uuid(value):
         return False
 
 
+def _estimate_city_code(request) -> int | None:
+    """
+    Город для оценки доставки: город последнего заказа покупателя,
+    иначе CDEK_ESTIMATE_CITY_CODE.
+    """
+    if request.user.is_authenticated:
+        city_code = (
+            Order.objects.filter(user=request.user, city_code__isnull=False)
+            .order_by("-created_at")
+            .values_list("city_code", flat=True)
+            .first()
+        )
+        if city_code:
+            return city_code
+    return getattr(settings, "CDEK_ESTIMATE_CITY_CODE", None)
+
+
 def product_detail(request, slug_or_pk):
     """Страница товара (по slug или uuid)."""
     qs = (
@@ -98,5 +119,9 @@ def product_detail(request, slug_or_pk):
             "variants": variants,
             "selected_variant": selected_variant,
             "schema_image_url": schema_image_url,
+            # Только локальная таблица оценок — без запросов к СДЭК.
+            "delivery_estimate": get_delivery_estimate(
+                product, _estimate_city_code(request)
+            ),
         },
     )
@@ -0,0 +1,127 @@
+"""
+Админка СДЭК.
+"""
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.html import format_html
+
+from jobs.models import Job
+
+from .jobs import PRINT_CDEK_DOCUMENTS
+from .models import CdekCity, CdekOffice, CdekStatusEvent, DeliveryEstimate
+from .printing import get_print_storage
+
+
+@admin.register(CdekCity)
+class CdekCityAdmin(admin.ModelAdmin):
+    """Справочник городов СДЭК (только просмотр, обновляется командой)."""
+
+    list_display = ("code", "city", "region", "synced_at")
+    search_fields = ("city", "region", "=code")
+    list_filter = ("region",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CdekOffice)
+class CdekOfficeAdmin(admin.ModelAdmin):
+    """Пункты выдачи СДЭК (только просмотр, обновляются командой)."""
+
+    list_display = ("code", "type", "city", "address", "synced_at")
+    search_fields = ("=code", "city", "address")
+    list_filter = ("type",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DeliveryEstimate)
+class DeliveryEstimateAdmin(admin.ModelAdmin):
+    """Оценки доставки для страниц товаров (обновляются командой)."""
+
+    list_display = (
+        "city_name",
+        "city_code",
+        "weight_bucket_g",
+        "delivery_sum",
+        "period_min",
+        "period_max",
+        "updated_at",
+    )
+    search_fields = ("city_name", "=city_code")
+    list_filter = ("weight_bucket_g",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CdekStatusEvent)
+class CdekStatusEventAdmin(admin.ModelAdmin):
+    """Статусы заказов из вебхука СДЭК (только просмотр)."""
+
+    list_display = (
+        "order_uuid",
+        "cdek_number",
+        "code",
+        "status_at",
+        "city_name",
+        "is_return",
+        "received_at",
+    )
+    search_fields = ("=order_uuid", "=cdek_number")
+    list_filter = ("code", "is_return")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+def cdek_print_view(request, job_id):
+    """
+    Страница админки: файл печати СДЭК, сформированный задачей очереди.
+    Пока задача не выполнена — сообщение со ссылкой и возврат к заказам.
+    """
+    if not request.user.has_perm("orders.view_order"):
+        raise PermissionDenied
+    job_obj = get_object_or_404(Job, pk=job_id, name=PRINT_CDEK_DOCUMENTS)
+    filename = job_obj.payload.get("filename", "")
+    storage = get_print_storage()
+    if job_obj.status == Job.Status.DONE and storage.exists(filename):
+        return FileResponse(
+            storage.open(filename, "rb"),
+            as_attachment=True,
+            filename=filename,
+        )
+    if job_obj.status == Job.Status.DONE:
+        messages.error(request, "Файл печати СДЭК уже удалён.")
+    elif job_obj.status == Job.Status.DEAD:
+        messages.error(
+            request,
+            "Не удалось получить документы из СДЭК, подробности — "
+            f"в задаче #{job_obj.pk}.",
+        )
+    else:
+        messages.info(
+            request,
+            format_html(
+                'Документы СДЭК ещё формируются. <a href="{}">Скачать</a> '
+                "через минуту.",
+                reverse("admin_cdek_print", args=[job_obj.pk]),
+            ),
+        )
+    return redirect("admin:orders_order_changelist")
@@ -0,0 +1,150 @@
+"""
+Компактный индекс справочника городов СДЭК для автодополнения.
+
+Строится один раз на воркер из справочника городов (get_cities) и хранит
+только нужное для поиска: коды, названия, регионы и нормализованные строки
+в параллельных списках. Поиск:
+  - запрос от 3 символов — по триграммам (пересечение списков позиций,
+    затем проверка подстроки);
+  - короткий запрос — по префиксам слов (бинарный поиск по отсортированному
+    списку слов).
+Результаты ранжируются: точное совпадение названия, начало названия,
+начало слова, подстрока в названии, совпадение в регионе.
+"""
+import heapq
+from bisect import bisect_left
+
+
+def normalize(value: str) -> str:
+    """Нижний регистр, «ё» → «е», дефисы как пробелы."""
+    return value.lower().replace("ё", "е").replace("-", " ").strip()
+
+
+def _trigrams(value: str) -> set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class CityIndex:
+    """Индекс городов: поиск по названию и региону без полного перебора."""
+
+    def __init__(self, cities: list[dict]):
+        self.codes: list[int] = []
+        self.names: list[str] = []
+        self.regions: list[str] = []
+        self._norm_names: list[str] = []
+        self._trigram_postings: dict[str, list[int]] = {}
+        # Регионов меньше сотни: по ним ищем перебором, а для каждого
+        # храним города, заранее упорядоченные по рангу внутри региона.
+        region_ids: dict[str, int] = {}
+        self._norm_regions: list[str] = []
+        self._region_members: list[list[int]] = []
+        words: list[tuple[str, int]] = []
+
+        for city in cities:
+            try:
+                code = int(city.get("code"))
+            except (TypeError, ValueError):
+                continue
+            name = city.get("city") or city.get("name") or ""
+            region = city.get("region") or ""
+            idx = len(self.codes)
+            self.codes.append(code)
+            self.names.append(name)
+            self.regions.append(region)
+            norm_name = normalize(name)
+            self._norm_names.append(norm_name)
+            for gram in _trigrams(norm_name):
+                self._trigram_postings.setdefault(gram, []).append(idx)
+            for word in set(norm_name.split()):
+                words.append((word, idx))
+            norm_region = normalize(region)
+            if norm_region not in region_ids:
+                region_ids[norm_region] = len(self._norm_regions)
+                self._norm_regions.append(norm_region)
+                self._region_members.append([])
+            self._region_members[region_ids[norm_region]].append(idx)
+
+        for region, members in zip(
+            self._norm_regions, self._region_members
+        ):
+            members.sort(key=lambda i: self._tiebreak(i, region))
+        words.sort()
+        self._words = [w for w, _ in words]
+        self._word_owners = [idx for _, idx in words]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _tiebreak(self, idx: int, region: str) -> tuple:
+        # Города федерального значения (название = регион) — выше.
+        name = self._norm_names[idx]
+        return (name != region, len(name), idx)
+
+    def _name_candidates(self, query: str) -> set[int]:
+        if len(query) >= 3:
+            postings = sorted(
+                (self._trigram_postings.get(g, []) for g in _trigrams(query)),
+                key=len,
+            )
+            if not postings or not postings[0]:
+                return set()
+            result = set(postings[0])
+            for posting in postings[1:]:
+                result.intersection_update(posting)
+                if not result:
+                    break
+            return result
+        result = set()
+        pos = bisect_left(self._words, query)
+        while pos < len(self._words) and self._words[pos].startswith(query):
+            result.add(self._word_owners[pos])
+            pos += 1
+        return result
+
+    def search(self, query: str, limit: int = 30) -> list[dict]:
+        """До limit городов {code, city, region}, лучшие совпадения первыми."""
+        query = normalize(query)
+        if not query:
+            return []
+        ranked = []
+        for idx in self._name_candidates(query):
+            name = self._norm_names[idx]
+            if name == query:
+                tier = 0
+            elif name.startswith(query):
+                tier = 1
+            elif f" {query}" in f" {name}":
+                tier = 2
+            elif query in name:
+                tier = 3
+            else:
+                continue
+            ranked.append((tier, len(name), idx))
+        best = heapq.nsmallest(limit, ranked)
+        found = {idx for *_, idx in best}
+
+        if len(best) < limit:
+            # Совпадения по региону — ниже любых совпадений по названию.
+            for region, members in zip(
+                self._norm_regions, self._region_members
+            ):
+                if query not in region:
+                    continue
+                added = 0
+                for idx in members:
+                    if idx in found:
+                        continue
+                    best.append((4, *self._tiebreak(idx, region)))
+                    added += 1
+                    if added >= limit:
+                        break
+            best = heapq.nsmallest(limit, best)
+
+        return [
+            {
+                "code": self.codes[idx],
+                "city": self.names[idx],
+                "region": self.regions[idx],
+            }
+            for *_, idx in best
+        ]
@@ -1,15 +1,43 @@
 """
 Клиент СДЭК API v2.
-Один товар — одно грузовое место; при quantity > 1 — несколько одинаковых мест.
+Грузовые места формируют сервисы (см. cdek.packing); клиент только
+приводит их к формату API.
 """
+import hashlib
 import logging
 import time
 from typing import Any
+from urllib.parse import quote
 
 import requests
+from django.core.cache import cache
+
+from core.circuit_breaker import CircuitOpenError, get_breaker
+from core.http import get_session
 
 logger = logging.getLogger(__name__)
 
+TOKEN_CACHE_KEY_PREFIX = "cdek_token_"
+TOKEN_LOCK_TIMEOUT = 30  # секунд; страховка, если обновляющий процесс упал
+TOKEN_WAIT_TIMEOUT = 5.0  # сколько ждать токен, который обновляет другой
+TOKEN_WAIT_STEP = 0.1
+
+CONNECT_TIMEOUT = 3.05
+# Таймаут чтения (сек) по префиксу пути; для остальных — timeout клиента.
+ENDPOINT_READ_TIMEOUTS = {
+    "/v2/oauth/token": 10,
+    "/v2/calculator/": 10,
+    "/v2/location/cities": 60,
+    "/v2/deliverypoints": 60,
+    "/v2/orders": 20,
+    "/v2/print/": 60,
+}
+# Медленный вызов (сбой для предохранителя) — дольше этой доли таймаута
+# чтения пути: выгрузка справочника за 20 с нормальна, расчёт тарифа — нет.
+SLOW_CALL_FRACTION = 0.5
+# POST-запросы, которые можно безопасно повторить при сбое.
+IDEMPOTENT_POST_PREFIXES = ("/v2/oauth/token", "/v2/calculator/")
+
 # Тарифы «Посылка» (коды 136–139) по официальной схеме СДЭК:
 TARIFF_WAREHOUSE_WAREHOUSE = 136      # Посылка склад-склад (ПВЗ)
 TARIFF_WAREHOUSE_DOOR = 137           # Посылка склад-дверь
@@ -49,22 +77,88 @@ class CdekClient:
         *,
         test: bool = False,
         timeout: int = 15,
+        base_url: str | None = None,
     ):
         self.account = account
         self.secure = secure
         self.timeout = timeout
-        self._base_url = (
+        # base_url — для локального сервера-заглушки (cdek.testing).
+        self._base_url = (base_url or (
             "https://api.edu.cdek.ru" if test
             else "https://api.cdek.ru"
+        )).rstrip("/")
+        self._session = get_session(
+            self._base_url,
+            idempotent_post_prefixes=IDEMPOTENT_POST_PREFIXES,
         )
+        self._breaker = get_breaker("cdek")
         self._token: str | None = None
         self._token_expires_at: float = 0
+        digest = hashlib.sha1(
+            f"{self._base_url}|{account}".encode()
+        ).hexdigest()[:16]
+        self._token_cache_key = f"{TOKEN_CACHE_KEY_PREFIX}{digest}"
+        self._token_lock_key = f"{self._token_cache_key}_lock"
+
+    def _timeout(self, path: str) -> tuple[float, float]:
+        """Таймауты (соединение, чтение) для пути API."""
+        for prefix, read_timeout in ENDPOINT_READ_TIMEOUTS.items():
+            if path.startswith(prefix):
+                return CONNECT_TIMEOUT, read_timeout
+        return CONNECT_TIMEOUT, self.timeout
+
+    def _guard(self, path: str):
+        """Предохранитель СДЭК с порогом медленного вызова для пути."""
+        return self._breaker.guard(
+            slow_call_seconds=self._timeout(path)[1] * SLOW_CALL_FRACTION
+        )
 
     def _get_token(self) -> str:
-        """Получает OAuth-токен (с кэшем до истечения)."""
-        if self._token and time.monotonic() < self._token_expires_at:
+        """
+        Получает OAuth-токен. Токен хранится в общем кэше Django (Redis
+        в продакшене) до истечения, поэтому его разделяют все воркеры.
+        Обновляет токен только тот процесс, который взял блокировку
+        (cache.add); остальные ждут, пока токен появится в кэше.
+        """
+        if self._token and time.time() < self._token_expires_at:
             return self._token
+        if self._load_shared_token():
+            return self._token
+
+        if cache.add(self._token_lock_key, 1, TOKEN_LOCK_TIMEOUT):
+            try:
+                # Пока ждали блокировку, токен мог обновить другой процесс.
+                if self._load_shared_token():
+                    return self._token
+                return self._fetch_token()
+            finally:
+                cache.delete(self._token_lock_key)
+
+        deadline = time.monotonic() + TOKEN_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(TOKEN_WAIT_STEP)
+            if self._load_shared_token():
+                return self._token
+        logger.warning("CDEK token refresh by another worker timed out")
+        return self._fetch_token()
 
+    def _load_shared_token(self) -> bool:
+        """Берёт токен из общего кэша; True, если он есть и не истёк."""
+        cached = cache.get(self._token_cache_key)
+        if not cached or time.time() >= cached["expires_at"]:
+            return False
+        self._token = cached["token"]
+        self._token_expires_at = cached["expires_at"]
+        return True
+
+    def _invalidate_token(self) -> None:
+        """Сбрасывает токен (например, после ответа 401)."""
+        self._token = None
+        self._token_expires_at = 0
+        cache.delete(self._token_cache_key)
+
+    def _fetch_token(self) -> str:
+        """Запрашивает новый OAuth-токен и кладёт его в общий кэш."""
         url = f"{self._base_url}/v2/oauth/token"
         data = {
             "grant_type": "client_credentials",
@@ -72,14 +166,19 @@ class CdekClient:
             "client_secret": self.secure,
         }
         try:
-            resp = requests.post(
-                url,
-                data=data,
-                timeout=self.timeout,
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-            )
-            resp.raise_for_status()
+            with self._guard("/v2/oauth/token"):
+                resp = self._session.post(
+                    url,
+                    data=data,
+                    timeout=self._timeout("/v2/oauth/token"),
+                    headers={
+                        "Content-Type": "application/x-www-form-urlencoded"
+                    },
+                )
+                resp.raise_for_status()
             payload = resp.json()
+        except CircuitOpenError as e:
+            raise CdekAPIError(f"Не удалось получить токен СДЭК: {e}") from e
         except requests.RequestException as e:
             logger.exception("CDEK OAuth request failed: %s", e)
             raise CdekAPIError(
@@ -88,16 +187,24 @@ class CdekClient:
                 response=getattr(e.response, "json", lambda: {})(),
             ) from e
 
-        self._token = payload.get("access_token")
-        expires_in = int(payload.get("expires_in", 3600))
-        # обновляем токен за 60 сек до истечения
-        self._token_expires_at = time.monotonic() + max(0, expires_in - 60)
-        if not self._token:
+        token = payload.get("access_token")
+        if not token:
             raise CdekAPIError(
                 "В ответе СДЭК нет access_token",
                 response=payload
             )
-        return self._token
+        expires_in = int(payload.get("expires_in", 3600))
+        # обновляем токен за 60 сек до истечения
+        lifetime = max(0, expires_in - 60)
+        self._token = token
+        self._token_expires_at = time.time() + lifetime
+        if lifetime:
+            cache.set(
+                self._token_cache_key,
+                {"token": token, "expires_at": self._token_expires_at},
+                lifetime,
+            )
+        return token
 
     @staticmethod
     def _packages_to_api_format(
@@ -128,31 +235,52 @@ class CdekClient:
         path: str,
         *,
         json: dict | None = None,
-    ) -> dict[str, Any]:
-        """Выполняет запрос к API с подставленным Bearer-токеном."""
+        retry_auth: bool = True,
+        raw: bool = False,
+    ) -> Any:
+        """
+        Выполняет запрос к API с подставленным Bearer-токеном.
+        При 401 (токен отозван раньше срока) токен сбрасывается
+        и запрос повторяется один раз. Возвращает разобранный JSON (dict
+        или list), при raw=True — тело как bytes (PDF печатных форм).
+        """
         url = f"{self._base_url}{path}"
         token = self._get_token()
         headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
         }
+        retry_unauthorized = False
         try:
-            if method.upper() == "GET":
-                resp = requests.get(
-                    url,
-                    headers=headers,
-                    timeout=self.timeout
-                )
-            else:
-                logger.debug("CDEK → %s %s body=%s", method, path, json)
-                resp = requests.post(
-                    url,
-                    headers=headers,
-                    json=json,
-                    timeout=self.timeout
+            with self._guard(path):
+                if method.upper() == "GET":
+                    resp = self._session.get(
+                        url,
+                        headers=headers,
+                        timeout=self._timeout(path)
+                    )
+                else:
+                    logger.debug("CDEK → %s %s body=%s", method, path, json)
+                    resp = self._session.post(
+                        url,
+                        headers=headers,
+                        json=json,
+                        timeout=self._timeout(path)
+                    )
+                retry_unauthorized = resp.status_code == 401 and retry_auth
+                if not retry_unauthorized:
+                    resp.raise_for_status()
+            if retry_unauthorized:
+                self._invalidate_token()
+                return self._request(
+                    method, path, json=json, retry_auth=False, raw=raw
                 )
-            resp.raise_for_status()
+            if raw:
+                return resp.content
             return resp.json() if resp.content else {}
+        except CircuitOpenError as e:
+            logger.warning("CDEK API %s %s skipped: %s", method, path, e)
+            raise CdekAPIError(f"Ошибка СДЭК API: {e}") from e
         except requests.RequestException as e:
             status_code = getattr(e.response, "status_code", None)
             raw_text = getattr(e.response, "text", "") or ""
@@ -245,6 +373,13 @@ class CdekClient:
         logger.debug("CDEK tarifflist request: %s", body)
         return self._request("POST", "/v2/calculator/tarifflist", json=body)
 
+    def calculate_tariff_list_raw(self, body: dict) -> dict[str, Any]:
+        """
+        Расчёт по всем тарифам с телом запроса «как есть» (размеры в см) —
+        для запросов виджета СДЭК (action=calculate).
+        """
+        return self._request("POST", "/v2/calculator/tarifflist", json=body)
+
     def create_order(
         self,
         *,
@@ -333,11 +468,89 @@ class CdekClient:
             raise CdekAPIError("UUID заказа СДЭК не указан")
         return self._request("GET", f"/v2/orders/{uuid}")
 
+    def get_order_by_number(self, number: str) -> dict[str, Any] | None:
+        """
+        Поиск заказа по нашему номеру (GET /v2/orders?im_number=...).
+        Возвращает ответ API или None, если заказа с таким номером нет.
+        """
+        try:
+            data = self._request(
+                "GET", f"/v2/orders?im_number={quote(str(number))}"
+            )
+        except CdekAPIError as e:
+            if e.status_code in (400, 404):
+                return None
+            raise
+        entity = data.get("entity") or {}
+        return data if entity.get("uuid") else None
+
+    def get_webhooks(self) -> list[dict[str, Any]]:
+        """Список подписок на вебхуки (GET /v2/webhooks)."""
+        data = self._request("GET", "/v2/webhooks")
+        return data if isinstance(data, list) else []
+
+    def create_webhook(
+        self, url: str, webhook_type: str = "ORDER_STATUS"
+    ) -> dict[str, Any]:
+        """
+        Подписка на вебхук (POST /v2/webhooks). СДЭК будет присылать
+        события типа webhook_type POST-запросом на url.
+        """
+        return self._request(
+            "POST", "/v2/webhooks", json={"type": webhook_type, "url": url}
+        )
+
+    def create_print_job(
+        self, kind: str, order_uuids: list[str], **options
+    ) -> dict[str, Any]:
+        """
+        Формирование печатной формы по нескольким заказам
+        (POST /v2/print/orders — накладные, /v2/print/barcodes — ШК мест).
+        options — параметры формы (copy_count, format и т.п.).
+        """
+        body = {
+            "orders": [{"order_uuid": uuid} for uuid in order_uuids],
+            **options,
+        }
+        return self._request("POST", f"/v2/print/{kind}", json=body)
+
+    def get_print_job(self, kind: str, uuid: str) -> dict[str, Any]:
+        """Статус печатной формы (GET /v2/print/{kind}/{uuid})."""
+        return self._request("GET", f"/v2/print/{kind}/{uuid}")
+
+    def download_print_job(self, kind: str, uuid: str) -> bytes:
+        """Готовый PDF печатной формы (GET /v2/print/{kind}/{uuid}.pdf)."""
+        return self._request("GET", f"/v2/print/{kind}/{uuid}.pdf", raw=True)
+
+    def get_delivery_points(
+        self,
+        *,
+        country_code: str = "RU",
+        page: int = 0,
+        size: int = 1000,
+    ) -> list[dict]:
+        """
+        Страница справочника пунктов выдачи и постаматов.
+
+        :param country_code: Код страны (RU).
+        :param page: Номер страницы с 0.
+        :param size: Размер страницы.
+        :return: Список офисов (code, type, location{...}, work_time...).
+        """
+        data = self._request(
+            "GET",
+            f"/v2/deliverypoints?country_code={country_code}"
+            f"&page={page}&size={size}",
+        )
+        return data if isinstance(data, list) else []
+
     def get_cities(
         self,
         *,
         country_code: str = "RU",
-        region_code: int | None = None
+        region_code: int | None = None,
+        page: int | None = None,
+        size: int | None = None,
     ) -> list[dict]:
         """
         Список городов (справочник).
@@ -345,20 +558,32 @@ class CdekClient:
 
         :param country_code: Код страны (RU).
         :param region_code: Код региона (опционально).
+        :param page: Номер страницы с 0 (вместе с size).
+        :param size: Размер страницы; без него API отдаёт весь справочник.
         :return: Список словарей с полями code, city, country_code, region...
         """
         path = "/v2/location/cities"
         params = [("country_code", country_code)]
         if region_code is not None:
             params.append(("region_code", region_code))
+        if size is not None:
+            params.append(("size", size))
+            params.append(("page", page or 0))
         qs = "&".join(f"{k}={v}" for k, v in params)
         url = f"{self._base_url}{path}?{qs}"
         token = self._get_token()
         headers = {"Authorization": f"Bearer {token}"}
         try:
-            resp = requests.get(url, headers=headers, timeout=self.timeout)
-            resp.raise_for_status()
+            with self._guard(path):
+                resp = self._session.get(
+                    url, headers=headers, timeout=self._timeout(path)
+                )
+                resp.raise_for_status()
             return resp.json() if resp.content else []
+        except CircuitOpenError as e:
+            raise CdekAPIError(
+                f"Не удалось получить список городов: {e}"
+            ) from e
         except requests.RequestException as e:
             logger.warning("CDEK get_cities failed: %s", e)
             raise CdekAPIError(
@@ -0,0 +1,47 @@
+"""
+Фоновые задачи СДЭК: печать накладных и ШК мест вне запроса админки.
+"""
+import uuid
+
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import PermanentJobError, enqueue, job
+
+from .printing import print_filename, save_documents
+from .services import get_client
+
+PRINT_CDEK_DOCUMENTS = "cdek.print_documents"
+# Формирование у СДЭК может не уложиться в PRINT_TIMEOUT — пара повторов.
+PRINT_MAX_ATTEMPTS = 3
+
+
+def enqueue_print(kind: str, order_uuids: list[str]) -> Job:
+    """
+    Ставит печать документов kind по заказам в очередь. Имя будущего
+    файла хранится в аргументах задачи — по нему админка его отдаёт.
+    """
+    stamp = timezone.localtime().strftime("%Y%m%d-%H%M")
+    filename = print_filename(
+        kind,
+        len(order_uuids),
+        f"cdek-{kind}-{stamp}-{uuid.uuid4().hex[:8]}",
+    )
+    return enqueue(
+        PRINT_CDEK_DOCUMENTS,
+        max_attempts=PRINT_MAX_ATTEMPTS,
+        kind=kind,
+        order_uuids=order_uuids,
+        filename=filename,
+    )
+
+
+@job(PRINT_CDEK_DOCUMENTS)
+def print_cdek_documents(
+    kind: str, order_uuids: list[str], filename: str
+) -> None:
+    """Формирует документы в СДЭК и сохраняет файл в хранилище печати."""
+    client = get_client()
+    if client is None:
+        raise PermanentJobError("Интеграция СДЭК не настроена")
+    save_documents(client, kind, order_uuids, filename)
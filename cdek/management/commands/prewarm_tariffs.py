@@ -0,0 +1,140 @@
+"""
+Management-команда прогрева кэша тарифов СДЭК.
+
+Считает tarifflist для самых частых городов доставки из истории заказов
+× профилей самых продаваемых товаров (одна единица в корзине — самый
+частый случай) и кладёт результаты в кэш расчётов на сутки. Днём такие
+корзины получают тарифы без обращения к СДЭК. Запросы идут в несколько
+потоков с ограничением частоты, чтобы не упереться в лимиты API.
+
+Запуск в контейнере cleanup-orders (дважды в сутки):
+  python manage.py prewarm_tariffs
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import timezone
+
+from catalog.models import Product
+from cdek.services import (
+    calculate_tarifflist,
+    get_client,
+    package_profile,
+    packages_fingerprint,
+    product_unit,
+)
+from core.concurrency import RateLimiter
+from orders.services import top_delivery_city_codes
+
+PREWARM_CACHE_TIMEOUT = 24 * 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогревает кэш тарифов СДЭК для частых городов доставки "
+        "и типовых посылок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cities",
+            type=int,
+            default=50,
+            help="Сколько самых частых городов доставки (по умолчанию 50).",
+        )
+        parser.add_argument(
+            "--profiles",
+            type=int,
+            default=10,
+            help="Сколько самых продаваемых товаров (по умолчанию 10).",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="За сколько дней смотреть заказы (по умолчанию 90).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Параллельных запросов к СДЭК (по умолчанию 4).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=5.0,
+            help="Не больше запросов в секунду (по умолчанию 5).",
+        )
+
+    def handle(self, *args, **options):
+        if get_client() is None:
+            raise CommandError("Интеграция СДЭК не настроена (CDEK_ACCOUNT).")
+        since = timezone.now() - timedelta(days=options["days"])
+        city_codes = top_delivery_city_codes(since, options["cities"])
+        profiles = self._top_profiles(since, options["profiles"])
+        if not city_codes or not profiles:
+            self.stdout.write(
+                self.style.WARNING("Нет заказов за период, прогрев пропущен.")
+            )
+            return
+
+        from_city_code = getattr(settings, "CDEK_FROM_CITY_CODE", 137)
+        limiter = RateLimiter(options["rate"])
+
+        def warm(task):
+            to_city_code, packages = task
+            limiter.wait()
+            return bool(
+                calculate_tarifflist(
+                    from_city_code,
+                    to_city_code,
+                    packages,
+                    cache_timeout=PREWARM_CACHE_TIMEOUT,
+                    # Пересчитываем, даже если в кэше есть свежий ответ:
+                    # прогретая запись должна прожить до следующего
+                    # запуска. При ошибке СДЭК прежняя запись остаётся.
+                    refresh=True,
+                )
+            )
+
+        tasks = [
+            (code, packages) for code in city_codes for packages in profiles
+        ]
+        started = time.monotonic()
+        with ThreadPoolExecutor(
+            max_workers=max(options["workers"], 1),
+            thread_name_prefix="prewarm",
+        ) as executor:
+            warmed = sum(executor.map(warm, tasks))
+
+        message = (
+            f"Прогрето тарифов: {warmed} из {len(tasks)} "
+            f"({len(city_codes)} городов × {len(profiles)} посылок) "
+            f"за {time.monotonic() - started:.1f} с"
+        )
+        style = (
+            self.style.SUCCESS if warmed == len(tasks) else self.style.WARNING
+        )
+        self.stdout.write(style(message))
+
+    def _top_profiles(self, since, limit):
+        """Посылки из одной единицы самых продаваемых товаров (без дублей)."""
+        products = (
+            Product.objects.filter(
+                variants__order_items__order__created_at__gte=since
+            )
+            .annotate(sold=Sum("variants__order_items__quantity"))
+            .order_by("-sold", "pk")[:limit]
+        )
+        profiles = {}
+        for product in products:
+            # Одна единица упаковывается «как есть» — место равно товару.
+            packages = [product_unit(product)]
+            key = packages_fingerprint(package_profile(packages))
+            profiles.setdefault(key, packages)
+        return list(profiles.values())
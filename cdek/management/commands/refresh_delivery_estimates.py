@@ -0,0 +1,135 @@
+"""
+Management-команда пересчёта оценок доставки для страниц товаров.
+
+Для города по умолчанию (CDEK_ESTIMATE_CITY_CODE) и самых частых городов
+доставки из заказов считает через калькулятор СДЭК цену эталонной посылки
+каждой весовой категории и сохраняет минимальную цену для покупателя
+(с наценкой, как при оформлении) в таблицу DeliveryEstimate. Страница
+товара читает только эту таблицу.
+
+Запуск в контейнере cleanup-orders (дважды в сутки):
+  python manage.py refresh_delivery_estimates
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cdek.models import CdekCity, DeliveryEstimate
+from cdek.services import (
+    ESTIMATE_WEIGHT_BUCKETS_G,
+    bucket_package,
+    calculate_tarifflist,
+    get_client,
+)
+from orders.services import (
+    filter_tariffs_for_response,
+    top_delivery_city_codes,
+)
+
+UPDATE_FIELDS = [
+    "city_name",
+    "delivery_sum",
+    "period_min",
+    "period_max",
+    "updated_at",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает оценки стоимости доставки по городам и весовым "
+        "категориям для страниц товаров."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cities",
+            type=int,
+            default=50,
+            help="Сколько самых частых городов доставки (по умолчанию 50).",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="За сколько дней смотреть заказы (по умолчанию 90).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Пауза между запросами к СДЭК, сек (по умолчанию 0.1).",
+        )
+
+    def handle(self, *args, **options):
+        if get_client() is None:
+            raise CommandError("Интеграция СДЭК не настроена (CDEK_ACCOUNT).")
+        city_codes = self._city_codes(options["cities"], options["days"])
+        names = dict(
+            CdekCity.objects.filter(code__in=city_codes).values_list(
+                "code", "city"
+            )
+        )
+        from_city_code = getattr(settings, "CDEK_FROM_CITY_CODE", 137)
+        started = timezone.now()
+        started_clock = time.monotonic()
+        estimates = []
+        for city_code in city_codes:
+            for bucket in ESTIMATE_WEIGHT_BUCKETS_G:
+                raw = calculate_tarifflist(
+                    from_city_code, city_code, [bucket_package(bucket)]
+                )
+                tariffs = [
+                    *filter_tariffs_for_response(raw, "office", ""),
+                    *filter_tariffs_for_response(raw, "door", ""),
+                ]
+                if tariffs:
+                    cheapest = min(tariffs, key=lambda t: t["delivery_sum"])
+                    estimates.append(
+                        DeliveryEstimate(
+                            city_code=city_code,
+                            city_name=names.get(city_code, "")[:255],
+                            weight_bucket_g=bucket,
+                            delivery_sum=cheapest["delivery_sum"],
+                            period_min=cheapest["period_min"],
+                            period_max=cheapest["period_max"],
+                            updated_at=started,
+                        )
+                    )
+                if options["sleep"]:
+                    time.sleep(options["sleep"])
+
+        DeliveryEstimate.objects.bulk_create(
+            estimates,
+            update_conflicts=True,
+            unique_fields=["city_code", "weight_bucket_g"],
+            update_fields=UPDATE_FIELDS,
+        )
+        # Города, выпавшие из списка, больше не показываем. Оценки городов
+        # из списка, которые сейчас не посчитались, остаются прежними.
+        deleted, _ = (
+            DeliveryEstimate.objects.filter(updated_at__lt=started)
+            .exclude(city_code__in=city_codes)
+            .delete()
+        )
+        total = len(city_codes) * len(ESTIMATE_WEIGHT_BUCKETS_G)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Оценок обновлено: {len(estimates)} из {total}, "
+                f"удалено устаревших: {deleted}, "
+                f"за {time.monotonic() - started_clock:.1f} с"
+            )
+        )
+
+    def _city_codes(self, limit, days):
+        """Город по умолчанию и самые частые города доставки."""
+        default = getattr(settings, "CDEK_ESTIMATE_CITY_CODE", None)
+        top = top_delivery_city_codes(
+            timezone.now() - timedelta(days=days), limit
+        )
+        codes = [default] if default else []
+        codes.extend(code for code in top if code != default)
+        return codes
@@ -0,0 +1,56 @@
+"""
+Management-команда подписки на вебхук статусов заказов СДЭК.
+
+Регистрирует в СДЭК адрес <base_url>/cdek/webhook/<CDEK_WEBHOOK_SECRET>/
+для событий ORDER_STATUS. Если такая подписка уже есть, ничего не делает,
+поэтому команду можно запускать при каждом деплое.
+
+Запуск:
+  python manage.py register_cdek_webhook https://shop.example.ru
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from cdek.client import CdekAPIError
+from cdek.services import get_client
+
+WEBHOOK_TYPE = "ORDER_STATUS"
+
+
+class Command(BaseCommand):
+    help = "Подписывает сайт на вебхук статусов заказов СДЭК (ORDER_STATUS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "base_url",
+            help="Адрес сайта, доступный СДЭК, например https://shop.ru",
+        )
+
+    def handle(self, *args, **options):
+        client = get_client()
+        if client is None:
+            raise CommandError("Интеграция СДЭК не настроена (CDEK_ACCOUNT).")
+        secret = getattr(settings, "CDEK_WEBHOOK_SECRET", "")
+        if not secret:
+            raise CommandError("Не задан CDEK_WEBHOOK_SECRET.")
+        url = options["base_url"].rstrip("/") + reverse(
+            "cdek:webhook", kwargs={"secret": secret}
+        )
+
+        try:
+            existing = client.get_webhooks()
+            if any(
+                hook.get("type") == WEBHOOK_TYPE and hook.get("url") == url
+                for hook in existing
+            ):
+                self.stdout.write("Вебхук СДЭК уже зарегистрирован.")
+                return
+            result = client.create_webhook(url, WEBHOOK_TYPE)
+        except CdekAPIError as e:
+            raise CommandError(f"СДЭК не принял подписку: {e}") from e
+
+        uuid = (result.get("entity") or {}).get("uuid", "")
+        self.stdout.write(
+            self.style.SUCCESS(f"Вебхук СДЭК зарегистрирован: {uuid}")
+        )
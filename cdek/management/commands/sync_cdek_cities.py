@@ -0,0 +1,140 @@
+"""
+Management-команда синхронизации справочника городов СДЭК с локальной БД.
+
+Проходит справочник постранично (page/size), обновляет города пакетами
+(INSERT ... ON CONFLICT DO UPDATE) и удаляет города, которых больше нет
+в ответе СДЭК. После обновления воркеры перестраивают индекс автодополнения.
+
+Запуск в контейнере cleanup-orders (дважды в сутки):
+  python manage.py sync_cdek_cities
+При старте web после migrate — только если справочник ещё пуст (первый
+деплой), чтобы автодополнение не ждало первого прохода cleanup-orders:
+  python manage.py sync_cdek_cities --if-empty
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cdek.client import CdekAPIError
+from cdek.models import CdekCity
+from cdek.services import bump_cities_version, get_client
+
+UPDATE_FIELDS = [
+    "city",
+    "region",
+    "region_code",
+    "sub_region",
+    "latitude",
+    "longitude",
+    "synced_at",
+]
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает справочник городов СДЭК (РФ) постранично "
+        "и синхронизирует его с локальной таблицей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=1000,
+            help="Городов на страницу запроса к API (по умолчанию 1000).",
+        )
+        parser.add_argument(
+            "--if-empty",
+            action="store_true",
+            help="Загружать, только если справочник ещё пуст.",
+        )
+
+    def handle(self, *args, **options):
+        if options["if_empty"] and CdekCity.objects.exists():
+            self.stdout.write("Справочник городов СДЭК уже загружен.")
+            return
+        client = get_client()
+        if client is None:
+            raise CommandError("Интеграция СДЭК не настроена (CDEK_ACCOUNT).")
+        page_size = max(options["page_size"], 1)
+        started = timezone.now()
+        started_clock = time.monotonic()
+        total = 0
+        page = 0
+
+        while True:
+            try:
+                batch = client.get_cities(
+                    country_code="RU", page=page, size=page_size
+                )
+            except CdekAPIError as e:
+                raise CommandError(
+                    f"Синхронизация прервана на странице {page}: {e}"
+                ) from e
+            if not batch:
+                break
+            total += self._upsert(batch, started)
+            if len(batch) < page_size:
+                break
+            page += 1
+
+        if total == 0:
+            self.stdout.write(
+                self.style.WARNING(
+                    "СДЭК вернул пустой справочник, удаление пропущено."
+                )
+            )
+            return
+
+        deleted, _ = CdekCity.objects.filter(synced_at__lt=started).delete()
+        bump_cities_version()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Городов обновлено: {total}, удалено устаревших: {deleted}, "
+                f"страниц: {page + 1}, "
+                f"за {time.monotonic() - started_clock:.1f} с"
+            )
+        )
+
+    def _upsert(self, batch, synced_at):
+        """Одна страница — один INSERT ... ON CONFLICT DO UPDATE."""
+        cities = {}
+        for item in batch:
+            code = _to_int(item.get("code"))
+            name = (item.get("city") or "").strip()
+            if code is None or not name:
+                continue
+            cities[code] = CdekCity(
+                code=code,
+                city=name[:255],
+                region=(item.get("region") or "")[:255],
+                region_code=_to_int(item.get("region_code")),
+                sub_region=(item.get("sub_region") or "")[:255],
+                latitude=_to_float(item.get("latitude")),
+                longitude=_to_float(item.get("longitude")),
+                synced_at=synced_at,
+            )
+        with transaction.atomic():
+            CdekCity.objects.bulk_create(
+                cities.values(),
+                update_conflicts=True,
+                unique_fields=["code"],
+                update_fields=UPDATE_FIELDS,
+            )
+        return len(cities)
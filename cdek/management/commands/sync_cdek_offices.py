@@ -0,0 +1,144 @@
+"""
+Management-команда синхронизации пунктов выдачи и постаматов СДЭК.
+
+Проходит /v2/deliverypoints постранично, обновляет офисы пакетами
+(INSERT ... ON CONFLICT DO UPDATE) и удаляет закрытые. Офисы без координат
+пропускаются — они не нужны карте и поиску ближайших.
+
+Запуск в контейнере cleanup-orders (дважды в сутки):
+  python manage.py sync_cdek_offices
+При старте web после migrate — только если справочник ещё пуст:
+  python manage.py sync_cdek_offices --if-empty
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cdek.client import CdekAPIError
+from cdek.models import CdekOffice
+from cdek.services import get_client
+
+from .sync_cdek_cities import _to_float, _to_int
+
+UPDATE_FIELDS = [
+    "name",
+    "type",
+    "city_code",
+    "city",
+    "address",
+    "work_time",
+    "latitude",
+    "longitude",
+    "is_handout",
+    "synced_at",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает пункты выдачи и постаматы СДЭК (РФ) постранично "
+        "и синхронизирует их с локальной таблицей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=1000,
+            help="Офисов на страницу запроса к API (по умолчанию 1000).",
+        )
+        parser.add_argument(
+            "--if-empty",
+            action="store_true",
+            help="Загружать, только если справочник ещё пуст.",
+        )
+
+    def handle(self, *args, **options):
+        if options["if_empty"] and CdekOffice.objects.exists():
+            self.stdout.write("Справочник офисов СДЭК уже загружен.")
+            return
+        client = get_client()
+        if client is None:
+            raise CommandError("Интеграция СДЭК не настроена (CDEK_ACCOUNT).")
+        page_size = max(options["page_size"], 1)
+        started = timezone.now()
+        started_clock = time.monotonic()
+        total = 0
+        page = 0
+
+        while True:
+            try:
+                batch = client.get_delivery_points(
+                    country_code="RU", page=page, size=page_size
+                )
+            except CdekAPIError as e:
+                raise CommandError(
+                    f"Синхронизация прервана на странице {page}: {e}"
+                ) from e
+            if not batch:
+                break
+            total += self._upsert(batch, started)
+            if len(batch) < page_size:
+                break
+            page += 1
+
+        if total == 0:
+            self.stdout.write(
+                self.style.WARNING(
+                    "СДЭК вернул пустой список офисов, удаление пропущено."
+                )
+            )
+            return
+
+        deleted, _ = CdekOffice.objects.filter(
+            synced_at__lt=started
+        ).delete()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Офисов обновлено: {total}, удалено закрытых: {deleted}, "
+                f"страниц: {page + 1}, "
+                f"за {time.monotonic() - started_clock:.1f} с"
+            )
+        )
+
+    def _upsert(self, batch, synced_at):
+        """Одна страница — один INSERT ... ON CONFLICT DO UPDATE."""
+        offices = {}
+        for item in batch:
+            code = (item.get("code") or "").strip()
+            location = item.get("location") or {}
+            latitude = _to_float(location.get("latitude"))
+            longitude = _to_float(location.get("longitude"))
+            city_code = _to_int(location.get("city_code"))
+            if None in (latitude, longitude, city_code) or not code:
+                continue
+            office_type = item.get("type")
+            if office_type not in CdekOffice.Type.values:
+                office_type = CdekOffice.Type.PVZ
+            offices[code] = CdekOffice(
+                code=code[:32],
+                name=(item.get("name") or "")[:255],
+                type=office_type,
+                city_code=city_code,
+                city=(location.get("city") or "")[:255],
+                address=(
+                    location.get("address_full")
+                    or location.get("address")
+                    or ""
+                )[:500],
+                work_time=(item.get("work_time") or "")[:255],
+                latitude=latitude,
+                longitude=longitude,
+                is_handout=bool(item.get("is_handout", True)),
+                synced_at=synced_at,
+            )
+        with transaction.atomic():
+            CdekOffice.objects.bulk_create(
+                offices.values(),
+                update_conflicts=True,
+                unique_fields=["code"],
+                update_fields=UPDATE_FIELDS,
+            )
+        return len(offices)
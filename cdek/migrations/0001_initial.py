@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CdekCity',
+            fields=[
+                ('code', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Код СДЭК')),
+                ('city', models.CharField(max_length=255, verbose_name='Город')),
+                ('region', models.CharField(blank=True, max_length=255, verbose_name='Регион')),
+                ('region_code', models.PositiveIntegerField(blank=True, null=True, verbose_name='Код региона')),
+                ('sub_region', models.CharField(blank=True, max_length=255, verbose_name='Район')),
+                ('latitude', models.FloatField(blank=True, null=True, verbose_name='Широта')),
+                ('longitude', models.FloatField(blank=True, null=True, verbose_name='Долгота')),
+                ('synced_at', models.DateTimeField(db_index=True, verbose_name='Синхронизирован')),
+            ],
+            options={
+                'verbose_name': 'город СДЭК',
+                'verbose_name_plural': 'города СДЭК',
+                'ordering': ['city'],
+            },
+        ),
+    ]
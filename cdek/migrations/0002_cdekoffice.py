@@ -0,0 +1,35 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdek', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CdekOffice',
+            fields=[
+                ('code', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Код ПВЗ')),
+                ('name', models.CharField(blank=True, max_length=255, verbose_name='Название')),
+                ('type', models.CharField(choices=[('PVZ', 'Пункт выдачи'), ('POSTAMAT', 'Постамат')], default='PVZ', max_length=16, verbose_name='Тип')),
+                ('city_code', models.PositiveIntegerField(db_index=True, verbose_name='Код города')),
+                ('city', models.CharField(blank=True, max_length=255, verbose_name='Город')),
+                ('address', models.CharField(blank=True, max_length=500, verbose_name='Адрес')),
+                ('work_time', models.CharField(blank=True, max_length=255, verbose_name='Режим работы')),
+                ('latitude', models.FloatField(verbose_name='Широта')),
+                ('longitude', models.FloatField(verbose_name='Долгота')),
+                ('is_handout', models.BooleanField(default=True, verbose_name='Выдача заказов')),
+                ('synced_at', models.DateTimeField(db_index=True, verbose_name='Синхронизирован')),
+            ],
+            options={
+                'verbose_name': 'пункт выдачи СДЭК',
+                'verbose_name_plural': 'пункты выдачи СДЭК',
+                'ordering': ['city', 'address'],
+                'indexes': [models.Index(fields=['latitude', 'longitude'], name='cdek_office_lat_lon_idx')],
+            },
+        ),
+    ]
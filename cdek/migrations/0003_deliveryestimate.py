@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdek', '0002_cdekoffice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryEstimate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city_code', models.PositiveIntegerField(verbose_name='Код города')),
+                ('city_name', models.CharField(blank=True, max_length=255, verbose_name='Город')),
+                ('weight_bucket_g', models.PositiveIntegerField(help_text='Верхняя граница оплачиваемого веса (г).', verbose_name='Весовая категория, г')),
+                ('delivery_sum', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Стоимость от')),
+                ('period_min', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Срок от, дн.')),
+                ('period_max', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Срок до, дн.')),
+                ('updated_at', models.DateTimeField(db_index=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'оценка доставки',
+                'verbose_name_plural': 'оценки доставки',
+                'ordering': ['city_name', 'weight_bucket_g'],
+                'constraints': [models.UniqueConstraint(fields=('city_code', 'weight_bucket_g'), name='cdek_estimate_city_bucket_uniq')],
+            },
+        ),
+    ]
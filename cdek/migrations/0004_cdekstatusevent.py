@@ -0,0 +1,33 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cdek', '0003_deliveryestimate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CdekStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_uuid', models.CharField(max_length=50, verbose_name='UUID заказа в СДЭК')),
+                ('cdek_number', models.CharField(blank=True, max_length=50, verbose_name='Трек-номер')),
+                ('code', models.CharField(max_length=50, verbose_name='Код статуса')),
+                ('status_at', models.DateTimeField(verbose_name='Время статуса')),
+                ('city_name', models.CharField(blank=True, max_length=255, verbose_name='Город')),
+                ('is_return', models.BooleanField(default=False, verbose_name='Возвратный заказ')),
+                ('payload', models.JSONField(default=dict, verbose_name='Тело вебхука')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+            ],
+            options={
+                'verbose_name': 'статус заказа СДЭК',
+                'verbose_name_plural': 'статусы заказов СДЭК',
+                'ordering': ['-status_at'],
+                'constraints': [models.UniqueConstraint(fields=('order_uuid', 'code', 'status_at'), name='cdek_status_event_uniq')],
+            },
+        ),
+    ]
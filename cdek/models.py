@@ -0,0 +1,138 @@
+"""
+Модели СДЭК: локальные копии справочников городов и пунктов выдачи,
+таблица оценок стоимости доставки.
+"""
+from django.db import models
+
+
+class CdekCity(models.Model):
+    """Город из справочника СДЭК (заполняется командой sync_cdek_cities)."""
+
+    code = models.PositiveIntegerField("Код СДЭК", primary_key=True)
+    city = models.CharField("Город", max_length=255)
+    region = models.CharField("Регион", max_length=255, blank=True)
+    region_code = models.PositiveIntegerField(
+        "Код региона", null=True, blank=True
+    )
+    sub_region = models.CharField("Район", max_length=255, blank=True)
+    latitude = models.FloatField("Широта", null=True, blank=True)
+    longitude = models.FloatField("Долгота", null=True, blank=True)
+    synced_at = models.DateTimeField("Синхронизирован", db_index=True)
+
+    class Meta:
+        verbose_name = "город СДЭК"
+        verbose_name_plural = "города СДЭК"
+        ordering = ["city"]
+
+    def __str__(self):
+        if self.region and self.region != self.city:
+            return f"{self.city} ({self.region})"
+        return self.city
+
+
+class CdekOffice(models.Model):
+    """Пункт выдачи или постамат СДЭК (заполняется sync_cdek_offices)."""
+
+    class Type(models.TextChoices):
+        PVZ = "PVZ", "Пункт выдачи"
+        POSTAMAT = "POSTAMAT", "Постамат"
+
+    code = models.CharField("Код ПВЗ", max_length=32, primary_key=True)
+    name = models.CharField("Название", max_length=255, blank=True)
+    type = models.CharField(
+        "Тип", max_length=16, choices=Type.choices, default=Type.PVZ
+    )
+    city_code = models.PositiveIntegerField("Код города", db_index=True)
+    city = models.CharField("Город", max_length=255, blank=True)
+    address = models.CharField("Адрес", max_length=500, blank=True)
+    work_time = models.CharField("Режим работы", max_length=255, blank=True)
+    latitude = models.FloatField("Широта")
+    longitude = models.FloatField("Долгота")
+    is_handout = models.BooleanField("Выдача заказов", default=True)
+    synced_at = models.DateTimeField("Синхронизирован", db_index=True)
+
+    class Meta:
+        verbose_name = "пункт выдачи СДЭК"
+        verbose_name_plural = "пункты выдачи СДЭК"
+        ordering = ["city", "address"]
+        indexes = [
+            # Запросы по прямоугольнику карты: диапазон широты + долготы.
+            models.Index(
+                fields=["latitude", "longitude"],
+                name="cdek_office_lat_lon_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.code}: {self.address}"
+
+
+class DeliveryEstimate(models.Model):
+    """
+    Оценка стоимости доставки «от N ₽» для города и весовой категории
+    (заполняется командой refresh_delivery_estimates).
+    """
+
+    city_code = models.PositiveIntegerField("Код города")
+    city_name = models.CharField("Город", max_length=255, blank=True)
+    weight_bucket_g = models.PositiveIntegerField(
+        "Весовая категория, г",
+        help_text="Верхняя граница оплачиваемого веса (г).",
+    )
+    delivery_sum = models.DecimalField(
+        "Стоимость от", max_digits=10, decimal_places=2
+    )
+    period_min = models.PositiveSmallIntegerField(
+        "Срок от, дн.", null=True, blank=True
+    )
+    period_max = models.PositiveSmallIntegerField(
+        "Срок до, дн.", null=True, blank=True
+    )
+    updated_at = models.DateTimeField("Обновлено", db_index=True)
+
+    class Meta:
+        verbose_name = "оценка доставки"
+        verbose_name_plural = "оценки доставки"
+        ordering = ["city_name", "weight_bucket_g"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["city_code", "weight_bucket_g"],
+                name="cdek_estimate_city_bucket_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.city_name or self.city_code}, "
+            f"до {self.weight_bucket_g} г: {self.delivery_sum} ₽"
+        )
+
+
+class CdekStatusEvent(models.Model):
+    """
+    Событие ORDER_STATUS из вебхука СДЭК. Уникальность по заказу, коду
+    и времени статуса отсекает повторные доставки одного события.
+    """
+
+    order_uuid = models.CharField("UUID заказа в СДЭК", max_length=50)
+    cdek_number = models.CharField("Трек-номер", max_length=50, blank=True)
+    code = models.CharField("Код статуса", max_length=50)
+    status_at = models.DateTimeField("Время статуса")
+    city_name = models.CharField("Город", max_length=255, blank=True)
+    is_return = models.BooleanField("Возвратный заказ", default=False)
+    payload = models.JSONField("Тело вебхука", default=dict)
+    received_at = models.DateTimeField("Получено", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "статус заказа СДЭК"
+        verbose_name_plural = "статусы заказов СДЭК"
+        ordering = ["-status_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order_uuid", "code", "status_at"],
+                name="cdek_status_event_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.order_uuid}: {self.code}"
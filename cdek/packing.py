@@ -0,0 +1,144 @@
+"""
+Упаковка единиц товара в коробки перед расчётом и регистрацией в СДЭК.
+
+First-fit decreasing по каталогу коробок: единицы сортируются по объёму
+(по убыванию) и кладутся в первую открытую коробку, куда ещё помещаются;
+коробка при этом подбирается наименьшая из каталога, вмещающая всё её
+содержимое. Если не подходит ни одна открытая коробка — открывается новая.
+Вместимость проверяется по габаритам каждой единицы (с поворотом), по
+суммарному объёму с коэффициентом заполнения и по весу — без полной
+3D-раскладки. Одна единица в коробке и товар, который не входит ни в одну
+коробку каталога, отправляются отдельным местом в собственной упаковке.
+"""
+from dataclasses import dataclass
+from typing import Any
+
+from django.conf import settings
+
+# Доля объёма коробки, которую реально удаётся заполнить.
+FILL_FACTOR = 0.85
+
+# Стандартные коробки СДЭК: габариты в мм, предельный вес в г.
+DEFAULT_BOXES = (
+    {"name": "XS", "length": 170, "width": 120, "height": 90,
+     "max_weight": 500},
+    {"name": "S", "length": 230, "width": 190, "height": 100,
+     "max_weight": 2000},
+    {"name": "M", "length": 330, "width": 250, "height": 150,
+     "max_weight": 5000},
+    {"name": "L", "length": 310, "width": 250, "height": 380,
+     "max_weight": 12000},
+    {"name": "XL", "length": 600, "width": 350, "height": 300,
+     "max_weight": 18000},
+)
+
+
+@dataclass(frozen=True)
+class BoxType:
+    """Тип коробки из каталога (мм, г)."""
+
+    name: str
+    length: int
+    width: int
+    height: int
+    max_weight: int
+
+    @property
+    def dims(self) -> tuple[int, int, int]:
+        return tuple(sorted((self.length, self.width, self.height)))
+
+    @property
+    def volume(self) -> int:
+        return self.length * self.width * self.height
+
+
+def get_box_catalog() -> list[BoxType]:
+    """
+    Каталог коробок от меньшей к большей. Переопределяется настройкой
+    CDEK_PACKING_BOXES (список словарей как в DEFAULT_BOXES).
+    """
+    boxes = getattr(settings, "CDEK_PACKING_BOXES", DEFAULT_BOXES)
+    return sorted(
+        (BoxType(**box) for box in boxes), key=lambda b: b.volume
+    )
+
+
+def _dims(unit: dict[str, Any]) -> tuple[int, int, int]:
+    return tuple(sorted((unit["length"], unit["width"], unit["height"])))
+
+
+def _volume(unit: dict[str, Any]) -> int:
+    return unit["length"] * unit["width"] * unit["height"]
+
+
+def _smallest_box(
+    units: list[dict[str, Any]], catalog: list[BoxType]
+) -> BoxType | None:
+    """Наименьшая коробка, вмещающая все единицы, или None."""
+    volume = sum(_volume(u) for u in units)
+    weight = sum(u["weight"] for u in units)
+    for box in catalog:
+        if weight > box.max_weight or volume > box.volume * FILL_FACTOR:
+            continue
+        if all(
+            all(d <= b for d, b in zip(_dims(u), box.dims)) for u in units
+        ):
+            return box
+    return None
+
+
+def pack_units(
+    units: list[dict[str, Any]],
+    catalog: list[BoxType] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Раскладывает единицы товара по коробкам.
+
+    :param units: Единицы товара: weight (г), length/width/height (мм);
+        остальные поля сохраняются и возвращаются в units мест.
+    :param catalog: Каталог коробок; по умолчанию get_box_catalog().
+    :return: Грузовые места {"weight", "length", "width", "height",
+        "units": [...]}: сначала коробки, затем отдельные места.
+    """
+    if catalog is None:
+        catalog = get_box_catalog()
+    ordered = sorted(
+        units, key=lambda u: (_volume(u), u["weight"]), reverse=True
+    )
+    boxes: list[tuple[BoxType, list[dict[str, Any]]]] = []
+    loose: list[dict[str, Any]] = []
+    for unit in ordered:
+        for i, (_, contents) in enumerate(boxes):
+            box = _smallest_box([*contents, unit], catalog)
+            if box is not None:
+                contents.append(unit)
+                boxes[i] = (box, contents)
+                break
+        else:
+            box = _smallest_box([unit], catalog)
+            if box is None:
+                loose.append(unit)
+            else:
+                boxes.append((box, [unit]))
+
+    packages = []
+    for box, contents in boxes:
+        if len(contents) == 1:
+            loose.append(contents[0])
+            continue
+        packages.append({
+            "weight": sum(u["weight"] for u in contents),
+            "length": box.length,
+            "width": box.width,
+            "height": box.height,
+            "units": contents,
+        })
+    for unit in loose:
+        packages.append({
+            "weight": unit["weight"],
+            "length": unit["length"],
+            "width": unit["width"],
+            "height": unit["height"],
+            "units": [unit],
+        })
+    return packages
@@ -0,0 +1,160 @@
+"""
+Пакетная печать документов СДЭК по многим заказам: накладные (orders)
+и ШК грузовых мест (barcodes).
+
+СДЭК формирует печатную форму асинхронно: POST создаёт задание (не больше
+PRINT_BATCH_SIZE заказов), статус READY означает, что PDF можно скачать.
+Все задания партии создаются сразу и формируются у СДЭК параллельно,
+затем опрашиваются вместе — 200 заказов это два задания и один цикл
+ожидания, а не 200 отдельных печатей.
+
+Из админки печать идёт задачей очереди (cdek.jobs): save_documents
+пишет PDF или zip в закрытое хранилище (CDEK_PRINT_ROOT), откуда файл
+отдаёт админка. В памяти держится не больше одного PDF.
+"""
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+from .client import CdekClient
+
+# Вид печатной формы → параметры задания.
+PRINT_KINDS = {
+    "orders": {"copy_count": 2},
+    "barcodes": {"copy_count": 1, "format": "A4"},
+}
+PRINT_BATCH_SIZE = 100
+PRINT_TIMEOUT = 120  # секунд на формирование всех заданий
+PRINT_POLL_INTERVAL = 2.0
+PRINT_FILE_TTL = timedelta(days=1)  # сколько хранятся готовые файлы
+
+
+class CdekPrintError(Exception):
+    """Печатная форма не сформирована (отказ СДЭК или таймаут)."""
+
+
+def _job_codes(data: dict) -> set[str]:
+    entity = data.get("entity") or {}
+    return {
+        s.get("code") for s in entity.get("statuses") or []
+        if isinstance(s, dict)
+    }
+
+
+def print_filename(kind: str, count: int, stem: str) -> str:
+    """Имя файла печати: PDF или zip, если заказов больше одного задания."""
+    extension = "zip" if count > PRINT_BATCH_SIZE else "pdf"
+    return f"{stem}.{extension}"
+
+
+def get_print_storage() -> FileSystemStorage:
+    """Хранилище готовых файлов печати (не отдаётся nginx как /media/)."""
+    return FileSystemStorage(location=settings.CDEK_PRINT_ROOT)
+
+
+def prepare_print_jobs(
+    client: CdekClient,
+    kind: str,
+    order_uuids: list[str],
+    *,
+    timeout: float = PRINT_TIMEOUT,
+    poll_interval: float = PRINT_POLL_INTERVAL,
+) -> list[str]:
+    """
+    Создаёт задания печати kind по заказам order_uuids (по
+    PRINT_BATCH_SIZE в задании) и ждёт их готовности. Возвращает UUID
+    заданий в порядке заказов.
+
+    :raises CdekAPIError: ошибка API СДЭК.
+    :raises CdekPrintError: СДЭК отклонил задание или не успел за timeout.
+    """
+    options = PRINT_KINDS[kind]
+    jobs = []
+    for start in range(0, len(order_uuids), PRINT_BATCH_SIZE):
+        chunk = order_uuids[start:start + PRINT_BATCH_SIZE]
+        result = client.create_print_job(kind, chunk, **options)
+        job_uuid = (result.get("entity") or {}).get("uuid")
+        if not job_uuid:
+            raise CdekPrintError(
+                f"СДЭК не принял задание печати: {result.get('requests')}"
+            )
+        jobs.append(job_uuid)
+
+    pending = list(jobs)
+    deadline = time.monotonic() + timeout
+    while pending:
+        for job_uuid in list(pending):
+            codes = _job_codes(client.get_print_job(kind, job_uuid))
+            if "READY" in codes:
+                pending.remove(job_uuid)
+            elif codes & {"INVALID", "REMOVED"}:
+                raise CdekPrintError(
+                    f"СДЭК не сформировал печатную форму {job_uuid}"
+                )
+        if not pending:
+            break
+        if time.monotonic() >= deadline:
+            raise CdekPrintError(
+                f"Печатные формы не готовы за {timeout:.0f} с"
+            )
+        time.sleep(poll_interval)
+    return jobs
+
+
+def save_documents(
+    client: CdekClient,
+    kind: str,
+    order_uuids: list[str],
+    filename: str,
+    *,
+    timeout: float = PRINT_TIMEOUT,
+    poll_interval: float = PRINT_POLL_INTERVAL,
+) -> str:
+    """
+    Формирует печатные формы и сохраняет их в хранилище печати под именем
+    filename (см. print_filename): один PDF или zip из PDF по заданиям.
+    PDF скачиваются по одному во временный файл. Попутно удаляет файлы
+    старше PRINT_FILE_TTL. Возвращает имя сохранённого файла.
+
+    :raises CdekAPIError: ошибка API СДЭК.
+    :raises CdekPrintError: СДЭК отклонил задание или не успел за timeout.
+    """
+    jobs = prepare_print_jobs(
+        client,
+        kind,
+        order_uuids,
+        timeout=timeout,
+        poll_interval=poll_interval,
+    )
+    storage = get_print_storage()
+    _delete_expired(storage)
+    with tempfile.TemporaryFile() as tmp:
+        if filename.endswith(".zip"):
+            stem = filename.removesuffix(".zip")
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as archive:
+                for number, job_uuid in enumerate(jobs, start=1):
+                    archive.writestr(
+                        f"{stem}-{number}.pdf",
+                        client.download_print_job(kind, job_uuid),
+                    )
+        else:
+            tmp.write(client.download_print_job(kind, jobs[0]))
+        tmp.seek(0)
+        # Повтор задачи после сбоя перезаписывает файл, а не плодит копии.
+        storage.delete(filename)
+        return storage.save(filename, File(tmp))
+
+
+def _delete_expired(storage: FileSystemStorage) -> None:
+    if not storage.exists(""):
+        return
+    expired_before = timezone.now() - PRINT_FILE_TTL
+    for name in storage.listdir("")[1]:
+        if storage.get_modified_time(name) < expired_before:
+            storage.delete(name)
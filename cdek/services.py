@@ -1,20 +1,49 @@
 """
 Сервисы расчёта доставки СДЭК по корзине.
-Каждый товар — отдельная коробка; при quantity > 1 — несколько одинаковых мест.
+Единицы товара раскладываются по коробкам (cdek.packing) — одинаково
+для расчёта стоимости и для регистрации заказа.
 """
+import hashlib
+import json
 import logging
+import math
+import time
+from bisect import bisect_left
+import uuid
 from decimal import Decimal
-from typing import Any
+from functools import lru_cache
+from typing import Any, Callable
 
 from django.conf import settings
 from django.core.cache import cache
 
+from .city_index import CityIndex
 from .client import CdekAPIError, CdekClient, TARIFF_WAREHOUSE_DOOR
+from .models import CdekCity, CdekOffice, DeliveryEstimate
+from .packing import pack_units
 
 logger = logging.getLogger(__name__)
 
-CITIES_CACHE_KEY = "cdek_cities_ru"
-CITIES_CACHE_TIMEOUT = 86400  # 24 часа
+# Версия справочника городов: меняется при каждой синхронизации,
+# по ней воркеры понимают, что индекс пора перестроить.
+CITIES_VERSION_CACHE_KEY = "cdek_cities_ru_version"
+QUOTE_CACHE_KEY_PREFIX = "cdek_quote_"
+QUOTE_CACHE_TIMEOUT = 900  # 15 минут
+QUOTE_LOCK_TIMEOUT = 15  # секунд; страховка, если считающий процесс упал
+QUOTE_WAIT_TIMEOUT = 3.0  # сколько ждать расчёт, который делает другой
+QUOTE_WAIT_STEP = 0.05
+# Шаги округления посылки для кэша расчётов: габариты СДЭК принимает
+# в целых сантиметрах, вес тарифицирует с шагом не мельче 100 г.
+PROFILE_WEIGHT_STEP_G = 100
+PROFILE_SIZE_STEP_MM = 10
+
+OFFICES_BBOX_LIMIT = 1000
+OFFICES_NEAREST_LIMIT = 50
+# Начальный радиус поиска ближайших офисов (км) и число расширений.
+NEAREST_START_RADIUS_KM = 5
+NEAREST_MAX_EXPANSIONS = 10
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
 
 # Дефолтные габариты и вес, если у товара не заданы (мм и г).
 # СДЭК считает «вес к оплате» как максимальный
@@ -24,40 +53,62 @@ DEFAULT_LENGTH_MM = 100
 DEFAULT_WIDTH_MM = 100
 DEFAULT_HEIGHT_MM = 100
 
+# Весовые категории оценки доставки на странице товара (г).
+ESTIMATE_WEIGHT_BUCKETS_G = (
+    500, 1000, 2000, 3000, 5000, 10000, 15000, 20000, 30000,
+)
+# Объёмный вес: (Д×Ш×В см)/5000 кг — то же, что (Д×Ш×В мм)/5000 г.
+VOLUMETRIC_DIVISOR = 5000
+
+
+@lru_cache(maxsize=4)
+def _client_for(account: str, secure: str, test: bool) -> CdekClient:
+    """Один клиент на процесс для набора учётных данных."""
+    return CdekClient(account=account, secure=secure, test=test)
+
 
 def get_client() -> CdekClient | None:
     """Возвращает клиент СДЭК из настроек
     или None, если интеграция отключена.
+    Клиент переиспользуется между запросами (токен — в общем кэше).
     """
     account = getattr(settings, "CDEK_ACCOUNT", "") or ""
     secure = getattr(settings, "CDEK_SECURE", "") or ""
     if not account or not secure:
         return None
     test = getattr(settings, "CDEK_TEST", True)
-    return CdekClient(account=account, secure=secure, test=test)
+    return _client_for(account, secure, bool(test))
+
+
+def product_unit(product) -> dict[str, int]:
+    """Единица товара для упаковки: вес (г) и габариты (мм) с дефолтами."""
+    return {
+        "weight": product.weight_g or DEFAULT_WEIGHT_G,
+        "length": product.length_mm or DEFAULT_LENGTH_MM,
+        "width": product.width_mm or DEFAULT_WIDTH_MM,
+        "height": product.height_mm or DEFAULT_HEIGHT_MM,
+    }
 
 
 def cart_items_to_packages(cart_items) -> list[dict[str, int]]:
     """
     Преобразует позиции корзины в список грузовых мест для СДЭК.
-    Один товар = одна коробка; при quantity > 1 — столько же одинаковых мест.
+    Единицы товара раскладываются по коробкам каталога (pack_units),
+    поэтому 10 одинаковых товаров — это одна-две коробки, а не 10 мест.
 
     :param cart_items:
         QuerySet или список CartItem с select_related("variant__product").
     :return: Список словарей
         {"weight": г, "length": мм, "width": мм, "height": мм}.
     """
-    packages = []
+    units = []
     for item in cart_items:
-        product = item.variant.product
-        for _ in range(item.quantity):
-            packages.append({
-                "weight": product.weight_g or DEFAULT_WEIGHT_G,
-                "length": product.length_mm or DEFAULT_LENGTH_MM,
-                "width": product.width_mm or DEFAULT_WIDTH_MM,
-                "height": product.height_mm or DEFAULT_HEIGHT_MM,
-            })
-    return packages
+        unit = product_unit(item.variant.product)
+        units.extend([unit] * item.quantity)
+    return [
+        {key: package[key] for key in ("weight", "length", "width", "height")}
+        for package in pack_units(units)
+    ]
 
 
 def _get_from_address() -> str:
@@ -65,6 +116,120 @@ def _get_from_address() -> str:
     return (getattr(settings, "CDEK_FROM_ADDRESS", "") or "").strip()
 
 
+def _round_up(value: int, step: int) -> int:
+    return -(-max(1, int(value)) // step) * step
+
+
+def package_profile(packages: list[dict[str, int]]) -> list[dict[str, int]]:
+    """
+    Канонический профиль посылки для расчёта доставки: вес каждого места
+    округлён вверх до PROFILE_WEIGHT_STEP_G, габариты — до целых
+    сантиметров и упорядочены по убыванию, места отсортированы.
+    Расчёт делается по профилю, поэтому одна закэшированная цена подходит
+    всем корзинам с тем же профилем и не ниже точной.
+    """
+    profile = []
+    for p in packages:
+        length, width, height = sorted(
+            (
+                _round_up(p["length"], PROFILE_SIZE_STEP_MM),
+                _round_up(p["width"], PROFILE_SIZE_STEP_MM),
+                _round_up(p["height"], PROFILE_SIZE_STEP_MM),
+            ),
+            reverse=True,
+        )
+        profile.append({
+            "weight": _round_up(p["weight"], PROFILE_WEIGHT_STEP_G),
+            "length": length,
+            "width": width,
+            "height": height,
+        })
+    profile.sort(
+        key=lambda p: (p["weight"], p["length"], p["width"], p["height"])
+    )
+    return profile
+
+
+def packages_fingerprint(packages: list[dict[str, int]]) -> str:
+    """
+    Отпечаток содержимого корзины для кэша расчётов: отсортированный набор
+    мест (вес и габариты). Не зависит от порядка позиций; при изменении
+    габаритов товара в каталоге отпечаток меняется сам.
+    """
+    canonical = sorted(
+        (p["weight"], p["length"], p["width"], p["height"])
+        for p in packages
+    )
+    return hashlib.sha1(json.dumps(canonical).encode()).hexdigest()
+
+
+def quote_cache_key(
+    packages: list[dict[str, int]],
+    from_city_code: int,
+    to_city_code: int,
+    tariff_code: int | None = None,
+) -> str:
+    """
+    Ключ кэша расчёта: (профиль посылки, откуда, куда, тариф или весь
+    список, адрес отправки).
+    """
+    profile = packages_fingerprint(package_profile(packages))
+    address = hashlib.sha1(_get_from_address().encode()).hexdigest()[:8]
+    return (
+        f"{QUOTE_CACHE_KEY_PREFIX}{profile}_"
+        f"{from_city_code}_{to_city_code}_{tariff_code or 'list'}_{address}"
+    )
+
+
+def _cached_quote(
+    cache_key: str,
+    compute: Callable[[], Any],
+    timeout: int = QUOTE_CACHE_TIMEOUT,
+    *,
+    refresh: bool = False,
+) -> Any:
+    """
+    Результат расчёта из кэша или compute(). Одновременные промахи по
+    одному ключу схлопываются: в API идёт только процесс, взявший
+    блокировку (cache.add), остальные ждут его результат в кэше.
+    Пустой результат (ошибка API) не кэшируется.
+
+    refresh=True — пересчитать, не читая кэш; прежняя запись заменяется
+    только успешным результатом.
+    """
+    if refresh:
+        result = compute()
+        if result:
+            cache.set(cache_key, result, timeout)
+        return result
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    lock_key = f"{cache_key}_lock"
+    locked = cache.add(lock_key, 1, QUOTE_LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + QUOTE_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(QUOTE_WAIT_STEP)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+            # Блокировку сняли без результата (ошибка API) — считаем сами.
+            locked = cache.add(lock_key, 1, QUOTE_LOCK_TIMEOUT)
+            if locked:
+                break
+        else:
+            logger.warning("CDEK quote by another worker timed out")
+    try:
+        result = compute()
+        if result:
+            cache.set(cache_key, result, timeout)
+        return result
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+
 def calculate_delivery(
     from_city_code: int,
     to_city_code: int,
@@ -82,32 +247,65 @@ def calculate_delivery(
     :param tariff_code: Код тарифа.
     :return:
         Словарь с delivery_sum (руб), period_min, period_max (дни)...,
-        или None при ошибке.
+        или None при ошибке. Считается по профилю посылки
+        (package_profile); успешные ответы кэшируются на
+        QUOTE_CACHE_TIMEOUT по профилю и маршруту.
     """
-    client = get_client()
-    if not client:
+    def compute():
+        client = get_client()
+        if not client:
+            logger.debug(
+                "CDEK client not configured, skipping delivery calculation"
+            )
+            return None
+        try:
+            return client.calculate_tariff(
+                from_city_code=from_city_code,
+                to_city_code=to_city_code,
+                packages=package_profile(packages),
+                tariff_code=tariff_code,
+                from_address=_get_from_address(),
+            )
+        except CdekAPIError as e:
+            logger.warning("CDEK calculate_delivery failed: %s", e)
+            return None
+
+    cache_key = quote_cache_key(
+        packages, from_city_code, to_city_code, tariff_code
+    )
+    return _cached_quote(cache_key, compute)
+
+
+def _parse_tarifflist(data: Any) -> list[dict[str, Any]]:
+    """Список тарифов из ответа tarifflist (форма ответа бывает разной)."""
+    # Ответ API: массив тарифов может быть в tariff_codes, tariffs или в корне
+    if isinstance(data, list):
+        raw = data
+    else:
+        raw = data.get("tariff_codes") or data.get("tariffs")
+    if not isinstance(raw, list):
         logger.debug(
-            "CDEK client not configured, skipping delivery calculation"
-        )
-        return None
-    try:
-        result = client.calculate_tariff(
-            from_city_code=from_city_code,
-            to_city_code=to_city_code,
-            packages=packages,
-            tariff_code=tariff_code,
-            from_address=_get_from_address(),
+            "CDEK tarifflist unexpected response keys: %s",
+            list(data.keys()) if isinstance(data, dict) else "not a dict"
         )
-        return result
-    except CdekAPIError as e:
-        logger.warning("CDEK calculate_delivery failed: %s", e)
-        return None
+        return []
+    # Элементы могут быть объектами с полями tariff_code, tariff_name и т.д.
+    result = []
+    for item in raw:
+        if isinstance(item, dict):
+            result.append(item)
+        elif isinstance(item, (int, float)):
+            result.append({"tariff_code": int(item)})
+    return result
 
 
 def calculate_tarifflist(
     from_city_code: int,
     to_city_code: int,
     packages: list[dict[str, int]],
+    *,
+    cache_timeout: int = QUOTE_CACHE_TIMEOUT,
+    refresh: bool = False,
 ) -> list[dict[str, Any]]:
     """
     Возвращает список тарифов СДЭК между городами (tarifflist).
@@ -116,94 +314,92 @@ def calculate_tarifflist(
     :param to_city_code: Код города получателя (СДЭК).
     :param packages:
         Список грузовых мест (weight в г, length/width/height в мм).
+    :param cache_timeout: Срок хранения результата в кэше (сек).
+    :param refresh: Пересчитать, не читая кэш (ошибка API не затирает
+        прежнюю запись).
     :return:
         Список тарифов с полями tariff_code, tariff_name, delivery_sum,
-        period_min, period_max и др.
+        period_min, period_max и др. Считается по профилю посылки, как
+        и расчёт одного тарифа; непустой список кэшируется, одновременные
+        одинаковые запросы уходят в API один раз.
     """
-    client = get_client()
-    if not client:
-        logger.debug(
-            "CDEK client not configured, skipping tarifflist calculation"
-        )
-        return []
-    try:
-        data = client.calculate_tariff_list(
-            from_city_code=from_city_code,
-            to_city_code=to_city_code,
-            packages=packages,
-            from_address=_get_from_address(),
-        )
-    except CdekAPIError as e:
-        logger.warning("CDEK calculate_tarifflist failed: %s", e)
-        return []
+    def compute():
+        client = get_client()
+        if not client:
+            logger.debug(
+                "CDEK client not configured, skipping tarifflist calculation"
+            )
+            return []
+        try:
+            data = client.calculate_tariff_list(
+                from_city_code=from_city_code,
+                to_city_code=to_city_code,
+                packages=package_profile(packages),
+                from_address=_get_from_address(),
+            )
+        except CdekAPIError as e:
+            logger.warning("CDEK calculate_tarifflist failed: %s", e)
+            return []
+        return _parse_tarifflist(data)
 
-    # Ответ API: массив тарифов может быть в tariff_codes, tariffs или в корне
-    raw = data.get("tariff_codes") or data.get("tariffs")
-    if raw is None and isinstance(data, list):
-        raw = data
-    if not isinstance(raw, list):
-        logger.debug(
-            "CDEK tarifflist unexpected response keys: %s",
-            list(data.keys()) if isinstance(data, dict) else "not a dict"
-        )
-        return []
-    # Элементы могут быть объектами с полями tariff_code, tariff_name и т.д.
-    result = []
-    for item in raw:
-        if isinstance(item, dict):
-            result.append(item)
-        elif isinstance(item, (int, float)):
-            result.append({"tariff_code": int(item)})
-    return result
+    cache_key = quote_cache_key(packages, from_city_code, to_city_code)
+    return _cached_quote(cache_key, compute, cache_timeout, refresh=refresh)
 
 
-def get_cities_cached() -> list[dict]:
+def get_cities() -> list[dict]:
     """
-    Список городов СДЭК (РФ), закэшированный на 24 часа.
-    Возвращает список словарей с ключами code, city, region и др.
+    Список городов СДЭК (РФ) из локального справочника CdekCity.
+    Справочник заполняет команда sync_cdek_cities; пользовательские запросы
+    к API за полным списком городов не обращаются.
     """
-    cities = cache.get(CITIES_CACHE_KEY)
-    if cities is not None:
-        return cities
-    client = get_client()
-    if not client:
-        return []
-    try:
-        cities = client.get_cities(country_code="RU")
-        if isinstance(cities, list):
-            cache.set(CITIES_CACHE_KEY, cities, CITIES_CACHE_TIMEOUT)
-            return cities
-    except CdekAPIError as e:
-        logger.warning("CDEK get_cities for cache failed: %s", e)
-    return []
+    return list(CdekCity.objects.values("code", "city", "region"))
+
+
+def bump_cities_version() -> None:
+    """Сообщает воркерам, что справочник обновлён и индекс пора перестроить."""
+    cache.set(CITIES_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+_city_index: CityIndex | None = None
+_city_index_version: str | None = None
+
+
+def get_city_index() -> CityIndex:
+    """
+    Индекс городов текущего воркера. Перестраивается, только когда
+    в кэше сменилась версия справочника; на каждый запрос читается лишь
+    короткий ключ версии, а не весь список городов.
+    """
+    global _city_index, _city_index_version
+    version = cache.get(CITIES_VERSION_CACHE_KEY)
+    if (
+        _city_index is not None
+        and version is not None
+        and version == _city_index_version
+    ):
+        return _city_index
+    index = CityIndex(get_cities())
+    if not len(index):
+        # Справочник ещё не загружен — индекс не закрепляем.
+        return index
+    if version is None:
+        # Версия пропала из кэша (например, после перезапуска Redis).
+        version = uuid.uuid4().hex
+        if not cache.add(CITIES_VERSION_CACHE_KEY, version, None):
+            return index
+    _city_index, _city_index_version = index, version
+    return index
 
 
 def search_cities(query: str, limit: int = 30) -> list[dict]:
     """
-    Поиск городов по названию (по подстроке, без учёта регистра).
-    Возвращает до limit совпадений с полями code, city, region.
+    Поиск городов по названию или региону (без учёта регистра и «ё»).
+    Возвращает до limit совпадений с полями code, city, region;
+    сначала точные совпадения и начало названия.
     """
     if not query or not query.strip():
         return []
-    q = query.strip().lower()
-    cities = get_cities_cached()
-    result = []
-    for c in cities:
-        city_name = (c.get("city") or c.get("name") or "").lower()
-        region_name = (c.get("region") or "").lower()
-        if q in city_name or q in region_name:
-            try:
-                code = int(c.get("code"))
-            except (TypeError, ValueError):
-                continue
-            result.append({
-                "code": code,
-                "city": c.get("city") or c.get("name") or "",
-                "region": c.get("region") or "",
-            })
-            if len(result) >= limit:
-                break
-    return result
+    return get_city_index().search(query, limit=limit)
 
 
 def search_city_code_by_address_parts(address: str) -> int | None:
@@ -252,3 +448,186 @@ def delivery_sum_to_decimal(data: dict[str, Any] | None) -> Decimal:
         return Decimal(str(data["delivery_sum"]))
     except Exception:
         return Decimal("0")
+
+
+def billable_weight_g(unit: dict[str, int]) -> int:
+    """Оплачиваемый вес места (г): максимум из физического и объёмного."""
+    volume_mm3 = unit["length"] * unit["width"] * unit["height"]
+    return max(int(unit["weight"]), volume_mm3 // VOLUMETRIC_DIVISOR)
+
+
+def weight_bucket(grams: int) -> int | None:
+    """Весовая категория (верхняя граница, г) или None, если тяжелее всех."""
+    pos = bisect_left(ESTIMATE_WEIGHT_BUCKETS_G, grams)
+    if pos == len(ESTIMATE_WEIGHT_BUCKETS_G):
+        return None
+    return ESTIMATE_WEIGHT_BUCKETS_G[pos]
+
+
+def bucket_package(bucket_g: int) -> dict[str, int]:
+    """
+    Эталонное место категории для расчёта: вес равен границе категории,
+    куб с объёмным весом не больше неё.
+    """
+    side_mm = int((bucket_g * VOLUMETRIC_DIVISOR) ** (1 / 3))
+    return {
+        "weight": bucket_g,
+        "length": side_mm,
+        "width": side_mm,
+        "height": side_mm,
+    }
+
+
+def get_delivery_estimate(product, city_code: int) -> DeliveryEstimate | None:
+    """
+    Оценка доставки одной единицы товара в город из локальной таблицы
+    DeliveryEstimate — один запрос к БД, без обращения к СДЭК.
+    """
+    if not city_code:
+        return None
+    bucket = weight_bucket(billable_weight_g(product_unit(product)))
+    if bucket is None:
+        return None
+    return DeliveryEstimate.objects.filter(
+        city_code=city_code, weight_bucket_g=bucket
+    ).first()
+
+
+def _office_to_dict(office: CdekOffice) -> dict[str, Any]:
+    return {
+        "code": office.code,
+        "name": office.name,
+        "type": office.type,
+        "city_code": office.city_code,
+        "city": office.city,
+        "address": office.address,
+        "work_time": office.work_time,
+        "latitude": office.latitude,
+        "longitude": office.longitude,
+    }
+
+
+def _offices_qs(office_type: str | None = None):
+    qs = CdekOffice.objects.filter(is_handout=True)
+    if office_type:
+        qs = qs.filter(type=office_type)
+    return qs
+
+
+def widget_offices(
+    *,
+    city_code: int | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    office_type: str | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Офисы выдачи в формате ответа GET /v2/deliverypoints — так их ждёт
+    виджет СДЭК (servicePath, action=offices). Отвечаем из локальной
+    таблицы, без запроса к СДЭК. Нужен город или bbox (min_lat, min_lon,
+    max_lat, max_lon, не больше OFFICES_BBOX_LIMIT офисов) — всю таблицу
+    не отдаём.
+    """
+    if not city_code and bbox is None:
+        return []
+    qs = _offices_qs(office_type)
+    if city_code:
+        qs = qs.filter(city_code=city_code)
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        qs = qs.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lon, max_lon),
+        )[:OFFICES_BBOX_LIMIT]
+    return [
+        {
+            "code": office.code,
+            "name": office.name,
+            "type": office.type,
+            "work_time": office.work_time,
+            "is_handout": office.is_handout,
+            "location": {
+                "city_code": office.city_code,
+                "city": office.city,
+                "address": office.address,
+                "address_full": ", ".join(
+                    part for part in (office.city, office.address) if part
+                ),
+                "latitude": office.latitude,
+                "longitude": office.longitude,
+            },
+        }
+        for office in qs
+    ]
+
+
+def offices_in_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    *,
+    office_type: str | None = None,
+    limit: int = OFFICES_BBOX_LIMIT,
+) -> list[dict[str, Any]]:
+    """
+    Офисы выдачи внутри прямоугольника карты (по индексу широта/долгота).
+    Возвращает не больше limit офисов.
+    """
+    qs = _offices_qs(office_type).filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon),
+    )
+    return [_office_to_dict(o) for o in qs[:limit]]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние по поверхности Земли в километрах."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def nearest_offices(
+    latitude: float,
+    longitude: float,
+    *,
+    office_type: str | None = None,
+    limit: int = 10,
+) -> list[dict[str, Any]]:
+    """
+    limit ближайших к точке офисов с полем distance_km.
+    Ищет в квадрате вокруг точки, удваивая радиус, пока внутри вписанного
+    круга не наберётся limit офисов, — так каждый шаг идёт по индексу,
+    а не по всей таблице.
+    """
+    radius = NEAREST_START_RADIUS_KM
+    lon_scale = max(math.cos(math.radians(latitude)), 0.01)
+    ranked: list[tuple[float, CdekOffice]] = []
+    for _ in range(NEAREST_MAX_EXPANSIONS):
+        d_lat = radius / KM_PER_DEGREE
+        d_lon = radius / (KM_PER_DEGREE * lon_scale)
+        candidates = _offices_qs(office_type).filter(
+            latitude__range=(latitude - d_lat, latitude + d_lat),
+            longitude__range=(longitude - d_lon, longitude + d_lon),
+        )
+        ranked = sorted(
+            (
+                (haversine_km(latitude, longitude, o.latitude, o.longitude), o)
+                for o in candidates
+            ),
+            key=lambda pair: pair[0],
+        )
+        inside = [pair for pair in ranked if pair[0] <= radius]
+        if len(inside) >= limit:
+            ranked = inside
+            break
+        radius *= 2
+    return [
+        {**_office_to_dict(office), "distance_km": round(distance, 2)}
+        for distance, office in ranked[:limit]
+    ]
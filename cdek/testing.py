@@ -0,0 +1,166 @@
+"""
+Локальный сервер-заглушка API СДЭК для тестов.
+
+Поднимает HTTP-сервер на 127.0.0.1 в отдельном потоке и отвечает на
+запросы, которые делает CdekClient: токен, заказы, подписки на вебхуки,
+печатные формы.
+Клиент направляется на него через base_url:
+
+    with FakeCdekServer() as server:
+        client = server.client()
+        server.orders["uuid-1"] = {"entity": {"uuid": "uuid-1"}}
+        client.get_order("uuid-1")
+
+Тело вебхука ORDER_STATUS в формате СДЭК собирает order_status_payload().
+"""
+import json
+import threading
+import uuid as uuid_lib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from .client import CdekClient
+
+
+def order_status_payload(
+    order_uuid: str,
+    code: str,
+    status_date_time: str = "2026-01-15T12:00:00+0300",
+    *,
+    cdek_number: str = "",
+    city_name: str = "Москва",
+    is_return: bool = False,
+) -> dict[str, Any]:
+    """Тело вебхука ORDER_STATUS, как его присылает СДЭК."""
+    return {
+        "type": "ORDER_STATUS",
+        "date_time": status_date_time,
+        "uuid": order_uuid,
+        "attributes": {
+            "is_return": is_return,
+            "cdek_number": cdek_number,
+            "code": code,
+            "status_date_time": status_date_time,
+            "city_name": city_name,
+        },
+    }
+
+
+class FakeCdekServer:
+    """
+    Заглушка API СДЭК. Состояние — в атрибутах: orders (uuid → ответ
+    GET /v2/orders/{uuid}), webhooks (подписки), print_jobs (uuid задания
+    печати → заказы), requests (журнал запросов: метод, путь, тело).
+    Задание печати становится READY после print_polls опросов.
+    """
+
+    def __init__(self, print_polls: int = 1):
+        self.orders: dict[str, dict] = {}
+        self.webhooks: list[dict] = []
+        self.print_jobs: dict[str, list[str]] = {}
+        self.print_polls = print_polls
+        self._polls: dict[str, int] = {}
+        self.requests: list[tuple[str, str, Any]] = []
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def client(self) -> CdekClient:
+        return CdekClient("test", "secret", base_url=self.url)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def handle(self, method: str, path: str, body: Any):
+        """Возвращает (HTTP-статус, JSON-ответ или bytes) на запрос."""
+        self.requests.append((method, path, body))
+        if path == "/v2/oauth/token":
+            return 200, {"access_token": "fake-token", "expires_in": 3600}
+        if path == "/v2/webhooks":
+            if method == "GET":
+                return 200, self.webhooks
+            entity = {"uuid": str(uuid_lib.uuid4()), **body}
+            self.webhooks.append(entity)
+            return 200, {
+                "entity": {"uuid": entity["uuid"]},
+                "requests": [{"type": "CREATE", "state": "ACCEPTED"}],
+            }
+        if path.startswith("/v2/print/"):
+            return self._handle_print(method, path, body)
+        if method == "GET" and path.startswith("/v2/orders/"):
+            data = self.orders.get(path.rsplit("/", 1)[-1])
+            if data is None:
+                return 404, {"errors": [{"code": "v2_entity_not_found"}]}
+            return 200, data
+        return 404, {"errors": [{"code": "fake_not_implemented"}]}
+
+    def _handle_print(self, method: str, path: str, body: Any):
+        parts = path.split("/")  # ["", "v2", "print", kind, uuid?]
+        if method == "POST" and len(parts) == 4:
+            job_uuid = str(uuid_lib.uuid4())
+            self.print_jobs[job_uuid] = [
+                o["order_uuid"] for o in body.get("orders", [])
+            ]
+            return 202, {
+                "entity": {"uuid": job_uuid},
+                "requests": [{"type": "CREATE", "state": "ACCEPTED"}],
+            }
+        job_uuid = parts[4].removesuffix(".pdf") if len(parts) == 5 else ""
+        if job_uuid not in self.print_jobs:
+            return 404, {"errors": [{"code": "v2_entity_not_found"}]}
+        if parts[4].endswith(".pdf"):
+            orders = ",".join(self.print_jobs[job_uuid])
+            return 200, f"%PDF-1.4 {parts[3]} {orders}".encode()
+        self._polls[job_uuid] = self._polls.get(job_uuid, 0) + 1
+        ready = self._polls[job_uuid] >= self.print_polls
+        statuses = [
+            {"code": "ACCEPTED"},
+            {"code": "READY" if ready else "PROCESSING"},
+        ]
+        return 200, {"entity": {"uuid": job_uuid, "statuses": statuses}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length).decode() if length else ""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = raw
+                status, data = server.handle(method, self.path, body)
+                if isinstance(data, bytes):
+                    content, content_type = data, "application/pdf"
+                else:
+                    content = json.dumps(data).encode()
+                    content_type = "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
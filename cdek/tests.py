@@ -1,12 +1,36 @@
 """
 Тесты интеграции и сервисов CDEK.
 """
+import threading
+import time
+import zipfile
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
 
 import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
 
+from catalog.models import Category, Product, ProductVariant
+from cdek.city_index import CityIndex
 from cdek.client import CdekAPIError, CdekClient
+from cdek.models import (
+    CdekCity,
+    CdekOffice,
+    CdekStatusEvent,
+    DeliveryEstimate,
+)
+from cdek.packing import BoxType, pack_units
+from cdek.jobs import enqueue_print
+from cdek.printing import print_filename, save_documents
+from cdek.testing import FakeCdekServer, order_status_payload
 from cdek import services as cdek_services
+from jobs.models import Job
+from orders.models import Order, OrderItem
 
 
 class TestCdekClientHelpers:
@@ -25,6 +49,116 @@ class TestCdekClientHelpers:
         ]
 
 
+class TestCdekClientToken:
+    """Общий кэш OAuth-токена СДЭК."""
+
+    class _Response:
+        status_code = 200
+        content = b"{}"
+
+        def __init__(self, payload):
+            self._payload = payload
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self._payload
+
+    def test_token_shared_between_clients(self, monkeypatch):
+        calls = []
+
+        def fake_post(session, url, **kwargs):
+            calls.append(url)
+            return self._Response(
+                {"access_token": "tok", "expires_in": 3600}
+            )
+
+        monkeypatch.setattr("requests.Session.post", fake_post)
+        first = CdekClient("account", "secret", test=True)
+        second = CdekClient("account", "secret", test=True)
+
+        assert first._get_token() == "tok"
+        assert second._get_token() == "tok"
+        assert len(calls) == 1
+
+    def test_waits_for_refresh_by_another_worker(self, monkeypatch):
+        client = CdekClient("account", "secret", test=True)
+        cache.add(client._token_lock_key, 1)
+
+        def other_worker_refreshed(seconds):
+            cache.set(
+                client._token_cache_key,
+                {"token": "shared", "expires_at": time.time() + 600},
+            )
+
+        monkeypatch.setattr("cdek.client.time.sleep", other_worker_refreshed)
+        monkeypatch.setattr(
+            "requests.Session.post",
+            lambda *a, **kw: pytest.fail("токен должен прийти из кэша"),
+        )
+        assert client._get_token() == "shared"
+
+    def test_get_client_reuses_instance(self, settings):
+        settings.CDEK_ACCOUNT = "account"
+        settings.CDEK_SECURE = "secret"
+        assert cdek_services.get_client() is cdek_services.get_client()
+
+
+class TestPacking:
+    """Упаковка единиц товара в коробки (first-fit decreasing)."""
+
+    CATALOG = [
+        BoxType("S", 200, 200, 100, max_weight=2000),
+        BoxType("M", 400, 300, 200, max_weight=5000),
+    ]
+
+    def _unit(self, weight=300, length=100, width=100, height=50, **extra):
+        return {
+            "weight": weight,
+            "length": length,
+            "width": width,
+            "height": height,
+            **extra,
+        }
+
+    def test_units_consolidated_into_smallest_box(self):
+        packages = pack_units([self._unit()] * 3, self.CATALOG)
+        assert len(packages) == 1
+        assert packages[0]["length"] == 200
+        assert packages[0]["weight"] == 900
+        assert len(packages[0]["units"]) == 3
+
+    def test_weight_limit_opens_next_box(self):
+        heavy = self._unit(weight=1500)
+        packages = pack_units([heavy] * 6, self.CATALOG)
+        assert [p["weight"] for p in packages] == [4500, 4500]
+
+    def test_single_and_oversized_units_ship_as_is(self):
+        long_unit = self._unit(length=900, tag="long")
+        packages = pack_units([long_unit, self._unit(tag="small")])
+        assert sorted(
+            (p["length"], p["units"][0]["tag"]) for p in packages
+        ) == [(100, "small"), (900, "long")]
+
+    def test_cart_packages_use_box_catalog(self, settings):
+        settings.CDEK_PACKING_BOXES = [
+            {"name": "S", "length": 200, "width": 200, "height": 100,
+             "max_weight": 2000},
+        ]
+        product = SimpleNamespace(
+            weight_g=300, length_mm=100, width_mm=100, height_mm=50
+        )
+        item = SimpleNamespace(
+            variant=SimpleNamespace(product=product), quantity=10
+        )
+        packages = cdek_services.cart_items_to_packages([item])
+        assert packages == [
+            {"weight": 1800, "length": 200, "width": 200, "height": 100},
+            {"weight": 1200, "length": 200, "width": 200, "height": 100},
+        ]
+
+
 class TestDeliverySumToDecimal:
     """Тесты преобразования delivery_sum в Decimal."""
 
@@ -120,7 +254,8 @@ class TestCalculateDeliveryAndTarifflist:
             {"tariff_code": 137},
         ]
 
-        # Вариант 2: ключ tariffs
+        # Вариант 2: ключ tariffs (первый ответ лежит в кэше расчётов)
+        cache.clear()
         payload2 = {
             "tariffs": [
                 {
@@ -135,6 +270,87 @@ class TestCalculateDeliveryAndTarifflist:
         result2 = cdek_services.calculate_tarifflist(137, 44, [])
         assert result2 == payload2["tariffs"]
 
+    def test_calculate_delivery_reuses_cached_quote(
+        self,
+        settings,
+        monkeypatch
+    ):
+        """Тот же набор мест и маршрут не вызывает API повторно."""
+        calls = []
+
+        class DummyClient:
+            def calculate_tariff(self, **kwargs):
+                calls.append(kwargs["tariff_code"])
+                return {"delivery_sum": 300}
+
+        monkeypatch.setattr(cdek_services, "get_client", lambda: DummyClient())
+        small = {"weight": 200, "length": 50, "width": 50, "height": 50}
+        big = {"weight": 900, "length": 300, "width": 200, "height": 100}
+
+        cdek_services.calculate_delivery(137, 44, [small, big], tariff_code=1)
+        result = cdek_services.calculate_delivery(
+            137, 44, [big, small], tariff_code=1
+        )
+        cdek_services.calculate_delivery(137, 44, [small], tariff_code=1)
+        cdek_services.calculate_delivery(137, 44, [small], tariff_code=2)
+
+        assert result == {"delivery_sum": 300}
+        assert calls == [1, 1, 2]
+
+    def test_tarifflist_shared_by_package_profile(self, monkeypatch):
+        """Корзины с одним профилем посылки делят один расчёт."""
+        sent = []
+
+        class DummyClient:
+            def calculate_tariff_list(self, **kwargs):
+                sent.append(kwargs["packages"])
+                return {"tariff_codes": [{"tariff_code": 136}]}
+
+        monkeypatch.setattr(cdek_services, "get_client", lambda: DummyClient())
+        first = {"weight": 431, "length": 201, "width": 95, "height": 48}
+        second = {"weight": 480, "length": 92, "width": 210, "height": 50}
+
+        cdek_services.calculate_tarifflist(137, 44, [first])
+        cdek_services.calculate_tarifflist(137, 44, [second])
+        cdek_services.calculate_tarifflist(137, 270, [second])
+
+        profile = {"weight": 500, "length": 210, "width": 100, "height": 50}
+        assert sent == [[profile], [profile]]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_concurrent_misses_coalesced(self, monkeypatch):
+        """Одновременные одинаковые запросы уходят в API один раз."""
+        calls = []
+        started = threading.Event()
+
+        class DummyClient:
+            def calculate_tariff_list(self, **kwargs):
+                calls.append(1)
+                started.set()
+                time.sleep(0.2)
+                return {"tariff_codes": [136]}
+
+        monkeypatch.setattr(cdek_services, "get_client", lambda: DummyClient())
+        package = {"weight": 500, "length": 100, "width": 100, "height": 100}
+        results = []
+
+        def worker():
+            results.append(
+                cdek_services.calculate_tarifflist(137, 44, [package])
+            )
+
+        leader = threading.Thread(target=worker)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=worker) for _ in range(3)]
+        for t in followers:
+            t.start()
+        for t in [leader, *followers]:
+            t.join()
+
+        assert calls == [1]
+        assert results == [[{"tariff_code": 136}]] * 4
+
 
 @pytest.mark.django_db
 class TestCitiesSearch:
@@ -152,7 +368,7 @@ class TestCitiesSearch:
 
         monkeypatch.setattr(
             cdek_services,
-            "get_cities_cached",
+            "get_cities",
             lambda: cities,
         )
 
@@ -162,6 +378,232 @@ class TestCitiesSearch:
         assert "Санкт-Петербург" in results[0]["city"]
 
 
+class TestCityIndex:
+    """Индекс городов: ранжирование и перестройка по версии."""
+
+    CITIES = [
+        {"code": 10, "city": "Новомосковск", "region": "Тульская область"},
+        {"code": 11, "city": "Мосальск", "region": "Калужская область"},
+        {"code": 44, "city": "Москва", "region": "Москва"},
+        {"code": 12, "city": "Орёл", "region": "Орловская область"},
+    ]
+
+    def test_ranks_prefix_matches_first(self):
+        index = CityIndex(self.CITIES)
+        codes = [c["code"] for c in index.search("мос")]
+        assert codes == [44, 11, 10]
+
+    def test_short_query_and_yo_normalization(self):
+        index = CityIndex(self.CITIES)
+        assert [c["code"] for c in index.search("ор")] == [12]
+        assert [c["code"] for c in index.search("орел")] == [12]
+
+    def test_index_rebuilt_only_on_version_change(self, monkeypatch):
+        builds = []
+
+        def fake_cities():
+            builds.append(1)
+            return self.CITIES
+
+        monkeypatch.setattr(cdek_services, "get_cities", fake_cities)
+        cache.set(cdek_services.CITIES_VERSION_CACHE_KEY, "v1")
+        cdek_services.search_cities("москва")
+        cdek_services.search_cities("орёл")
+        assert len(builds) == 1
+
+        cache.set(cdek_services.CITIES_VERSION_CACHE_KEY, "v2")
+        cdek_services.search_cities("москва")
+        assert len(builds) == 2
+
+
+@pytest.mark.django_db
+class TestSyncCdekCities:
+    """Команда sync_cdek_cities: постраничная загрузка и удаление старых."""
+
+    def test_pages_upserts_and_deletes_stale(self, monkeypatch):
+        CdekCity.objects.create(
+            code=1,
+            city="Старое название",
+            synced_at=timezone.now() - timedelta(days=1),
+        )
+        CdekCity.objects.create(
+            code=99,
+            city="Упразднённый",
+            synced_at=timezone.now() - timedelta(days=1),
+        )
+        pages = [
+            [
+                {"code": 1, "city": "Москва", "region": "Москва"},
+                {"code": 2, "city": "Тула", "region": "Тульская область"},
+            ],
+            [{"code": 3, "city": "Орёл", "region": "Орловская область"}],
+        ]
+        requested = []
+
+        class DummyClient:
+            def get_cities(self, *, country_code, page, size):
+                requested.append((page, size))
+                return pages[page]
+
+        monkeypatch.setattr(
+            "cdek.management.commands.sync_cdek_cities.get_client",
+            DummyClient,
+        )
+        out = StringIO()
+        call_command("sync_cdek_cities", page_size=2, stdout=out)
+
+        assert requested == [(0, 2), (1, 2)]
+        assert dict(CdekCity.objects.values_list("code", "city")) == {
+            1: "Москва",
+            2: "Тула",
+            3: "Орёл",
+        }
+        assert cache.get(cdek_services.CITIES_VERSION_CACHE_KEY)
+        assert cdek_services.search_cities("тул")[0]["code"] == 2
+
+    def test_if_empty_skips_loaded_directory(self, monkeypatch):
+        CdekCity.objects.create(
+            code=1, city="Москва", synced_at=timezone.now()
+        )
+        monkeypatch.setattr(
+            "cdek.management.commands.sync_cdek_cities.get_client",
+            lambda: pytest.fail("справочник уже загружен"),
+        )
+        out = StringIO()
+        call_command("sync_cdek_cities", if_empty=True, stdout=out)
+        assert "уже загружен" in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestPrewarmTariffs:
+    """Команда prewarm_tariffs: частые города × популярные посылки."""
+
+    def test_warms_top_cities_and_products(self, monkeypatch, settings):
+        settings.CDEK_FROM_CITY_CODE = 137
+        category = Category.objects.create(name="Тест", slug="t", order=0)
+        variants = []
+        for weight in (250, 290, 2000):
+            product = Product.objects.create(
+                name=f"Товар {weight}", category=category, weight_g=weight
+            )
+            variants.append(
+                ProductVariant.objects.create(product=product, price=100)
+            )
+        for city_code, count in ((44, 3), (270, 2), (500, 1)):
+            for _ in range(count):
+                order = Order.objects.create(
+                    city_code=city_code,
+                    products_total=100,
+                    total=100,
+                    recipient_name="Покупатель",
+                    recipient_phone="+79990000000",
+                )
+                for variant in variants:
+                    OrderItem.objects.create(
+                        order=order, variant=variant, price=100
+                    )
+        requested = []
+
+        class DummyClient:
+            def calculate_tariff_list(self, **kwargs):
+                requested.append(
+                    (kwargs["to_city_code"], kwargs["packages"][0]["weight"])
+                )
+                return {"tariff_codes": [136]}
+
+        monkeypatch.setattr(cdek_services, "get_client", DummyClient)
+        monkeypatch.setattr(
+            "cdek.management.commands.prewarm_tariffs.get_client",
+            DummyClient,
+        )
+        out = StringIO()
+        call_command("prewarm_tariffs", cities=2, stdout=out)
+
+        # 250 г и 290 г — один профиль посылки (вес округляется до 100 г).
+        assert sorted(requested) == [
+            (44, 300), (44, 2000), (270, 300), (270, 2000),
+        ]
+        assert "Прогрето тарифов: 4 из 4" in out.getvalue()
+        heavy = [{"weight": 2000, "length": 100, "width": 100, "height": 100}]
+        assert cache.get(cdek_services.quote_cache_key(heavy, 137, 270))
+
+    def test_failed_refresh_keeps_cached_entry(self, monkeypatch):
+        packages = [
+            {"weight": 300, "length": 100, "width": 100, "height": 100}
+        ]
+        key = cdek_services.quote_cache_key(packages, 137, 44)
+        cache.set(key, [{"tariff_code": 136}])
+
+        class FailingClient:
+            def calculate_tariff_list(self, **kwargs):
+                raise CdekAPIError("boom")
+
+        monkeypatch.setattr(cdek_services, "get_client", FailingClient)
+        assert cdek_services.calculate_tarifflist(
+            137, 44, packages, refresh=True
+        ) == []
+        assert cache.get(key) == [{"tariff_code": 136}]
+
+
+@pytest.mark.django_db
+class TestDeliveryEstimates:
+    """Оценки доставки по весовым категориям для страниц товаров."""
+
+    def test_weight_bucket_uses_volumetric_weight(self):
+        light = {"weight": 300, "length": 100, "width": 100, "height": 100}
+        bulky = {"weight": 300, "length": 400, "width": 300, "height": 200}
+        assert cdek_services.weight_bucket(
+            cdek_services.billable_weight_g(light)
+        ) == 500
+        # 40×30×20 см / 5000 = 4.8 кг
+        assert cdek_services.weight_bucket(
+            cdek_services.billable_weight_g(bulky)
+        ) == 5000
+        assert cdek_services.weight_bucket(10**6) is None
+
+    def test_refresh_stores_cheapest_customer_price(
+        self, monkeypatch, settings
+    ):
+        settings.CDEK_ESTIMATE_CITY_CODE = 44
+        CdekCity.objects.create(
+            code=44, city="Москва", synced_at=timezone.now()
+        )
+        DeliveryEstimate.objects.create(
+            city_code=999,
+            weight_bucket_g=500,
+            delivery_sum=1,
+            updated_at=timezone.now() - timedelta(days=1),
+        )
+
+        class DummyClient:
+            def calculate_tariff_list(self, **kwargs):
+                weight = kwargs["packages"][0]["weight"]
+                return {"tariff_codes": [
+                    {"tariff_code": 136, "tariff_name": "Посылка склад-склад",
+                     "delivery_sum": 200 + weight // 10,
+                     "period_min": 2, "period_max": 4},
+                    {"tariff_code": 139, "tariff_name": "Посылка дверь-дверь",
+                     "delivery_sum": 100},
+                ]}
+
+        monkeypatch.setattr(cdek_services, "get_client", DummyClient)
+        monkeypatch.setattr(
+            "cdek.management.commands.refresh_delivery_estimates.get_client",
+            DummyClient,
+        )
+        call_command("refresh_delivery_estimates", sleep=0, stdout=StringIO())
+
+        estimate = DeliveryEstimate.objects.get(
+            city_code=44, weight_bucket_g=500
+        )
+        # 250 ₽ + 10% с округлением вверх до 10 ₽; «дверь-дверь» не берём.
+        assert estimate.delivery_sum == 280
+        assert (estimate.city_name, estimate.period_min) == ("Москва", 3)
+        assert DeliveryEstimate.objects.count() == len(
+            cdek_services.ESTIMATE_WEIGHT_BUCKETS_G
+        )
+
+
 class TestSearchCityCodeByAddressParts:
     """Тесты поиска кода города по частям адреса (только справочник СДЭК)."""
 
@@ -184,7 +626,7 @@ class TestSearchCityCodeByAddressParts:
         ]
         monkeypatch.setattr(
             cdek_services,
-            "get_cities_cached",
+            "get_cities",
             lambda: cities,
         )
         address = (
@@ -200,10 +642,315 @@ class TestSearchCityCodeByAddressParts:
         ]
         monkeypatch.setattr(
             cdek_services,
-            "get_cities_cached",
+            "get_cities",
             lambda: cities,
         )
         code = cdek_services.search_city_code_by_address_parts(
             "Москва, ул. Тверская, 1"
         )
         assert code == 44
+
+
+def _office(code, lat, lon, **kwargs):
+    kwargs.setdefault("city_code", 44)
+    return CdekOffice.objects.create(
+        code=code,
+        address=f"Адрес {code}",
+        latitude=lat,
+        longitude=lon,
+        synced_at=timezone.now(),
+        **kwargs,
+    )
+
+
+@pytest.mark.django_db
+class TestCdekOffices:
+    """Локальный справочник ПВЗ: синхронизация и поиск по карте."""
+
+    def test_sync_skips_offices_without_coordinates(self, monkeypatch):
+        points = [
+            {
+                "code": "MSK1",
+                "type": "PVZ",
+                "location": {
+                    "city_code": 44,
+                    "city": "Москва",
+                    "address_full": "Москва, Тверская, 1",
+                    "latitude": 55.76,
+                    "longitude": 37.61,
+                },
+            },
+            {"code": "MSK2", "location": {"city_code": 44}},
+        ]
+
+        class DummyClient:
+            def get_delivery_points(self, *, country_code, page, size):
+                return points if page == 0 else []
+
+        monkeypatch.setattr(
+            "cdek.management.commands.sync_cdek_offices.get_client",
+            DummyClient,
+        )
+        call_command("sync_cdek_offices", stdout=StringIO())
+        office = CdekOffice.objects.get()
+        assert office.code == "MSK1"
+        assert office.address == "Москва, Тверская, 1"
+
+    def test_bbox_returns_only_visible_offices(self, client):
+        _office("IN", 55.75, 37.60)
+        _office("OUT", 59.93, 30.31)
+        _office("HIDDEN", 55.76, 37.61, is_handout=False)
+        response = client.get(
+            reverse("cdek:offices"), {"bbox": "37.5,55.7,37.7,55.8"}
+        )
+        assert response.status_code == 200
+        codes = [o["code"] for o in response.json()["offices"]]
+        assert codes == ["IN"]
+
+    def test_nearest_sorted_by_distance(self, client):
+        _office("NEAR", 55.751, 37.618)
+        _office("MID", 55.80, 37.60)
+        _office("FAR", 59.93, 30.31)
+        response = client.get(
+            reverse("cdek:offices"),
+            {"lat": 55.75, "lon": 37.62, "limit": 3},
+        )
+        offices = response.json()["offices"]
+        assert [o["code"] for o in offices] == ["NEAR", "MID", "FAR"]
+        assert offices[0]["distance_km"] < 1
+        assert 600 < offices[2]["distance_km"] < 700
+
+    def test_bad_params_return_400(self, client):
+        url = reverse("cdek:offices")
+        assert client.get(url, {"bbox": "1,2,3"}).status_code == 400
+        assert client.get(url).status_code == 400
+
+    def test_widget_offices_served_from_table(self, client):
+        _office("MSK", 55.75, 37.60, city="Москва")
+        _office("SPB", 59.93, 30.31, city_code=137)
+        response = client.get(
+            reverse("cdek:offices"),
+            {"action": "offices", "city_code": 44, "type": "ALL"},
+        )
+        assert response.status_code == 200
+        [office] = response.json()
+        assert office["code"] == "MSK"
+        assert office["location"]["latitude"] == 55.75
+        assert office["location"]["address_full"] == "Москва, Адрес MSK"
+
+    def test_widget_offices_require_city_or_bbox(self, client):
+        _office("MSK", 55.75, 37.60)
+        _office("SPB", 59.93, 30.31, city_code=137)
+        url = reverse("cdek:offices")
+        response = client.get(url, {"action": "offices", "type": "ALL"})
+        assert response.status_code == 400
+        response = client.get(
+            url, {"action": "offices", "bbox": "37.5,55.7,37.7,55.8"}
+        )
+        assert [o["code"] for o in response.json()] == ["MSK"]
+
+    def test_sync_offices_if_empty_skips_loaded_table(self, monkeypatch):
+        _office("MSK", 55.75, 37.60)
+        monkeypatch.setattr(
+            "cdek.management.commands.sync_cdek_offices.get_client",
+            lambda: pytest.fail("справочник уже загружен"),
+        )
+        out = StringIO()
+        call_command("sync_cdek_offices", if_empty=True, stdout=out)
+        assert "уже загружен" in out.getvalue()
+
+    def test_widget_calculate_goes_through_client(self, client, monkeypatch):
+        bodies = []
+
+        class DummyClient:
+            def calculate_tariff_list_raw(self, body):
+                bodies.append(body)
+                return {"tariff_codes": []}
+
+        monkeypatch.setattr("cdek.views.get_client", DummyClient)
+        response = client.post(
+            reverse("cdek:offices") + "?action=calculate",
+            data={"to_location": {"code": 44}},
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        assert bodies == [{"to_location": {"code": 44}}]
+
+
+@pytest.mark.django_db
+class TestCdekWebhook:
+    """Вебхук ORDER_STATUS: проверка секрета, дедупликация, статусы."""
+
+    def _order(self, status=Order.Status.IN_DELIVERY):
+        return Order.objects.create(
+            status=status,
+            city_code=44,
+            products_total=100,
+            total=100,
+            recipient_name="Покупатель",
+            recipient_phone="+79990000000",
+            cdek_order_uuid="cdek-uuid-1",
+        )
+
+    def _post(self, client, payload, secret="s3cret"):
+        return client.post(
+            reverse("cdek:webhook", kwargs={"secret": secret}),
+            data=payload,
+            content_type="application/json",
+        )
+
+    def test_rejects_wrong_secret(self, client, settings):
+        settings.CDEK_WEBHOOK_SECRET = "s3cret"
+        order = self._order()
+        payload = order_status_payload("cdek-uuid-1", "DELIVERED")
+
+        response = self._post(client, payload, secret="guess")
+
+        assert response.status_code == 404
+        order.refresh_from_db()
+        assert order.status == Order.Status.IN_DELIVERY
+        assert not CdekStatusEvent.objects.exists()
+
+    def test_delivered_advances_order_once(self, client, settings):
+        settings.CDEK_WEBHOOK_SECRET = "s3cret"
+        order = self._order()
+        payload = order_status_payload(
+            "cdek-uuid-1", "DELIVERED", cdek_number="1234567890"
+        )
+
+        assert self._post(client, payload).status_code == 200
+        order.refresh_from_db()
+        assert order.status == Order.Status.DELIVERED
+        assert order.cdek_status_code == "DELIVERED"
+        assert order.cdek_tracking_number == "1234567890"
+
+        # Повторная доставка того же события ничего не меняет.
+        Order.objects.filter(pk=order.pk).update(
+            status=Order.Status.IN_DELIVERY
+        )
+        assert self._post(client, payload).status_code == 200
+        order.refresh_from_db()
+        assert order.status == Order.Status.IN_DELIVERY
+        assert CdekStatusEvent.objects.count() == 1
+
+    def test_shipment_moves_paid_order_to_delivery(
+        self, client, settings, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        settings.CDEK_WEBHOOK_SECRET = "s3cret"
+        order = self._order(status=Order.Status.PAID)
+        sent = []
+        monkeypatch.setattr(
+            "orders.emails.send_order_in_delivery_email",
+            lambda order, tracking_number=None: sent.append(tracking_number),
+        )
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self._post(
+                client,
+                order_status_payload(
+                    "cdek-uuid-1",
+                    "RECEIVED_AT_SHIPMENT_WAREHOUSE",
+                    cdek_number="1234567890",
+                ),
+            )
+
+        order.refresh_from_db()
+        assert order.status == Order.Status.IN_DELIVERY
+        assert order.email_in_delivery_sent
+        assert sent == ["1234567890"]
+
+    def test_status_updates_are_conditional(self, client, settings):
+        settings.CDEK_WEBHOOK_SECRET = "s3cret"
+        cancelled = self._order(status=Order.Status.CANCELLED)
+        self._post(
+            client,
+            order_status_payload(
+                "cdek-uuid-1", "DELIVERED", "2026-01-15T12:00:00+0300"
+            ),
+        )
+        # Запоздавшее раннее событие не откатывает статус СДЭК.
+        self._post(
+            client,
+            order_status_payload(
+                "cdek-uuid-1",
+                "RECEIVED_AT_SHIPMENT_WAREHOUSE",
+                "2026-01-10T12:00:00+0300",
+            ),
+        )
+
+        cancelled.refresh_from_db()
+        assert cancelled.status == Order.Status.CANCELLED
+        assert cancelled.cdek_status_code == "DELIVERED"
+        assert CdekStatusEvent.objects.count() == 2
+
+    def test_register_command_subscribes_once(self, monkeypatch, settings):
+        settings.CDEK_WEBHOOK_SECRET = "s3cret"
+        with FakeCdekServer() as server:
+            monkeypatch.setattr(
+                "cdek.management.commands.register_cdek_webhook.get_client",
+                server.client,
+            )
+            call_command(
+                "register_cdek_webhook",
+                "https://shop.example.ru/",
+                stdout=StringIO(),
+            )
+            out = StringIO()
+            call_command(
+                "register_cdek_webhook", "https://shop.example.ru", stdout=out
+            )
+
+        assert server.webhooks == [{
+            "uuid": server.webhooks[0]["uuid"],
+            "type": "ORDER_STATUS",
+            "url": "https://shop.example.ru/cdek/webhook/s3cret/",
+        }]
+        assert "уже зарегистрирован" in out.getvalue()
+
+
+class TestCdekPrinting:
+    """Пакетная печать: задания по 100 заказов, общий опрос готовности."""
+
+    @pytest.mark.django_db
+    def test_print_job_batches_orders_and_waits_for_ready(
+        self, monkeypatch, settings, tmp_path
+    ):
+        settings.CDEK_PRINT_ROOT = tmp_path
+        monkeypatch.setattr("cdek.printing.time.sleep", lambda seconds: None)
+        uuids = [f"uuid-{n}" for n in range(150)]
+        with FakeCdekServer(print_polls=2) as server:
+            monkeypatch.setattr("cdek.jobs.get_client", server.client)
+            job_obj = enqueue_print("orders", uuids)
+            call_command("run_jobs", once=True, stdout=StringIO())
+
+        job_obj.refresh_from_db()
+        assert job_obj.status == Job.Status.DONE
+        created = [r for r in server.requests if r[0] == "POST"][1:]
+        assert [len(body["orders"]) for _, _, body in created] == [100, 50]
+        assert created[0][2]["copy_count"] == 2
+        polls = [
+            path for method, path, _ in server.requests
+            if method == "GET" and not path.endswith(".pdf")
+        ]
+        assert len(polls) == 4  # два задания × два опроса до READY
+        with zipfile.ZipFile(tmp_path / job_obj.payload["filename"]) as zf:
+            first, second = (zf.read(name) for name in zf.namelist())
+        assert first.startswith(b"%PDF")
+        assert b"uuid-99" in first and b"uuid-100" in second
+
+    def test_save_documents_writes_zip_to_print_storage(
+        self, settings, tmp_path
+    ):
+        settings.CDEK_PRINT_ROOT = tmp_path
+        uuids = [f"uuid-{n}" for n in range(150)]
+        filename = print_filename("barcodes", len(uuids), "cdek-barcodes")
+        with FakeCdekServer() as server:
+            saved = save_documents(
+                server.client(), "barcodes", uuids, filename
+            )
+
+        assert saved == "cdek-barcodes.zip"
+        with zipfile.ZipFile(tmp_path / saved) as archive:
+            assert archive.namelist() == [
+                "cdek-barcodes-1.pdf", "cdek-barcodes-2.pdf",
+            ]
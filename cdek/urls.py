@@ -0,0 +1,13 @@
+"""
+URL-маршруты приложения cdek.
+"""
+from django.urls import path
+
+from . import views
+
+app_name = "cdek"
+
+urlpatterns = [
+    path("offices/", views.offices, name="offices"),
+    path("webhook/<str:secret>/", views.webhook, name="webhook"),
+]
@@ -0,0 +1,227 @@
+"""
+API справочника пунктов выдачи СДЭК для карты (из локальной таблицы)
+и приёмник вебхука статусов заказов СДЭК.
+"""
+import hmac
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+
+from orders.services import apply_cdek_status
+
+from .client import CdekAPIError
+from .models import CdekOffice, CdekStatusEvent
+from .services import (
+    OFFICES_BBOX_LIMIT,
+    OFFICES_NEAREST_LIMIT,
+    get_client,
+    nearest_offices,
+    offices_in_bbox,
+    widget_offices,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_floats(raw: str, count: int) -> list[float] | None:
+    try:
+        values = [float(v) for v in raw.split(",")]
+    except ValueError:
+        return None
+    return values if len(values) == count else None
+
+
+def _parse_limit(raw: str | None, default: int, maximum: int) -> int:
+    try:
+        return max(1, min(int(raw), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def offices(request):
+    """
+    API: пункты выдачи СДЭК.
+
+    GET ?bbox=min_lon,min_lat,max_lon,max_lat — офисы в видимой части карты;
+    GET ?lat=..&lon=..&limit=N — N ближайших к точке (с distance_km).
+    Необязательно: type=PVZ|POSTAMAT.
+    Возвращает JSON: {"offices": [...]}.
+
+    Этот же адрес — servicePath виджета СДЭК на странице оформления
+    (запросы с ?action=..., протокол service.php из поставки виджета).
+    """
+    action = request.GET.get("action")
+    if action == "offices":
+        return _widget_offices(request)
+    if action == "calculate":
+        return _widget_calculate(request)
+    if action:
+        return JsonResponse({"message": "Unknown action"}, status=400)
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    return _offices_api(request)
+
+
+def _parse_bbox(raw: str) -> tuple[float, float, float, float] | None:
+    """
+    bbox=min_lon,min_lat,max_lon,max_lat → (min_lat, min_lon, max_lat,
+    max_lon) с упорядоченными границами или None.
+    """
+    values = _parse_floats(raw, 4)
+    if values is None:
+        return None
+    min_lon, min_lat, max_lon, max_lat = values
+    return (
+        min(min_lat, max_lat),
+        min(min_lon, max_lon),
+        max(min_lat, max_lat),
+        max(min_lon, max_lon),
+    )
+
+
+@cache_control(public=True, max_age=300)
+def _widget_offices(request):
+    """
+    Виджет: офисы из локальной таблицы (формат /v2/deliverypoints) —
+    по city_code или bbox; без них 400.
+    """
+    office_type = request.GET.get("type")
+    if office_type not in CdekOffice.Type.values:
+        office_type = None  # виджет присылает ALL
+    try:
+        city_code = int(request.GET.get("city_code") or 0) or None
+    except ValueError:
+        city_code = None
+    bbox = _parse_bbox(request.GET.get("bbox") or "")
+    if city_code is None and bbox is None:
+        return JsonResponse(
+            {"message": "city_code or bbox is required"}, status=400
+        )
+    return JsonResponse(
+        widget_offices(
+            city_code=city_code, bbox=bbox, office_type=office_type
+        ),
+        safe=False,
+    )
+
+
+def _widget_calculate(request):
+    """Виджет: расчёт тарифов — через клиент СДЭК (токен из общего кэша)."""
+    client = get_client()
+    if client is None:
+        return JsonResponse({"message": "CDEK is not configured"}, status=503)
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"message": "Invalid JSON"}, status=400)
+    if not isinstance(body, dict):
+        return JsonResponse({"message": "Invalid JSON"}, status=400)
+    body.pop("action", None)
+    try:
+        result = client.calculate_tariff_list_raw(body)
+    except CdekAPIError as e:
+        return JsonResponse(
+            e.response or {"message": str(e)}, status=e.status_code or 502
+        )
+    return JsonResponse(result)
+
+
+@cache_control(public=True, max_age=300)
+def _offices_api(request):
+    office_type = request.GET.get("type") or None
+    if office_type and office_type not in CdekOffice.Type.values:
+        return JsonResponse({"error": "Неизвестный тип офиса"}, status=400)
+
+    if request.GET.get("bbox"):
+        bbox = _parse_bbox(request.GET["bbox"])
+        if bbox is None:
+            return JsonResponse({"error": "Некорректный bbox"}, status=400)
+        limit = _parse_limit(
+            request.GET.get("limit"), OFFICES_BBOX_LIMIT, OFFICES_BBOX_LIMIT
+        )
+        result = offices_in_bbox(*bbox, office_type=office_type, limit=limit)
+        return JsonResponse({"offices": result})
+
+    point = _parse_floats(
+        f"{request.GET.get('lat', '')},{request.GET.get('lon', '')}", 2
+    )
+    if point is None:
+        return JsonResponse(
+            {"error": "Нужен bbox или lat и lon"}, status=400
+        )
+    limit = _parse_limit(request.GET.get("limit"), 10, OFFICES_NEAREST_LIMIT)
+    result = nearest_offices(
+        point[0], point[1], office_type=office_type, limit=limit
+    )
+    return JsonResponse({"offices": result})
+
+
+@csrf_exempt
+@require_POST
+def webhook(request, secret):
+    """
+    Вебхук СДЭК ORDER_STATUS (подписка — команда register_cdek_webhook).
+
+    СДЭК не подписывает запросы, поэтому адрес содержит секрет
+    CDEK_WEBHOOK_SECRET. Событие сохраняется в CdekStatusEvent; повторная
+    доставка того же события (заказ, код, время) ничего не меняет.
+    Отвечаем 200 на всё, кроме неверного секрета и битого JSON, иначе СДЭК
+    будет повторять отправку.
+    """
+    expected = getattr(settings, "CDEK_WEBHOOK_SECRET", "")
+    if not expected or not hmac.compare_digest(
+        secret.encode(), expected.encode()
+    ):
+        return HttpResponse(status=404)
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return HttpResponse(status=400)
+    if not isinstance(payload, dict) or payload.get("type") != "ORDER_STATUS":
+        return HttpResponse("OK")
+
+    attributes = payload.get("attributes") or {}
+    order_uuid = str(payload.get("uuid") or "")
+    code = str(attributes.get("code") or "")
+    try:
+        status_at = parse_datetime(
+            str(attributes.get("status_date_time") or "")
+        )
+    except ValueError:
+        status_at = None
+    if not order_uuid or not code or status_at is None:
+        logger.warning("CDEK webhook without order status: %s", payload)
+        return HttpResponse("OK")
+
+    cdek_number = str(attributes.get("cdek_number") or "")
+    is_return = bool(attributes.get("is_return"))
+    with transaction.atomic():
+        _, created = CdekStatusEvent.objects.get_or_create(
+            order_uuid=order_uuid[:50],
+            code=code[:50],
+            status_at=status_at,
+            defaults={
+                "cdek_number": cdek_number[:50],
+                "city_name": str(attributes.get("city_name") or "")[:255],
+                "is_return": is_return,
+                "payload": payload,
+            },
+        )
+        # Статусы возвратного заказа не двигают статус исходного.
+        if created and not is_return:
+            apply_cdek_status(
+                order_uuid,
+                code=code,
+                status_at=status_at,
+                cdek_number=cdek_number,
+            )
+    return HttpResponse("OK")
@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     "orders",
     "cdek",
     "tbank",
+    "jobs",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -156,6 +157,17 @@ CDEK_FROM_PVZ_CODE = os.environ.get("CDEK_FROM_PVZ_CODE", "")
 CDEK_SENDER_NAME = os.environ.get("CDEK_SENDER_NAME", "")
 CDEK_SENDER_PHONE = os.environ.get("CDEK_SENDER_PHONE", "")
 CDEK_SENDER_COMPANY = os.environ.get("CDEK_SENDER_COMPANY", "")
+# Город для оценки «Доставка от N ₽» на странице товара, если покупатель
+# ещё не заказывал доставку (44 — Москва)
+CDEK_ESTIMATE_CITY_CODE = int(
+    os.environ.get("CDEK_ESTIMATE_CITY_CODE", "44") or "44"
+)
+# Секрет в адресе вебхука статусов СДЭК (/cdek/webhook/<секрет>/);
+# пустой — вебхук отключён
+CDEK_WEBHOOK_SECRET = os.environ.get("CDEK_WEBHOOK_SECRET", "")
+# Готовые накладные и ШК из админки (персональные данные — не в MEDIA_ROOT,
+# отдаются только через админку); общий каталог для web и jobs
+CDEK_PRINT_ROOT = BASE_DIR / "private" / "cdek-print"
 YANDEX_MAPS_API_KEY = os.environ.get("YANDEX_MAPS_API_KEY", "")
 
 # DaData: подсказки и нормализация адреса при доставке «до двери»
@@ -178,6 +190,13 @@ TBANK_VAT_RATE = os.environ.get("TBANK_VAT_RATE", "none")
 # Ставка НДС для позиции «Доставка» (обычно та же, что и для товаров).
 TBANK_DELIVERY_VAT_RATE = os.environ.get("TBANK_DELIVERY_VAT_RATE", "none")
 
+# Хранение корзины анонимных пользователей:
+# "db" — строки Cart/CartItem по session_key,
+# "session" — компактный словарь в сессии, в БД переносится при входе.
+CART_ANONYMOUS_STORAGE = os.environ.get(
+    "CART_ANONYMOUS_STORAGE", "db"
+).strip().lower() or "db"
+
 # Email для копии писем о заказах (при оформлении заказа).
 ORDER_NOTIFICATION_EMAIL = os.environ.get(
     "ORDER_NOTIFICATION_EMAIL",
@@ -20,6 +20,8 @@ from django.contrib import admin
 from django.contrib.sitemaps.views import sitemap
 from django.urls import include, path, re_path
 
+from cdek.admin import cdek_print_view
+from core.admin import circuit_breakers_view
 from core.sitemaps import ProductSitemap, StaticSitemap
 from core import views as core_views
 
@@ -27,6 +29,16 @@ handler404 = "core.views.page_not_found"
 handler500 = "core.views.server_error"
 
 urlpatterns = [
+    path(
+        "admin/circuit-breakers/",
+        admin.site.admin_view(circuit_breakers_view),
+        name="admin_circuit_breakers",
+    ),
+    path(
+        "admin/cdek-print/<int:job_id>/",
+        admin.site.admin_view(cdek_print_view),
+        name="admin_cdek_print",
+    ),
     path("admin/", admin.site.urls),
     path("robots.txt", core_views.robots_txt),
     re_path(
@@ -46,6 +58,7 @@ urlpatterns = [
     path("accounts/", include("accounts.urls")),
     path("cart/", include("cart.urls")),
     path("orders/", include("orders.urls")),
+    path("cdek/", include("cdek.urls")),
     path("tbank/", include("tbank.urls")),
     path("legal/", include("core.urls")),
     path("", include("catalog.urls")),
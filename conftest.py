@@ -14,3 +14,16 @@ if not os.environ.get("DJANGO_SETTINGS_MODULE"):
     )
 
 django.setup()
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    """Кэш (locmem) не должен переносить данные между тестами."""
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
@@ -1,9 +1,16 @@
 """
 Регистрация моделей core в админке.
 """
-from django.contrib import admin
+from datetime import datetime
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils import timezone
 from django.utils.html import format_html
 
+from .circuit_breaker import BREAKER_NAMES, get_breaker
 from .models import LegalPage, SiteImage
 
 
@@ -104,3 +111,44 @@ class SiteImageAdmin(admin.ModelAdmin):
         return "—"
 
     html_code_display.short_description = "Примеры кода"
+
+
+def circuit_breakers_view(request):
+    """
+    Страница админки: состояние предохранителей внешних API.
+    POST name=<сервис> — закрыть предохранитель вручную (только
+    суперпользователь: сброс снова пускает запросы к упавшему сервису).
+    """
+    can_reset = request.user.is_superuser
+    if request.method == "POST":
+        if not can_reset:
+            raise PermissionDenied
+        name = request.POST.get("name")
+        if name in BREAKER_NAMES:
+            get_breaker(name).reset()
+            messages.success(request, f"Предохранитель «{name}» сброшен.")
+        return redirect("admin_circuit_breakers")
+
+    tz = timezone.get_current_timezone()
+    breakers = []
+    for name in BREAKER_NAMES:
+        breaker = get_breaker(name)
+        opened_at = breaker.opened_at()
+        breakers.append({
+            "name": name,
+            "state": breaker.state(),
+            "failures": breaker.failures(),
+            "failure_threshold": breaker.failure_threshold,
+            "opened_at": (
+                datetime.fromtimestamp(opened_at, tz=tz)
+                if opened_at
+                else None
+            ),
+        })
+    context = {
+        **admin.site.each_context(request),
+        "title": "Предохранители внешних API",
+        "breakers": breakers,
+        "can_reset": can_reset,
+    }
+    return TemplateResponse(request, "admin/circuit_breakers.html", context)
@@ -0,0 +1,163 @@
+"""
+Предохранители (circuit breaker) для внешних API: СДЭК, T‑Банк, DaData.
+
+Состояние хранится в кэше Django (Redis в продакшене), поэтому все воркеры
+видят одно и то же. Схема:
+  - closed: вызовы идут; сбои (ошибки соединения, таймауты, 5xx и слишком
+    медленные ответы) считаются в скользящем окне;
+  - open: после N сбоев вызовы сразу завершаются CircuitOpenError —
+    без ожидания таймаута, вызывающий код показывает свой запасной ответ;
+  - half-open: по истечении reset_timeout пропускается один пробный вызов;
+    успех закрывает предохранитель, сбой снова открывает.
+"""
+import time
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_KEY_PREFIX = "circuit_"
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Вызов не выполнен: предохранитель внешнего API открыт."""
+
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(f"Сервис {name} временно недоступен")
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """
+    Сбой, говорящий о проблемах на стороне сервиса: нет соединения,
+    таймаут или ответ 5xx. Ошибки 4xx (неверные данные) сервис не «ломают».
+    """
+    if isinstance(exc, requests.HTTPError):
+        status = getattr(exc.response, "status_code", None)
+        return status is None or status >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+class CircuitBreaker:
+    """Предохранитель одного внешнего сервиса."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        window: int = 60,
+        reset_timeout: int = 30,
+        slow_call_seconds: float = 5.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        prefix = f"{CACHE_KEY_PREFIX}{name}_"
+        self._failures_key = f"{prefix}failures"
+        self._opened_key = f"{prefix}opened_at"
+        self._probe_key = f"{prefix}probe"
+
+    def state(self) -> str:
+        opened_at = cache.get(self._opened_key)
+        if opened_at is None:
+            return STATE_CLOSED
+        if time.time() - opened_at < self.reset_timeout:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    def failures(self) -> int:
+        return cache.get(self._failures_key, 0)
+
+    def opened_at(self) -> float | None:
+        return cache.get(self._opened_key)
+
+    def allow(self) -> bool:
+        """Можно ли выполнить вызов; в half-open — только одному процессу."""
+        state = self.state()
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_OPEN:
+            return False
+        return cache.add(self._probe_key, 1, self.reset_timeout)
+
+    def record_success(
+        self, duration: float = 0.0, slow_call_seconds: float | None = None
+    ) -> None:
+        if duration > (slow_call_seconds or self.slow_call_seconds):
+            self.record_failure()
+            return
+        if cache.get(self._opened_key) is not None:
+            self.reset()
+
+    def record_failure(self) -> None:
+        if self.state() == STATE_HALF_OPEN:
+            # Пробный вызов не удался — снова открываем.
+            self._open()
+            return
+        cache.add(self._failures_key, 0, self.window)
+        try:
+            failures = cache.incr(self._failures_key)
+        except ValueError:
+            # Ключ истёк между add и incr.
+            cache.set(self._failures_key, 1, self.window)
+            failures = 1
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        cache.set(self._opened_key, time.time(), None)
+        cache.delete_many([self._failures_key, self._probe_key])
+
+    def reset(self) -> None:
+        """Закрывает предохранитель (после успеха или вручную из админки)."""
+        cache.delete_many(
+            [self._failures_key, self._opened_key, self._probe_key]
+        )
+
+    @contextmanager
+    def guard(self, slow_call_seconds: float | None = None):
+        """
+        Оборачивает один вызов сервиса: при открытом предохранителе сразу
+        бросает CircuitOpenError, иначе учитывает результат и длительность.
+        slow_call_seconds — порог медленного вызова для этого запроса
+        (у выгрузок справочников он больше, чем у расчёта тарифа).
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            if is_upstream_failure(exc):
+                self.record_failure()
+            else:
+                self.record_success(
+                    time.monotonic() - started, slow_call_seconds
+                )
+            raise
+        self.record_success(time.monotonic() - started, slow_call_seconds)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+BREAKER_NAMES = ("cdek", "tbank", "dadata")
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Предохранитель сервиса. Пороги задаются настройкой
+    CIRCUIT_BREAKERS = {"cdek": {"failure_threshold": 5, ...}}.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        options = getattr(settings, "CIRCUIT_BREAKERS", {}).get(name, {})
+        breaker = _breakers[name] = CircuitBreaker(name, **options)
+    return breaker
@@ -0,0 +1,26 @@
+"""
+Ограничение частоты запросов к внешним API для пакетных команд, которые
+обращаются к СДЭК из нескольких потоков.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов к внешнему API: не больше rate вызовов
+    wait() в секунду на все потоки (для пакетных команд).
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,82 @@
+"""
+Общий HTTP-транспорт для внешних API (СДЭК, T‑Банк, DaData).
+
+Один requests.Session на хост и процесс: соединения переиспользуются
+(keep-alive), поэтому TCP+TLS-рукопожатие не повторяется на каждый вызов.
+Повторы — через urllib3 Retry с экспоненциальной задержкой и джиттером:
+ошибки соединения повторяются всегда (запрос ещё не ушёл), ответы
+502/503/504 и обрывы чтения — только для идемпотентных методов.
+POST считается идемпотентным лишь для явно перечисленных префиксов URL
+(калькуляторы, подсказки), но не для создания заказов и платежей.
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 10
+RETRY_TOTAL = 2
+RETRY_BACKOFF_FACTOR = 0.3
+RETRY_BACKOFF_JITTER = 0.2
+RETRY_STATUS_FORCELIST = (502, 503, 504)
+
+_sessions: dict[tuple, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def _retry(methods) -> Retry:
+    return Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=RETRY_TOTAL,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        backoff_jitter=RETRY_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        allowed_methods=methods,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def _adapter(methods) -> HTTPAdapter:
+    return HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=_retry(methods),
+    )
+
+
+def get_session(
+    base_url: str,
+    *,
+    idempotent_post_prefixes: tuple[str, ...] = (),
+) -> requests.Session:
+    """
+    Возвращает общий для процесса Session для хоста base_url.
+
+    :param base_url: Адрес API (схема и хост; путь не учитывается).
+    :param idempotent_post_prefixes: Пути, для которых POST можно
+        безопасно повторить (например, "/v2/calculator/").
+    """
+    parts = urlsplit(base_url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    key = (origin, tuple(sorted(idempotent_post_prefixes)))
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            session.mount(
+                f"{origin}/", _adapter(Retry.DEFAULT_ALLOWED_METHODS)
+            )
+            post_methods = Retry.DEFAULT_ALLOWED_METHODS | {"POST"}
+            for prefix in idempotent_post_prefixes:
+                session.mount(f"{origin}{prefix}", _adapter(post_methods))
+            _sessions[key] = session
+    return session
@@ -1,10 +1,24 @@
 """
 Тесты приложения core.
 """
+import time
+from unittest import mock
+
 import pytest
+import requests
+from django.contrib.auth import get_user_model
 from django.test import override_settings
 from django.urls import reverse
 
+from core.circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    get_breaker,
+)
+from core.http import get_session
 from core.models import LegalPage
 
 
@@ -147,3 +161,123 @@ class TestGoogleSearchConsoleVerification:
         """Неверный ключ возвращает 404."""
         response = client.get("/googlekey2.html")
         assert response.status_code == 404
+
+
+class TestHttpSessions:
+    """Общие HTTP-сессии для внешних API."""
+
+    def test_session_shared_per_host(self):
+        first = get_session("https://api.example.com/v2/orders")
+        second = get_session("https://api.example.com/other")
+        assert first is second
+
+    def test_post_retried_only_for_idempotent_prefixes(self):
+        session = get_session(
+            "https://api.example.com",
+            idempotent_post_prefixes=("/v2/calculator/",),
+        )
+        calc = session.get_adapter("https://api.example.com/v2/calculator/x")
+        orders = session.get_adapter("https://api.example.com/v2/orders")
+        assert "POST" in calc.max_retries.allowed_methods
+        assert "POST" not in orders.max_retries.allowed_methods
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+class TestCircuitBreaker:
+    """Предохранители внешних API."""
+
+    def _fail(self, breaker, exc):
+        with pytest.raises(type(exc)):
+            with breaker.guard():
+                raise exc
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        breaker = CircuitBreaker("test", failure_threshold=2)
+        self._fail(breaker, requests.ConnectionError())
+        assert breaker.state() == STATE_CLOSED
+        self._fail(breaker, requests.Timeout())
+        assert breaker.state() == STATE_OPEN
+        called = []
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                called.append(1)
+        assert called == []
+
+    def test_client_errors_do_not_trip(self):
+        breaker = CircuitBreaker("test", failure_threshold=1)
+        self._fail(breaker, _http_error(400))
+        assert breaker.state() == STATE_CLOSED
+        self._fail(breaker, _http_error(503))
+        assert breaker.state() == STATE_OPEN
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+        self._fail(breaker, requests.ConnectionError())
+        later = breaker.opened_at() + 31
+        with mock.patch("core.circuit_breaker.time.time", return_value=later):
+            assert breaker.state() == STATE_HALF_OPEN
+            assert breaker.allow() is True
+            # Пробный вызов — только один.
+            assert breaker.allow() is False
+            breaker.record_success()
+        assert breaker.state() == STATE_CLOSED
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker(
+            "test", failure_threshold=1, slow_call_seconds=1.0
+        )
+        breaker.record_success(duration=2.0)
+        assert breaker.state() == STATE_OPEN
+
+    def test_guard_accepts_per_call_slow_threshold(self):
+        breaker = CircuitBreaker(
+            "test", failure_threshold=1, slow_call_seconds=0.0
+        )
+        # Для долгих эндпоинтов порог задаёт вызывающий код.
+        with breaker.guard(slow_call_seconds=60.0):
+            pass
+        assert breaker.state() == STATE_CLOSED
+        with breaker.guard():
+            time.sleep(0.01)
+        assert breaker.state() == STATE_OPEN
+
+    @pytest.mark.django_db
+    def test_admin_page_shows_and_resets_state(self, client):
+        admin_user = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass"
+        )
+        client.force_login(admin_user)
+        breaker = get_breaker("cdek")
+        breaker._open()
+        url = reverse("admin_circuit_breakers")
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "открыт" in response.content.decode()
+
+        response = client.post(url, {"name": "cdek"})
+        assert response.status_code == 302
+        assert breaker.state() == STATE_CLOSED
+
+    @pytest.mark.django_db
+    def test_admin_reset_requires_superuser(self, client):
+        staff = get_user_model().objects.create_user(
+            username="staff", password="pass", is_staff=True
+        )
+        client.force_login(staff)
+        breaker = get_breaker("cdek")
+        breaker._open()
+        url = reverse("admin_circuit_breakers")
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "Сбросить" not in response.content.decode()
+
+        response = client.post(url, {"name": "cdek"})
+        assert response.status_code == 403
+        assert breaker.state() == STATE_OPEN
@@ -0,0 +1,61 @@
+"""
+Админка фоновых задач: очередь, ошибки и повторный запуск.
+"""
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from .models import Job
+
+
+def _retry_jobs_action(modeladmin, request, queryset):
+    """Admin-action: вернуть задачи в очередь с обнулённым счётчиком."""
+    count = queryset.exclude(status=Job.Status.RUNNING).update(
+        status=Job.Status.QUEUED,
+        attempts=0,
+        run_at=timezone.now(),
+        finished_at=None,
+        locked_by="",
+        locked_at=None,
+    )
+    modeladmin.message_user(
+        request,
+        f"Задач возвращено в очередь: {count}.",
+        level=messages.SUCCESS,
+    )
+
+
+_retry_jobs_action.short_description = "Запустить повторно"
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "name",
+        "status",
+        "attempts",
+        "max_attempts",
+        "run_at",
+        "updated_at",
+    )
+    list_filter = ("status", "name")
+    search_fields = ("=id", "name", "last_error")
+    date_hierarchy = "created_at"
+    actions = [_retry_jobs_action]
+    readonly_fields = (
+        "name",
+        "payload",
+        "status",
+        "attempts",
+        "max_attempts",
+        "run_at",
+        "locked_by",
+        "locked_at",
+        "last_error",
+        "created_at",
+        "updated_at",
+        "finished_at",
+    )
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "jobs"
+    verbose_name = "Фоновые задачи"
+
+    def ready(self):
+        # Обработчики задач объявляются в модулях <app>/jobs.py.
+        autodiscover_modules("jobs")
@@ -0,0 +1,71 @@
+"""
+Management-команда воркера фоновых задач.
+
+Забирает готовые задачи из таблицы jobs_job пачками и выполняет их;
+когда очередь пуста — ждёт --idle-sleep секунд. Воркеров можно запускать
+несколько: на PostgreSQL задачи распределяются через SKIP LOCKED.
+
+Запуск в контейнере jobs:
+  python manage.py run_jobs
+Однократный проход (например, из cron или тестов):
+  python manage.py run_jobs --once
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim_jobs, requeue_stale, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = "Выполняет фоновые задачи из очереди в БД."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить готовые задачи и выйти.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Сколько задач забирать за раз (по умолчанию 10).",
+        )
+        parser.add_argument(
+            "--idle-sleep",
+            type=float,
+            default=2.0,
+            help="Пауза при пустой очереди, сек (по умолчанию 2).",
+        )
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+        worker = worker_name()
+        batch_size = max(options["batch_size"], 1)
+        processed = 0
+
+        while not self._stopping:
+            close_old_connections()
+            requeue_stale()
+            jobs = claim_jobs(worker, batch_size)
+            for job in jobs:
+                status = run_job(job)
+                processed += 1
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{job.name} #{job.pk}: {status}")
+            if options["once"] and not jobs:
+                break
+            if not jobs:
+                time.sleep(options["idle_sleep"])
+
+        self.stdout.write(f"Выполнено задач: {processed}")
+
+    def _stop(self, signum, frame):
+        # Текущая пачка дорабатывается, новые задачи не забираются.
+        self._stopping = True
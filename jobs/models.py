@@ -0,0 +1,48 @@
+"""
+Модель фоновой задачи: очередь в таблице БД.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача: имя обработчика, аргументы и состояние выполнения."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Выполнена"
+        DEAD = "dead", "Не выполнена"
+
+    name = models.CharField("Задача", max_length=100)
+    payload = models.JSONField("Аргументы", default=dict, blank=True)
+    status = models.CharField(
+        "Статус",
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    attempts = models.PositiveIntegerField("Попыток", default=0)
+    max_attempts = models.PositiveIntegerField("Максимум попыток", default=8)
+    run_at = models.DateTimeField("Запустить не раньше", default=timezone.now)
+    locked_by = models.CharField("Воркер", max_length=100, blank=True)
+    locked_at = models.DateTimeField("Взята в работу", null=True, blank=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created_at = models.DateTimeField("Создана", auto_now_add=True)
+    updated_at = models.DateTimeField("Обновлена", auto_now=True)
+    finished_at = models.DateTimeField("Завершена", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "фоновая задача"
+        verbose_name_plural = "фоновые задачи"
+        ordering = ["-created_at"]
+        indexes = [
+            # Выборка воркером: status = queued и run_at <= now.
+            models.Index(
+                fields=["status", "run_at"],
+                name="jobs_job_status_run_at_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
@@ -0,0 +1,163 @@
+"""
+Очередь фоновых задач в таблице БД.
+
+Обработчик объявляется декоратором @job("имя") в модуле <app>/jobs.py,
+задача ставится в очередь через enqueue("имя", аргумент=...). Воркер
+(manage.py run_jobs) забирает готовые задачи через
+SELECT ... FOR UPDATE SKIP LOCKED (на PostgreSQL), поэтому несколько
+воркеров не берут одну задачу дважды. Ошибка — повтор с экспоненциальной
+задержкой; после max_attempts попыток или при PermanentJobError задача
+становится «Не выполнена» и остаётся в админке для разбора.
+"""
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+from typing import Any, Callable
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# Задача «Выполняется» дольше этого срока — воркер упал, возвращаем в очередь.
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+_handlers: dict[str, Callable[..., Any]] = {}
+
+
+class PermanentJobError(Exception):
+    """Ошибка, которую бессмысленно повторять: задача сразу «Не выполнена»."""
+
+
+def job(name: str):
+    """Регистрирует функцию как обработчик задач с именем name."""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(
+    name: str,
+    *,
+    run_at=None,
+    max_attempts: int | None = None,
+    **payload,
+) -> Job:
+    """
+    Ставит задачу в очередь. Аргументы обработчика передаются именованными
+    и должны сериализоваться в JSON.
+    """
+    if name not in _handlers:
+        raise ValueError(f"Неизвестная задача: {name}")
+    fields = {"name": name, "payload": payload}
+    if run_at is not None:
+        fields["run_at"] = run_at
+    if max_attempts is not None:
+        fields["max_attempts"] = max_attempts
+    return Job.objects.create(**fields)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def requeue_stale() -> int:
+    """Возвращает в очередь задачи, зависшие у упавшего воркера."""
+    return Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=timezone.now() - LOCK_TIMEOUT,
+    ).update(status=Job.Status.QUEUED, locked_by="", locked_at=None)
+
+
+def claim_jobs(worker: str, limit: int = 10) -> list[Job]:
+    """
+    Забирает до limit готовых задач: строки блокируются с SKIP LOCKED,
+    помечаются «Выполняется» и счётчик попыток увеличивается в той же
+    транзакции. Выполнение идёт уже вне её.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.QUEUED, run_at__lte=now)
+            .order_by("run_at", "pk")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(pk__in=ids).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(pk__in=ids).order_by("run_at", "pk"))
+
+
+def backoff(attempts: int) -> timedelta:
+    """Задержка перед повтором: 30 с, 1 мин, 2 мин… до часа, с джиттером."""
+    delay = min(
+        BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    )
+    return timedelta(seconds=delay * random.uniform(1.0, 1.2))
+
+
+def run_job(job_obj: Job) -> str:
+    """Выполняет взятую задачу и сохраняет результат; возвращает статус."""
+    handler = _handlers.get(job_obj.name)
+    now = timezone.now()
+    try:
+        if handler is None:
+            raise PermanentJobError(f"Неизвестная задача: {job_obj.name}")
+        handler(**job_obj.payload)
+    except Exception as exc:
+        job_obj.last_error = traceback.format_exc()[-4000:]
+        permanent = isinstance(exc, PermanentJobError)
+        if permanent or job_obj.attempts >= job_obj.max_attempts:
+            job_obj.status = Job.Status.DEAD
+            job_obj.finished_at = now
+            logger.error(
+                "Job %s #%s failed permanently after %s attempts: %s",
+                job_obj.name,
+                job_obj.pk,
+                job_obj.attempts,
+                exc,
+            )
+        else:
+            job_obj.status = Job.Status.QUEUED
+            job_obj.run_at = now + backoff(job_obj.attempts)
+            logger.warning(
+                "Job %s #%s failed (attempt %s), retry at %s: %s",
+                job_obj.name,
+                job_obj.pk,
+                job_obj.attempts,
+                job_obj.run_at,
+                exc,
+            )
+    else:
+        job_obj.status = Job.Status.DONE
+        job_obj.finished_at = now
+        job_obj.last_error = ""
+    job_obj.locked_by = ""
+    job_obj.locked_at = None
+    job_obj.save(
+        update_fields=[
+            "status",
+            "run_at",
+            "last_error",
+            "finished_at",
+            "locked_by",
+            "locked_at",
+            "updated_at",
+        ]
+    )
+    return job_obj.status
@@ -0,0 +1,87 @@
+"""
+Тесты очереди фоновых задач.
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import (
+    PermanentJobError,
+    claim_jobs,
+    enqueue,
+    job,
+    requeue_stale,
+    run_job,
+)
+
+pytestmark = pytest.mark.django_db
+
+calls = []
+
+
+@job("tests.record")
+def _record(value):
+    calls.append(value)
+
+
+@job("tests.flaky")
+def _flaky():
+    raise ConnectionError("upstream down")
+
+
+@job("tests.rejected")
+def _rejected():
+    raise PermanentJobError("bad request")
+
+
+class TestJobQueue:
+    """Очередь задач: выполнение, повторы и «мёртвые» задачи."""
+
+    def test_run_jobs_executes_queued_job(self):
+        calls.clear()
+        queued = enqueue("tests.record", value=42)
+        out = StringIO()
+        call_command("run_jobs", once=True, stdout=out)
+        queued.refresh_from_db()
+        assert calls == [42]
+        assert queued.status == Job.Status.DONE
+        assert queued.attempts == 1
+        assert "Выполнено задач: 1" in out.getvalue()
+
+    def test_failure_is_retried_with_backoff(self):
+        queued = enqueue("tests.flaky")
+        [claimed] = claim_jobs("worker")
+        assert run_job(claimed) == Job.Status.QUEUED
+        queued.refresh_from_db()
+        assert queued.run_at >= timezone.now() + timedelta(seconds=29)
+        assert "upstream down" in queued.last_error
+        # Не готова к запуску — воркер её не берёт.
+        assert claim_jobs("worker") == []
+
+    def test_dead_after_max_attempts(self):
+        enqueue("tests.flaky", max_attempts=1)
+        [claimed] = claim_jobs("worker")
+        assert run_job(claimed) == Job.Status.DEAD
+
+    def test_permanent_error_is_dead_immediately(self):
+        enqueue("tests.rejected")
+        [claimed] = claim_jobs("worker")
+        assert run_job(claimed) == Job.Status.DEAD
+        assert claimed.attempts == 1
+
+    def test_stale_running_job_requeued(self):
+        stale = enqueue("tests.record", value=1)
+        Job.objects.filter(pk=stale.pk).update(
+            status=Job.Status.RUNNING,
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+        assert requeue_stale() == 1
+        assert [j.pk for j in claim_jobs("worker")] == [stale.pk]
+
+    def test_unknown_job_rejected_on_enqueue(self):
+        with pytest.raises(ValueError):
+            enqueue("tests.missing")
@@ -4,8 +4,11 @@
 import logging
 
 from django.contrib import admin, messages
+from django.urls import reverse
 from django.utils.html import format_html
 
+from cdek.jobs import enqueue_print
+from cdek.services import get_client
 from tbank.client import TbankAPIError, TbankClient
 
 from .models import Order, OrderItem
@@ -105,6 +108,74 @@ _set_status_in_delivery_action.short_description = (
 )
 
 
+def _print_cdek_documents(modeladmin, request, queryset, kind, title):
+    """
+    Печать документов СДЭК по всем выбранным заказам одной партией:
+    задача очереди (cdek.jobs) формирует PDF или zip, если заказов больше
+    100, а админ скачивает файл по ссылке из сообщения — запрос админки
+    не ждёт СДЭК.
+    """
+    skipped = queryset.filter(cdek_order_uuid="").count()
+    uuids = list(
+        queryset.exclude(cdek_order_uuid="")
+        .order_by("pk")
+        .values_list("cdek_order_uuid", flat=True)
+    )
+    if skipped:
+        modeladmin.message_user(
+            request,
+            f"Пропущено {skipped} заказ(ов) без UUID СДЭК.",
+            level=messages.WARNING,
+        )
+    if not uuids:
+        modeladmin.message_user(
+            request,
+            "Нет заказов, зарегистрированных в СДЭК.",
+            level=messages.ERROR,
+        )
+        return None
+    if get_client() is None:
+        modeladmin.message_user(
+            request,
+            "Интеграция СДЭК не настроена.",
+            level=messages.ERROR,
+        )
+        return None
+    job_obj = enqueue_print(kind, uuids)
+    modeladmin.message_user(
+        request,
+        format_html(
+            'Печать ({}, заказов: {}) поставлена в очередь. '
+            '<a href="{}">Скачать</a> — файл будет готов через минуту-две.',
+            title,
+            len(uuids),
+            reverse("admin_cdek_print", args=[job_obj.pk]),
+        ),
+        level=messages.SUCCESS,
+    )
+    return None
+
+
+def _print_cdek_waybills_action(modeladmin, request, queryset):
+    """Массовое действие: накладные СДЭК по выбранным заказам."""
+    return _print_cdek_documents(
+        modeladmin, request, queryset, "orders", "накладные"
+    )
+
+
+_print_cdek_waybills_action.short_description = "Печать накладных СДЭК"
+
+
+def _print_cdek_barcodes_action(modeladmin, request, queryset):
+    """Массовое действие: ШК грузовых мест СДЭК по выбранным заказам."""
+    return _print_cdek_documents(
+        modeladmin, request, queryset, "barcodes", "ШК мест"
+    )
+
+
+_print_cdek_barcodes_action.short_description = "Печать ШК мест СДЭК"
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = (
@@ -124,9 +195,23 @@ class OrderAdmin(admin.ModelAdmin):
         "recipient_email",
         "id",
     )
-    readonly_fields = ("created_at", "updated_at", "tbank_payment_id")
+    readonly_fields = (
+        "created_at",
+        "updated_at",
+        "tbank_payment_id",
+        "cdek_registration_error",
+        "cdek_registration_attempted_at",
+        "cdek_status_name",
+        "cdek_status_at",
+        "cdek_synced_at",
+    )
     inlines = [OrderItemInline]
-    actions = [_cancel_orders_action, _set_status_in_delivery_action]
+    actions = [
+        _cancel_orders_action,
+        _set_status_in_delivery_action,
+        _print_cdek_waybills_action,
+        _print_cdek_barcodes_action,
+    ]
     fieldsets = (
         (None, {
             "fields": ("user", "status", "delivery_method", "delivery_type")
@@ -153,6 +238,12 @@ class OrderAdmin(admin.ModelAdmin):
                 "delivery_address",
                 "pvz_code",
                 "cdek_order_uuid",
+                "cdek_registration_error",
+                "cdek_registration_attempted_at",
+                "cdek_tracking_number",
+                "cdek_status_name",
+                "cdek_status_at",
+                "cdek_synced_at",
             )},
         ),
         (
@@ -55,6 +55,10 @@ class CheckoutForm(forms.Form):
         required=False,
         widget=forms.HiddenInput(attrs={"id": "id_delivery_mode"}),
     )
+    delivery_quote = forms.CharField(
+        required=False,
+        widget=forms.HiddenInput(attrs={"id": "id_delivery_quote"}),
+    )
     city_code = forms.IntegerField(
         label="Город доставки",
         widget=forms.HiddenInput(attrs={"id": "id_city_code"}),
@@ -0,0 +1,73 @@
+"""
+Фоновые задачи заказов: регистрация заказа в СДЭК вне запроса покупателя.
+"""
+import logging
+
+from django.utils import timezone
+
+from cdek.services import get_client
+from jobs.queue import PermanentJobError, enqueue, job
+
+from .models import Order
+from .services import (
+    CdekOrderRejected,
+    build_cdek_order_request,
+    register_cdek_order_request,
+)
+
+logger = logging.getLogger(__name__)
+
+REGISTER_CDEK_ORDER = "orders.register_cdek_order"
+
+
+def enqueue_cdek_registration(order: Order) -> None:
+    """Ставит регистрацию заказа в СДЭК в очередь (если СДЭК настроен)."""
+    if get_client() is None:
+        logger.warning(
+            "CDEK client not configured — order %s not registered in CDEK",
+            order.pk,
+        )
+        return
+    enqueue(REGISTER_CDEK_ORDER, order_id=order.pk)
+
+
+@job(REGISTER_CDEK_ORDER)
+def register_cdek_order(order_id: int) -> None:
+    """
+    Регистрирует заказ в СДЭК и сохраняет UUID. Сетевые сбои и 5xx
+    повторяются очередью; отказ СДЭК (4xx, INVALID) и заказ без адреса
+    повторять бессмысленно — задача сразу «Не выполнена», а причина
+    сохраняется в заказ (cdek_registration_error), как и в
+    register_pending_cdek_orders.
+    """
+    order = Order.objects.filter(pk=order_id).first()
+    if order is None or order.cdek_order_uuid:
+        # Заказ удалён (неоплаченный) или уже зарегистрирован.
+        return
+    order_request = build_cdek_order_request(order)
+    if order_request is None:
+        error = "Нет данных для регистрации (адрес, тариф, товары)"
+        _record_registration(order_id, error=error)
+        raise PermanentJobError(f"Заказ #{order_id}: {error}")
+    try:
+        cdek_uuid = register_cdek_order_request(order_id, order_request)
+    except CdekOrderRejected as e:
+        _record_registration(order_id, error=str(e)[:2000])
+        raise PermanentJobError(f"Заказ #{order_id}: {e}") from e
+    _record_registration(order_id, cdek_uuid=cdek_uuid)
+
+
+def _record_registration(
+    order_id: int, *, cdek_uuid: str = "", error: str = ""
+) -> None:
+    """
+    Сохраняет итог попытки регистрации. Только если UUID всё ещё пуст —
+    не затираем результат register_pending_cdek_orders.
+    """
+    fields = {
+        "cdek_registration_error": error,
+        "cdek_registration_attempted_at": timezone.now(),
+    }
+    if cdek_uuid:
+        fields["cdek_order_uuid"] = cdek_uuid
+    Order.objects.filter(pk=order_id, cdek_order_uuid="").update(**fields)
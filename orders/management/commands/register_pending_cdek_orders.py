@@ -0,0 +1,167 @@
+"""
+Management-команда регистрации в СДЭК оплаченных заказов без UUID.
+
+Находит оплаченные заказы с доставкой СДЭК, у которых пуст
+cdek_order_uuid (регистрация не прошла или задача очереди «Не выполнена»),
+и регистрирует их в несколько потоков с ограничением частоты запросов.
+Повторный запуск безопасен: перед созданием заказ ищется в СДЭК по нашему
+номеру, дубли не появляются. Заказы, регистрация которых ещё стоит в
+очереди (run_jobs), пропускаются.
+
+Запуск вручную после сбоя СДЭК:
+  python manage.py register_pending_cdek_orders
+Только показать, что будет зарегистрировано:
+  python manage.py register_pending_cdek_orders --dry-run
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cdek.client import CdekAPIError
+from cdek.services import get_client
+from core.concurrency import RateLimiter
+from jobs.models import Job
+from orders.jobs import REGISTER_CDEK_ORDER
+from orders.models import Order
+from orders.services import (
+    CdekOrderRejected,
+    build_cdek_order_request,
+    register_cdek_order_request,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Регистрирует в СДЭК оплаченные заказы, у которых нет UUID СДЭК. "
+        "Повторный запуск не создаёт дублей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Параллельных запросов к СДЭК (по умолчанию 4).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=5.0,
+            help="Не больше запросов в секунду (по умолчанию 5).",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Обработать не больше N заказов.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать заказы, не регистрировать.",
+        )
+
+    def handle(self, *args, **options):
+        if get_client() is None:
+            raise CommandError("Интеграция СДЭК не настроена (CDEK_ACCOUNT).")
+        orders = self._pending_orders(options["limit"])
+        if not orders:
+            self.stdout.write("Незарегистрированных оплаченных заказов нет.")
+            return
+        if options["dry_run"]:
+            for order in orders:
+                self.stdout.write(f"  заказ #{order.pk}")
+            self.stdout.write(
+                f"[dry-run] Были бы зарегистрированы: {len(orders)}"
+            )
+            return
+
+        # Тела запросов собираются здесь: в потоки уходят только вызовы
+        # API, а запись в БД остаётся в основном потоке.
+        tasks = []
+        outcomes = {}
+        for order in orders:
+            order_request = build_cdek_order_request(order)
+            if order_request is None:
+                outcomes[order.pk] = (
+                    None, "Нет данных для регистрации (адрес, тариф, товары)"
+                )
+            else:
+                tasks.append((order.pk, order_request))
+
+        limiter = RateLimiter(options["rate"])
+
+        def register(task):
+            order_id, order_request = task
+            try:
+                # Поиск по номеру и создание — два запроса, лимит на оба.
+                cdek_uuid = register_cdek_order_request(
+                    order_id, order_request, throttle=limiter.wait
+                )
+            except (CdekAPIError, CdekOrderRejected) as e:
+                return order_id, None, str(e)[:2000]
+            return order_id, cdek_uuid, ""
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(
+            max_workers=max(options["workers"], 1),
+            thread_name_prefix="cdek-register",
+        ) as executor:
+            for order_id, cdek_uuid, error in executor.map(register, tasks):
+                outcomes[order_id] = (cdek_uuid, error)
+
+        now = timezone.now()
+        registered = 0
+        for order in orders:
+            cdek_uuid, error = outcomes[order.pk]
+            fields = {
+                "cdek_registration_error": error,
+                "cdek_registration_attempted_at": now,
+            }
+            if cdek_uuid:
+                fields["cdek_order_uuid"] = cdek_uuid
+                registered += 1
+                self.stdout.write(f"  заказ #{order.pk}: {cdek_uuid}")
+            else:
+                self.stdout.write(
+                    self.style.ERROR(f"  заказ #{order.pk}: {error}")
+                )
+            # Только если UUID всё ещё пуст — не затираем результат задачи
+            # очереди, успевшей завершиться за время прогона.
+            Order.objects.filter(pk=order.pk, cdek_order_uuid="").update(
+                **fields
+            )
+
+        message = (
+            f"Зарегистрировано в СДЭК: {registered} из {len(orders)} "
+            f"за {time.monotonic() - started:.1f} с"
+        )
+        style = (
+            self.style.SUCCESS if registered == len(orders)
+            else self.style.WARNING
+        )
+        self.stdout.write(style(message))
+
+    def _pending_orders(self, limit):
+        """Оплаченные заказы СДЭК без UUID, которых нет в очереди задач."""
+        queued_ids = {
+            payload.get("order_id")
+            for payload in Job.objects.filter(
+                name=REGISTER_CDEK_ORDER,
+                status__in=[Job.Status.QUEUED, Job.Status.RUNNING],
+            ).values_list("payload", flat=True)
+        }
+        qs = (
+            Order.objects.filter(
+                status=Order.Status.PAID,
+                delivery_method=Order.DeliveryMethod.CDEK,
+                cdek_order_uuid="",
+            )
+            .exclude(pk__in=queued_ids)
+            .order_by("pk")
+        )
+        if limit:
+            qs = qs[:limit]
+        return list(qs)
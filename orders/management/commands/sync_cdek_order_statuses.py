@@ -0,0 +1,136 @@
+"""
+Management-команда синхронизации трек-номеров и статусов заказов СДЭК.
+
+Опрашивает СДЭК (GET /v2/orders/{uuid}) по заказам в пути — оплаченным
+и переданным в доставку, зарегистрированным в СДЭК — и применяет
+последний статус так же, как вебхук (apply_cdek_status): статус СДЭК
+не откатывается к более старому, статус заказа продвигается (в доставке,
+доставлен), трек-номер пишется, только если ещё не сохранён. Страница
+заказа и письмо «Передан в доставку» читают только эти поля. Заказы
+обрабатываются пачками: запросы пачки идут в несколько потоков
+с ограничением частоты, запись — в основном потоке.
+
+Основной источник статусов — вебхук СДЭК (cdek.views.webhook); команда
+подбирает события, которые не дошли.
+
+Запуск в контейнере cleanup-orders (дважды в сутки):
+  python manage.py sync_cdek_order_statuses
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cdek.services import get_client
+from core.concurrency import RateLimiter
+from orders.models import Order
+from orders.services import (
+    CDEK_FINAL_STATUSES,
+    apply_cdek_status,
+    fetch_cdek_order_state,
+)
+
+# Финальные статусы, после которых опрашивать СДЭК незачем. DELIVERED
+# сюда не входит: заказ с сохранённым, но не применённым DELIVERED
+# должен дойти до статуса «Доставлен» и выйти из выборки сам.
+SKIP_STATUSES = CDEK_FINAL_STATUSES - {"DELIVERED"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Обновляет трек-номера и статусы СДЭК у заказов в пути "
+        "(пачками, в несколько потоков)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Заказов в пачке (по умолчанию 100).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Параллельных запросов к СДЭК (по умолчанию 4).",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=5.0,
+            help="Не больше запросов в секунду (по умолчанию 5).",
+        )
+
+    def handle(self, *args, **options):
+        if get_client() is None:
+            raise CommandError("Интеграция СДЭК не настроена (CDEK_ACCOUNT).")
+        order_ids = list(
+            Order.objects.filter(
+                status__in=[Order.Status.PAID, Order.Status.IN_DELIVERY],
+                delivery_method=Order.DeliveryMethod.CDEK,
+            )
+            .exclude(cdek_order_uuid="")
+            .exclude(cdek_status_code__in=SKIP_STATUSES)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        batch_size = max(options["batch_size"], 1)
+        limiter = RateLimiter(options["rate"])
+
+        def fetch(order):
+            limiter.wait()
+            return order, fetch_cdek_order_state(order.cdek_order_uuid)
+
+        started = time.monotonic()
+        synced = 0
+        with ThreadPoolExecutor(
+            max_workers=max(options["workers"], 1),
+            thread_name_prefix="cdek-sync",
+        ) as executor:
+            for offset in range(0, len(order_ids), batch_size):
+                batch = Order.objects.filter(
+                    pk__in=order_ids[offset:offset + batch_size]
+                ).only("pk", "cdek_order_uuid")
+                fetched = []
+                for order, state in executor.map(fetch, batch):
+                    if state is None:
+                        continue
+                    fetched.append(order.pk)
+                    self._apply(order, state)
+                Order.objects.filter(pk__in=fetched).update(
+                    cdek_synced_at=timezone.now()
+                )
+                synced += len(fetched)
+
+        message = (
+            f"Синхронизировано заказов: {synced} из {len(order_ids)} "
+            f"за {time.monotonic() - started:.1f} с"
+        )
+        style = (
+            self.style.SUCCESS if synced == len(order_ids)
+            else self.style.WARNING
+        )
+        self.stdout.write(style(message))
+
+    def _apply(self, order, state):
+        """Применяет опрошенное состояние, как событие вебхука."""
+        tracking = state["cdek_tracking_number"]
+        if not state["cdek_status_code"] or not state["cdek_status_at"]:
+            # Статусов в ответе нет — сохраняем только трек-номер,
+            # если он пришёл и ещё не сохранён.
+            if tracking:
+                Order.objects.filter(
+                    pk=order.pk, cdek_tracking_number=""
+                ).update(cdek_tracking_number=tracking)
+            return
+        with transaction.atomic():
+            apply_cdek_status(
+                order.cdek_order_uuid,
+                code=state["cdek_status_code"],
+                status_at=state["cdek_status_at"],
+                name=state["cdek_status_name"],
+                cdek_number=tracking,
+            )
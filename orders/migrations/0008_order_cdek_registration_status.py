@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_email_paid_sent_and_in_delivery_sent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cdek_registration_attempted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя попытка регистрации в СДЭК'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cdek_registration_error',
+            field=models.TextField(blank=True, help_text='Последняя ошибка регистрации (задача очереди или register_pending_cdek_orders)', verbose_name='Ошибка регистрации в СДЭК'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_cdek_registration_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cdek_status_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время статуса СДЭК'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cdek_status_code',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Статус в СДЭК (код)'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cdek_status_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Статус в СДЭК'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cdek_synced_at',
+            field=models.DateTimeField(blank=True, help_text='Последний опрос СДЭК командой sync_cdek_order_statuses', null=True, verbose_name='Синхронизирован со СДЭК'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cdek_tracking_number',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Трек-номер СДЭК'),
+        ),
+    ]
@@ -106,6 +106,45 @@ class Order(models.Model):
         blank=True,
         help_text="UUID, присвоенный СДЭК при регистрации заказа через API",
     )
+    cdek_tracking_number = models.CharField(
+        "Трек-номер СДЭК",
+        max_length=50,
+        blank=True,
+    )
+    cdek_status_code = models.CharField(
+        "Статус в СДЭК (код)",
+        max_length=50,
+        blank=True,
+    )
+    cdek_status_name = models.CharField(
+        "Статус в СДЭК",
+        max_length=255,
+        blank=True,
+    )
+    cdek_status_at = models.DateTimeField(
+        "Время статуса СДЭК",
+        null=True,
+        blank=True,
+    )
+    cdek_synced_at = models.DateTimeField(
+        "Синхронизирован со СДЭК",
+        null=True,
+        blank=True,
+        help_text="Последний опрос СДЭК командой sync_cdek_order_statuses",
+    )
+    cdek_registration_error = models.TextField(
+        "Ошибка регистрации в СДЭК",
+        blank=True,
+        help_text=(
+            "Последняя ошибка регистрации (задача очереди или "
+            "register_pending_cdek_orders)"
+        ),
+    )
+    cdek_registration_attempted_at = models.DateTimeField(
+        "Последняя попытка регистрации в СДЭК",
+        null=True,
+        blank=True,
+    )
     # Сумма товаров (на момент оформления)
     products_total = models.DecimalField(
         "Сумма товаров",
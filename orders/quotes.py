@@ -0,0 +1,102 @@
+"""
+Подписанные котировки доставки.
+
+Стоимость, которую покупатель увидел при расчёте (checkout_tariffs или
+действие «calculate»), выдаётся вместе с подписанным токеном с коротким
+сроком жизни. При оформлении заказа токен проверяется локально, без
+повторного запроса к СДЭК. Токен привязан к содержимому корзины, маршруту
+и тарифу: изменилась корзина или адрес — токен не подходит, и доставка
+пересчитывается.
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from django.conf import settings
+from django.core import signing
+
+from cdek.services import packages_fingerprint
+
+QUOTE_SALT = "orders.delivery_quote"
+QUOTE_MAX_AGE = 900  # секунд, как и кэш расчётов СДЭК
+
+
+def _binding(
+    packages: list[dict[str, int]],
+    from_city_code: int,
+    to_city_code: int,
+    tariff_code: int,
+) -> dict[str, Any]:
+    return {
+        "cart": packages_fingerprint(packages),
+        "from": int(from_city_code),
+        "to": int(to_city_code),
+        "tariff": int(tariff_code),
+    }
+
+
+def _quote_sum(value: Any) -> str | None:
+    """delivery_sum как строка числа или None, если суммы нет."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+    return str(value) if number.is_finite() else None
+
+
+def sign_quote(
+    packages: list[dict[str, int]],
+    from_city_code: int,
+    to_city_code: int,
+    tariff_code: int,
+    result: dict[str, Any],
+) -> str:
+    """
+    Токен котировки: привязка к корзине и маршруту плюс ответ калькулятора
+    (delivery_sum до наценки, period_min, period_max). Без числовой
+    delivery_sum токен не выдаётся (пустая строка) — при оформлении
+    доставка будет пересчитана.
+    """
+    delivery_sum = _quote_sum(result.get("delivery_sum"))
+    if delivery_sum is None:
+        return ""
+    payload = _binding(packages, from_city_code, to_city_code, tariff_code)
+    payload.update({
+        "delivery_sum": delivery_sum,
+        "period_min": result.get("period_min"),
+        "period_max": result.get("period_max"),
+    })
+    return signing.dumps(payload, salt=QUOTE_SALT, compress=True)
+
+
+def read_quote(
+    token: str,
+    packages: list[dict[str, int]],
+    from_city_code: int,
+    to_city_code: int,
+    tariff_code: int,
+) -> dict[str, Any] | None:
+    """
+    Ответ калькулятора из токена в формате calculate_delivery или None,
+    если токена нет, он истёк, подделан, выдан для другой корзины,
+    маршрута или тарифа либо не содержит числовой delivery_sum.
+    """
+    if not token:
+        return None
+    max_age = getattr(settings, "DELIVERY_QUOTE_MAX_AGE", QUOTE_MAX_AGE)
+    try:
+        payload = signing.loads(token, salt=QUOTE_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    expected = _binding(packages, from_city_code, to_city_code, tariff_code)
+    if any(payload.get(key) != value for key, value in expected.items()):
+        return None
+    delivery_sum = _quote_sum(payload.get("delivery_sum"))
+    if delivery_sum is None:
+        return None
+    return {
+        "delivery_sum": delivery_sum,
+        "period_min": payload.get("period_min"),
+        "period_max": payload.get("period_max"),
+    }
@@ -1,21 +1,22 @@
 """
-Сервисы для работы с заказами: регистрация заказов в СДЭК.
+Сервисы для работы с заказами: тарифы доставки для покупателя,
+регистрация заказов в СДЭК.
 """
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING
+from decimal import Decimal, ROUND_UP
+from typing import TYPE_CHECKING, Callable
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from cdek.client import CdekAPIError
-from cdek.services import (
-    DEFAULT_HEIGHT_MM,
-    DEFAULT_LENGTH_MM,
-    DEFAULT_WEIGHT_G,
-    DEFAULT_WIDTH_MM,
-    get_client,
-)
+from cdek.packing import pack_units
+from cdek.services import get_client, product_unit
 
 if TYPE_CHECKING:
     from orders.models import Order
@@ -23,48 +24,183 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+def _is_allowed_tariff_family(name: str) -> bool:
+    """Только тарифы семейства «Посылка» (включая экономичную)."""
+    n = (name or "").lower().strip()
+    return (
+        n.startswith("посылка ")
+        or n == "посылка"
+        or n.startswith("экономичная посылка ")
+    )
+
+
+def _tariff_kind_by_name(name: str) -> str | None:
+    """
+    Классификация тарифа по названию: только отправка из ПВЗ
+    (склад → склад/постамат/дверь). Возвращает office|pickup|door|None.
+    """
+    title = (name or "").lower().replace(" ", " ").strip()
+    normalized = title.replace(" - ", "-").replace(" – ", "-")
+    if not normalized:
+        return None
+    if "дверь-дверь" in normalized or "дверь дверь" in normalized:
+        return None
+    if "дверь-склад" in normalized or "дверь склад" in normalized:
+        return None
+    if "дверь-постамат" in normalized or "дверь постамат" in normalized:
+        return None
+    if "склад-склад" in normalized or "склад - склад" in title:
+        return "office"
+    has_postamat = "склад-постамат" in normalized or (
+        "постамат" in normalized and "склад" in normalized
+    )
+    if has_postamat:
+        return "pickup"
+    if (
+        "склад-двер" in normalized
+        or "до двери" in normalized
+        or "курьер" in normalized
+    ):
+        return "door"
+    return None
+
+
+def adjust_delivery_cost_for_customer(
+    raw_sum: Decimal | int | float | None
+) -> Decimal:
+    """
+    Увеличивает стоимость доставки на 10%
+    и округляет до 10 рублей в большую сторону.
+    """
+    if raw_sum is None:
+        return Decimal("0")
+    try:
+        value = Decimal(str(raw_sum))
+    except Exception:
+        return Decimal("0")
+    if value <= 0:
+        return Decimal("0")
+    increased = (value * Decimal("1.10")).quantize(
+        Decimal("1"), rounding=ROUND_UP
+    )
+    # Округление вверх до ближайших 10 рублей
+    tens = (
+        (increased + Decimal("9")) // Decimal("10")
+    ) * Decimal("10")
+    return tens
+
+
+def adjust_delivery_period(value, extra_days: int):
+    """
+    Прибавляет дополнительное число дней к сроку доставки.
+    """
+    if value is None:
+        return None
+    try:
+        return int(value) + extra_days
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_tariffs_for_response(raw_tariffs, mode: str, point_type: str):
+    """Фильтрует и сортирует тарифы по mode и point_type."""
+    filtered = []
+    for t in raw_tariffs:
+        name_str = str(t.get("tariff_name") or "")
+        if not _is_allowed_tariff_family(name_str):
+            continue
+        kind = _tariff_kind_by_name(name_str)
+        if not kind:
+            continue
+        if mode == "office" and kind != "office":
+            continue
+        if mode == "door" and kind != "door":
+            continue
+        raw_sum = t.get("delivery_sum")
+        adjusted_sum = int(
+            adjust_delivery_cost_for_customer(raw_sum)
+        ) if raw_sum is not None else 0
+        filtered.append(
+            {
+                "tariff_code": t.get("tariff_code"),
+                "tariff_name": t.get("tariff_name"),
+                "tariff_description": t.get("tariff_description"),
+                "delivery_mode": t.get("delivery_mode"),
+                "period_min": adjust_delivery_period(
+                    t.get("period_min"), extra_days=1
+                ),
+                "period_max": adjust_delivery_period(
+                    t.get("period_max"), extra_days=3
+                ),
+                "delivery_sum": adjusted_sum,
+            }
+        )
+
+    filtered.sort(key=lambda x: (x.get("delivery_sum") or 0))
+    return filtered
+
+
+def top_delivery_city_codes(since, limit: int) -> list[int]:
+    """
+    Коды самых частых городов доставки СДЭК в заказах с since — общий
+    выбор городов для прогрева тарифов и оценок доставки.
+    """
+    from orders.models import Order
+
+    return list(
+        Order.objects.filter(
+            created_at__gte=since,
+            delivery_method=Order.DeliveryMethod.CDEK,
+            city_code__isnull=False,
+        )
+        .values("city_code")
+        .annotate(orders=Count("id"))
+        .order_by("-orders", "city_code")
+        .values_list("city_code", flat=True)[:limit]
+    )
+
+
 def _build_packages_with_items(order: Order) -> list[dict]:
     """
     Формирует список грузовых мест с описанием товаров для POST /v2/orders.
-    Структура пакетов совпадает с cart_items_to_packages, но дополнена items[].
+    Места раскладываются так же, как в cart_items_to_packages (pack_units),
+    и дополнены items[] — товарами, лежащими в каждом месте.
     Размеры в сантиметрах (целые), вес в граммах.
     """
-    packages = []
-    pkg_num = 1
+    units = []
     for item in order.items.select_related("variant__product"):
         product = item.variant.product
-        weight_g = product.weight_g or DEFAULT_WEIGHT_G
-        length_mm = product.length_mm or DEFAULT_LENGTH_MM
-        width_mm = product.width_mm or DEFAULT_WIDTH_MM
-        height_mm = product.height_mm or DEFAULT_HEIGHT_MM
-
-        weight = max(1, int(weight_g))
-        length = max(1, round(length_mm / 10))
-        width = max(1, round(width_mm / 10))
-        height = max(1, round(height_mm / 10))
-
+        unit = product_unit(product)
         # Объявленная стоимость для СДЭК — половина цены товара
         declared_cost = float(item.price) / 2
-        item_payload = {
+        unit["item"] = {
             "name": product.name[:255],
             "ware_key": (item.variant.sku or str(product.pk))[:20],
             "payment": {"value": 0},
             "cost": round(declared_cost, 2),
-            "weight": weight,
-            "amount": 1,
+            "weight": max(1, int(unit["weight"])),
         }
+        units.extend([unit] * item.quantity)
 
-        for _ in range(item.quantity):
-            packages.append({
-                "number": str(pkg_num),
-                "weight": weight,
-                "length": length,
-                "width": width,
-                "height": height,
-                "items": [item_payload],
-            })
-            pkg_num += 1
-
+    packages = []
+    for pkg_num, package in enumerate(pack_units(units), start=1):
+        amounts: dict[int, int] = {}
+        payloads: dict[int, dict] = {}
+        for unit in package["units"]:
+            key = id(unit["item"])
+            amounts[key] = amounts.get(key, 0) + 1
+            payloads[key] = unit["item"]
+        packages.append({
+            "number": str(pkg_num),
+            "weight": max(1, int(package["weight"])),
+            "length": max(1, round(package["length"] / 10)),
+            "width": max(1, round(package["width"] / 10)),
+            "height": max(1, round(package["height"] / 10)),
+            "items": [
+                {**payloads[key], "amount": amount}
+                for key, amount in amounts.items()
+            ],
+        })
     return packages
 
 
@@ -123,17 +259,13 @@ def _parse_cdek_order_response(order_id: int, result: dict) -> str | None:
     return cdek_uuid
 
 
-def create_cdek_order(order: Order) -> str | None:
+def build_cdek_order_request(order: Order) -> dict | None:
     """
-    Регистрирует оформленный заказ в СДЭК через POST /v2/orders.
-
-    Возвращает UUID заказа в СДЭК при успехе или None при ошибке.
-    При ошибке заказ в нашей БД уже создан.
-
-    :param order: Объект Order с уже сохранёнными полями и связанными items.
+    Готовит параметры POST /v2/orders для заказа (с обращениями к БД).
+    Возвращает kwargs для CdekClient.create_order или None, если заказ
+    нельзя зарегистрировать (интеграция не настроена, нет мест или адреса).
     """
-    client = get_client()
-    if not client:
+    if not get_client():
         logger.warning(
             "CDEK client not configured — order %s not registered in CDEK",
             order.pk,
@@ -176,36 +308,67 @@ def create_cdek_order(order: Order) -> str | None:
         )
         return None
 
-    try:
-        result = client.create_order(
-            number=str(order.pk),
-            tariff_code=order.delivery_tariff_code,
-            shipment_point=from_pvz_code,
-            recipient_name=order.recipient_name,
-            recipient_phone=order.recipient_phone,
-            packages=packages,
-            delivery_point=delivery_point,
-            to_city_code=to_city_code,
-            to_address=to_address,
-            sender_name=sender_name,
-            sender_phone=sender_phone,
-            sender_company=sender_company,
-            comment=order.comment,
-        )
-    except CdekAPIError as e:
-        logger.error(
-            "CDEK create_order API error for order %s: %s (body=%s)",
-            order.pk,
-            e,
-            e.response,
-        )
-        return None
-
-    cdek_uuid = _parse_cdek_order_response(order.pk, result)
-    if cdek_uuid:
+    return {
+        "number": str(order.pk),
+        "tariff_code": order.delivery_tariff_code,
+        "shipment_point": from_pvz_code,
+        "recipient_name": order.recipient_name,
+        "recipient_phone": order.recipient_phone,
+        "packages": packages,
+        "delivery_point": delivery_point,
+        "to_city_code": to_city_code,
+        "to_address": to_address,
+        "sender_name": sender_name,
+        "sender_phone": sender_phone,
+        "sender_company": sender_company,
+        "comment": order.comment,
+    }
+
+
+class CdekOrderRejected(Exception):
+    """СДЭК отклонил заказ (4xx, INVALID) — повтор запроса не поможет."""
+
+
+def register_cdek_order_request(
+    order_id: int,
+    order_request: dict,
+    *,
+    throttle: Callable[[], None] | None = None,
+) -> str:
+    """
+    Идемпотентная регистрация подготовленного заказа (только сетевые
+    вызовы, без БД). Сначала ищет заказ в СДЭК по нашему номеру (number):
+    если прошлая попытка дошла до СДЭК, но ответ потерялся, возвращает уже
+    присвоенный UUID и не создаёт дубль. throttle вызывается перед каждым
+    запросом к API (ограничение частоты при массовой регистрации).
+
+    :raises CdekAPIError: временный сбой (сеть, 5xx) — можно повторить.
+    :raises CdekOrderRejected: СДЭК отклонил заказ.
+    """
+    client = get_client()
+    if not client:
+        raise CdekOrderRejected("Интеграция СДЭК не настроена")
+    if throttle:
+        throttle()
+    existing = client.get_order_by_number(order_request["number"])
+    if existing:
+        cdek_uuid = existing["entity"]["uuid"]
         logger.info(
-            "Order %s registered in CDEK, uuid=%s", order.pk, cdek_uuid
+            "Order %s already in CDEK, uuid=%s", order_id, cdek_uuid
         )
+        return cdek_uuid
+    if throttle:
+        throttle()
+    try:
+        result = client.create_order(**order_request)
+    except CdekAPIError as e:
+        if e.status_code is not None and 400 <= e.status_code < 500:
+            raise CdekOrderRejected(f"{e} ({e.response})") from e
+        raise
+    cdek_uuid = _parse_cdek_order_response(order_id, result)
+    if not cdek_uuid:
+        raise CdekOrderRejected(f"СДЭК не принял заказ: {result}")
+    logger.info("Order %s registered in CDEK, uuid=%s", order_id, cdek_uuid)
     return cdek_uuid
 
 
@@ -242,25 +405,132 @@ def _tracking_from_delivery_detail(entity: dict) -> str | None:
     return _tracking_from_dict(first) if isinstance(first, dict) else None
 
 
-def get_cdek_tracking_number(order: "Order") -> str | None:
+# Статусы СДЭК, после которых заказ больше не меняется — не опрашиваем.
+CDEK_FINAL_STATUSES = frozenset({"DELIVERED", "NOT_DELIVERED", "INVALID"})
+
+
+def _latest_status(entity: dict) -> dict:
+    """Последний статус из entity.statuses (по date_time)."""
+    statuses = [
+        s for s in entity.get("statuses") or [] if isinstance(s, dict)
+    ]
+    if not statuses:
+        return {}
+    return max(statuses, key=lambda s: s.get("date_time") or "")
+
+
+def parse_cdek_order_state(data: dict) -> dict:
     """
-    Возвращает трек-номер СДЭК для заказа по cdek_order_uuid или None.
+    Трек-номер и последний статус из ответа GET /v2/orders/{uuid}.
+    Ключи совпадают с полями Order.
+    """
+    entity = data.get("entity") or data
+    status = _latest_status(entity)
+    return {
+        "cdek_tracking_number": (
+            _tracking_from_dict(entity)
+            or _tracking_from_related_entities(data, entity)
+            or _tracking_from_delivery_detail(entity)
+            or ""
+        ),
+        "cdek_status_code": (status.get("code") or "")[:50],
+        "cdek_status_name": (status.get("name") or "")[:255],
+        "cdek_status_at": parse_datetime(status.get("date_time") or ""),
+    }
+
+
+def fetch_cdek_order_state(uuid: str) -> dict | None:
+    """
+    Запрашивает заказ в СДЭК и возвращает parse_cdek_order_state или None
+    при ошибке. Только сеть — страницы и письма читают сохранённые поля
+    (их заполняет команда sync_cdek_order_statuses).
     """
-    from cdek.services import get_client
-
-    uuid = (order.cdek_order_uuid or "").strip()
-    if not uuid:
-        return None
     client = get_client()
     if not client:
         return None
     try:
         data = client.get_order(uuid)
-    except CdekAPIError:
+    except CdekAPIError as e:
+        logger.warning("CDEK order %s state not fetched: %s", uuid, e)
         return None
-    entity = data.get("entity") or data
-    return (
-        _tracking_from_dict(entity)
-        or _tracking_from_related_entities(data, entity)
-        or _tracking_from_delivery_detail(entity)
+    return parse_cdek_order_state(data)
+
+
+def _order_status_transitions() -> dict:
+    """Статус СДЭК → (новый статус заказа, из каких статусов можно перейти)."""
+    from orders.models import Order
+
+    return {
+        "RECEIVED_AT_SHIPMENT_WAREHOUSE": (
+            Order.Status.IN_DELIVERY,
+            [Order.Status.PAID],
+        ),
+        "DELIVERED": (
+            Order.Status.DELIVERED,
+            [Order.Status.PAID, Order.Status.IN_DELIVERY],
+        ),
+    }
+
+
+def apply_cdek_status(
+    order_uuid: str,
+    *,
+    code: str,
+    status_at,
+    name: str = "",
+    cdek_number: str = "",
+) -> bool:
+    """
+    Применяет статус СДЭК (из вебхука или опроса sync_cdek_order_statuses)
+    к заказу условными UPDATE: статус СДЭК пишется, только если он
+    не старше сохранённого, статус заказа меняется только из допустимых
+    (события могут прийти не по порядку, а менеджер мог отменить заказ).
+    Возвращает True, если статус заказа изменился. Вызывать внутри
+    transaction.atomic.
+    """
+    from orders.models import Order
+
+    order = Order.objects.filter(cdek_order_uuid=order_uuid).first()
+    if order is None:
+        logger.info("CDEK status %s for unknown order %s", code, order_uuid)
+        return False
+    orders = Order.objects.filter(pk=order.pk)
+    orders.filter(
+        Q(cdek_status_at__isnull=True) | Q(cdek_status_at__lte=status_at)
+    ).update(
+        cdek_status_code=code[:50],
+        cdek_status_name=(name or code)[:255],
+        cdek_status_at=status_at,
+    )
+    if cdek_number:
+        orders.filter(cdek_tracking_number="").update(
+            cdek_tracking_number=cdek_number[:50]
+        )
+
+    transition = _order_status_transitions().get(code)
+    if transition is None:
+        return False
+    new_status, from_statuses = transition
+    changed = orders.filter(status__in=from_statuses).update(
+        status=new_status, updated_at=timezone.now()
+    )
+    if not changed:
+        return False
+    logger.info("Order %s moved to %s by CDEK status", order.pk, new_status)
+    # UPDATE не вызывает post_save — письмо о передаче в доставку
+    # отправляем здесь, флаг ставим тем же условным UPDATE.
+    if new_status == Order.Status.IN_DELIVERY and orders.filter(
+        email_in_delivery_sent=False
+    ).update(email_in_delivery_sent=True):
+        transaction.on_commit(lambda: _send_in_delivery_email(order.pk))
+    return True
+
+
+def _send_in_delivery_email(order_id: int) -> None:
+    from orders.emails import send_order_in_delivery_email
+    from orders.models import Order
+
+    order = Order.objects.get(pk=order_id)
+    send_order_in_delivery_email(
+        order, tracking_number=order.cdek_tracking_number or None
     )
@@ -7,7 +7,6 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from .models import Order
-from .services import get_cdek_tracking_number
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +15,7 @@ logger = logging.getLogger(__name__)
 def order_in_delivery_email(sender, instance, created, **kwargs):
     """
     При переходе заказа в статус «Передан в доставку» отправляем письмо
-    с трек-номером СДЭК (если есть).
+    с трек-номером СДЭК (если уже получен командой синхронизации).
     """
     if created:
         return
@@ -25,6 +24,7 @@ def order_in_delivery_email(sender, instance, created, **kwargs):
     if instance.email_in_delivery_sent:
         return
     from orders.emails import send_order_in_delivery_email
-    tracking = get_cdek_tracking_number(instance)
-    send_order_in_delivery_email(instance, tracking_number=tracking)
+    send_order_in_delivery_email(
+        instance, tracking_number=instance.cdek_tracking_number or None
+    )
     Order.objects.filter(pk=instance.pk).update(email_in_delivery_sent=True)
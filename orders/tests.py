@@ -4,16 +4,26 @@
 from __future__ import annotations
 
 import json
+from io import StringIO
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 
 from cart.models import Cart, CartItem
 from catalog.models import Category, Product, ProductVariant
+from cdek.client import CdekAPIError
+from cdek.services import packages_fingerprint
+from cdek.testing import FakeCdekServer
+from jobs.models import Job
+from orders import jobs as order_jobs
 from orders import services as order_services
 from orders import views as order_views
 from orders.models import Order, OrderItem
+from orders.quotes import QUOTE_SALT, read_quote, sign_quote
 
 
 pytestmark = pytest.mark.django_db
@@ -114,7 +124,7 @@ class TestCheckoutAddressSuggestView:
         )
         client.force_login(user)
 
-        def mock_post(url, json=None, headers=None, timeout=None):
+        def mock_post(session, url, json=None, headers=None, timeout=None):
             class Resp:
                 status_code = 200
 
@@ -134,7 +144,7 @@ class TestCheckoutAddressSuggestView:
                     }
             return Resp()
 
-        monkeypatch.setattr("requests.post", mock_post)
+        monkeypatch.setattr("requests.Session.post", mock_post)
         url = reverse("orders:checkout_address_suggest")
         response = client.get(url, {"city": "Москва", "q": "Тверская"})
         assert response.status_code == 200
@@ -223,6 +233,14 @@ class TestCheckoutTariffsView:
         assert data["city_code"] == 44
         # Для ПВЗ должен остаться только склад-склад
         assert [t["tariff_code"] for t in data["tariffs"]] == [136]
+        quote = read_quote(
+            data["tariffs"][0]["quote"],
+            [{"weight": 500, "length": 100, "width": 100, "height": 100}],
+            137,
+            44,
+            136,
+        )
+        assert quote["delivery_sum"] == "200"
 
     def test_checkout_tariffs_uses_city_name_when_code_missing(
         self,
@@ -363,18 +381,15 @@ class TestCreateCdekOrder:
         )
         return order
 
-    def test_create_cdek_order_returns_none_when_client_missing(
-        self,
-        settings,
-        caplog
-    ):
+    def test_register_rejected_when_client_missing(self, settings):
         settings.CDEK_ACCOUNT = ""
         settings.CDEK_SECURE = ""
         order = self._create_order_with_items()
-        uuid = order_services.create_cdek_order(order)
-        assert uuid is None
+        request = order_services.build_cdek_order_request(order)
+        with pytest.raises(order_services.CdekOrderRejected):
+            order_services.register_cdek_order_request(order.pk, request)
 
-    def test_create_cdek_order_sends_payload_to_client(
+    def test_register_sends_payload_to_client(
         self,
         settings,
         monkeypatch
@@ -391,6 +406,9 @@ class TestCreateCdekOrder:
         calls = {}
 
         class DummyClient:
+            def get_order_by_number(self, number):
+                return None
+
             def create_order(self, **kwargs):
                 calls["kwargs"] = kwargs
                 return {
@@ -403,7 +421,8 @@ class TestCreateCdekOrder:
             "get_client",
             lambda: DummyClient()
         )
-        uuid = order_services.create_cdek_order(order)
+        request = order_services.build_cdek_order_request(order)
+        uuid = order_services.register_cdek_order_request(order.pk, request)
         assert uuid == "cdek-uuid-123"
         assert calls["kwargs"]["number"] == str(order.pk)
         assert calls["kwargs"]["tariff_code"] == order.delivery_tariff_code
@@ -414,3 +433,539 @@ class TestCreateCdekOrder:
         assert calls["kwargs"]["delivery_point"] == order.pvz_code
         assert calls["kwargs"]["to_city_code"] is None
         assert calls["kwargs"]["to_address"] is None
+
+    def test_registration_job_saves_uuid(self, settings, monkeypatch):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        order = self._create_order_with_items()
+
+        class DummyClient:
+            def get_order_by_number(self, number):
+                return None
+
+            def create_order(self, **kwargs):
+                return {"entity": {"uuid": "cdek-uuid-1"}, "requests": []}
+
+        monkeypatch.setattr(order_jobs, "get_client", DummyClient)
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        order_jobs.enqueue_cdek_registration(order)
+        call_command("run_jobs", once=True, stdout=StringIO())
+
+        order.refresh_from_db()
+        assert order.cdek_order_uuid == "cdek-uuid-1"
+        assert Job.objects.get().status == Job.Status.DONE
+
+    def test_registration_job_retries_server_errors(
+        self, settings, monkeypatch
+    ):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        order = self._create_order_with_items()
+
+        class DummyClient:
+            def get_order_by_number(self, number):
+                return None
+
+            def create_order(self, **kwargs):
+                raise CdekAPIError("Bad gateway", status_code=502)
+
+        monkeypatch.setattr(order_jobs, "get_client", DummyClient)
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        order_jobs.enqueue_cdek_registration(order)
+        call_command("run_jobs", once=True, stdout=StringIO())
+
+        assert Job.objects.get().status == Job.Status.QUEUED
+
+    def test_registration_job_records_rejection(self, settings, monkeypatch):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        order = self._create_order_with_items()
+
+        class DummyClient:
+            def get_order_by_number(self, number):
+                return None
+
+            def create_order(self, **kwargs):
+                raise CdekAPIError("Invalid phone", status_code=400)
+
+        monkeypatch.setattr(order_jobs, "get_client", DummyClient)
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        order_jobs.enqueue_cdek_registration(order)
+        call_command("run_jobs", once=True, stdout=StringIO())
+
+        order.refresh_from_db()
+        assert Job.objects.get().status == Job.Status.DEAD
+        assert "Invalid phone" in order.cdek_registration_error
+        assert order.cdek_registration_attempted_at is not None
+
+    def test_register_pending_command_registers_paid_orders(
+        self, settings, monkeypatch
+    ):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        unpaid = self._create_order_with_items()
+        order = Order.objects.get(pk=unpaid.pk)
+        order.pk = None
+        order.status = Order.Status.PAID
+        order.save()
+        item = unpaid.items.get()
+        item.pk = None
+        item.order = order
+        item.save()
+        created = []
+
+        class DummyClient:
+            def get_order_by_number(self, number):
+                return None
+
+            def create_order(self, **kwargs):
+                created.append(kwargs["number"])
+                return {"entity": {"uuid": "cdek-uuid-7"}, "requests": []}
+
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        monkeypatch.setattr(
+            "orders.management.commands.register_pending_cdek_orders"
+            ".get_client",
+            DummyClient,
+        )
+        call_command(
+            "register_pending_cdek_orders", rate=1000, stdout=StringIO()
+        )
+
+        order.refresh_from_db()
+        unpaid.refresh_from_db()
+        assert created == [str(order.pk)]
+        assert order.cdek_order_uuid == "cdek-uuid-7"
+        assert order.cdek_registration_attempted_at is not None
+        assert unpaid.cdek_order_uuid == ""
+
+    def test_register_pending_reuses_existing_cdek_order(
+        self, settings, monkeypatch
+    ):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        order = self._create_order_with_items()
+
+        class DummyClient:
+            def get_order_by_number(self, number):
+                return {"entity": {"uuid": f"existing-{number}"}}
+
+            def create_order(self, **kwargs):
+                raise AssertionError("заказ уже есть в СДЭК")
+
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        request = order_services.build_cdek_order_request(order)
+
+        uuid = order_services.register_cdek_order_request(order.pk, request)
+
+        assert uuid == f"existing-{order.pk}"
+
+    def test_register_throttles_every_api_call(self, settings, monkeypatch):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        order = self._create_order_with_items()
+        calls = []
+
+        class DummyClient:
+            def get_order_by_number(self, number):
+                calls.append("lookup")
+                return None
+
+            def create_order(self, **kwargs):
+                calls.append("create")
+                return {"entity": {"uuid": "cdek-uuid-2"}, "requests": []}
+
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        request = order_services.build_cdek_order_request(order)
+
+        order_services.register_cdek_order_request(
+            order.pk, request, throttle=lambda: calls.append("wait")
+        )
+
+        assert calls == ["wait", "lookup", "wait", "create"]
+
+    def test_register_pending_records_rejection(self, settings, monkeypatch):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        order = self._create_order_with_items()
+        order.status = Order.Status.PAID
+        order.save(update_fields=["status"])
+
+        class DummyClient:
+            def get_order_by_number(self, number):
+                return None
+
+            def create_order(self, **kwargs):
+                raise CdekAPIError("Invalid phone", status_code=400)
+
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        monkeypatch.setattr(
+            "orders.management.commands.register_pending_cdek_orders"
+            ".get_client",
+            DummyClient,
+        )
+        call_command(
+            "register_pending_cdek_orders", rate=1000, stdout=StringIO()
+        )
+
+        order.refresh_from_db()
+        assert order.cdek_order_uuid == ""
+        assert "Invalid phone" in order.cdek_registration_error
+
+    def test_sync_command_stores_tracking_and_status(
+        self, settings, monkeypatch
+    ):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        order = self._create_order_with_items()
+        Order.objects.filter(pk=order.pk).update(
+            status=Order.Status.IN_DELIVERY, cdek_order_uuid="cdek-uuid-9"
+        )
+        requested = []
+
+        class DummyClient:
+            def get_order(self, uuid):
+                requested.append(uuid)
+                return {
+                    "entity": {
+                        "uuid": uuid,
+                        "cdek_number": "1234567890",
+                        "statuses": [
+                            {
+                                "code": "CREATED",
+                                "name": "Создан",
+                                "date_time": "2026-01-10T10:00:00+0000",
+                            },
+                            {
+                                "code": "ACCEPTED_AT_PICK_UP_POINT",
+                                "name": "Принят в пункте выдачи",
+                                "date_time": "2026-01-12T09:30:00+0000",
+                            },
+                        ],
+                    }
+                }
+
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        monkeypatch.setattr(
+            "orders.management.commands.sync_cdek_order_statuses"
+            ".get_client",
+            DummyClient,
+        )
+        call_command("sync_cdek_order_statuses", rate=1000, stdout=StringIO())
+
+        order.refresh_from_db()
+        assert requested == ["cdek-uuid-9"]
+        assert order.cdek_tracking_number == "1234567890"
+        assert order.cdek_status_code == "ACCEPTED_AT_PICK_UP_POINT"
+        assert order.cdek_status_at.day == 12
+        assert order.cdek_synced_at is not None
+
+        # Финальный статус СДЭК — заказ больше не опрашивается.
+        Order.objects.filter(pk=order.pk).update(
+            cdek_status_code="NOT_DELIVERED"
+        )
+        call_command("sync_cdek_order_statuses", rate=1000, stdout=StringIO())
+        assert requested == ["cdek-uuid-9"]
+
+    def test_sync_command_advances_order_status(self, settings, monkeypatch):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        order = self._create_order_with_items()
+        # DELIVERED уже сохранён, но заказ остался «в доставке».
+        Order.objects.filter(pk=order.pk).update(
+            status=Order.Status.IN_DELIVERY,
+            cdek_order_uuid="cdek-uuid-9",
+            cdek_status_code="DELIVERED",
+            cdek_status_at=parse_datetime("2026-01-15T10:00:00+0000"),
+        )
+        statuses = [
+            {"code": "DELIVERED", "date_time": "2026-01-15T10:00:00+0000"},
+        ]
+
+        class DummyClient:
+            def get_order(self, uuid):
+                return {"entity": {"uuid": uuid, "statuses": statuses}}
+
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        monkeypatch.setattr(
+            "orders.management.commands.sync_cdek_order_statuses"
+            ".get_client",
+            DummyClient,
+        )
+        call_command("sync_cdek_order_statuses", rate=1000, stdout=StringIO())
+
+        order.refresh_from_db()
+        assert order.status == Order.Status.DELIVERED
+
+        # Устаревший ответ не откатывает статус СДЭК, записанный вебхуком.
+        Order.objects.filter(pk=order.pk).update(
+            status=Order.Status.IN_DELIVERY,
+            cdek_status_code="ACCEPTED_AT_PICK_UP_POINT",
+            cdek_status_at=parse_datetime("2026-01-20T10:00:00+0000"),
+        )
+        call_command("sync_cdek_order_statuses", rate=1000, stdout=StringIO())
+
+        order.refresh_from_db()
+        assert order.cdek_status_code == "ACCEPTED_AT_PICK_UP_POINT"
+
+    def test_sync_command_keeps_stored_tracking(self, settings, monkeypatch):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        order = self._create_order_with_items()
+        Order.objects.filter(pk=order.pk).update(
+            status=Order.Status.IN_DELIVERY,
+            cdek_order_uuid="cdek-uuid-9",
+            cdek_tracking_number="1234567890",
+        )
+
+        class DummyClient:
+            def get_order(self, uuid):
+                # Трек-номер в ответе бывает пустым.
+                return {"entity": {"uuid": uuid, "statuses": []}}
+
+        monkeypatch.setattr(order_services, "get_client", DummyClient)
+        monkeypatch.setattr(
+            "orders.management.commands.sync_cdek_order_statuses"
+            ".get_client",
+            DummyClient,
+        )
+        call_command("sync_cdek_order_statuses", rate=1000, stdout=StringIO())
+
+        order.refresh_from_db()
+        assert order.cdek_tracking_number == "1234567890"
+
+    def test_in_delivery_email_uses_stored_tracking(self, monkeypatch):
+        order = self._create_order_with_items()
+        order.cdek_order_uuid = "cdek-uuid-9"
+        order.cdek_tracking_number = "1234567890"
+        order.save()
+        sent = []
+
+        def no_network():
+            raise AssertionError("письмо не должно обращаться к СДЭК")
+
+        monkeypatch.setattr(order_services, "get_client", no_network)
+        monkeypatch.setattr(
+            "orders.emails.send_order_in_delivery_email",
+            lambda order, tracking_number=None: sent.append(tracking_number),
+        )
+        order.status = Order.Status.IN_DELIVERY
+        order.save()
+
+        assert sent == ["1234567890"]
+
+    def test_order_units_consolidated_into_one_package(self, settings):
+        settings.CDEK_ACCOUNT = "test"
+        settings.CDEK_SECURE = "secret"
+        settings.CDEK_FROM_PVZ_CODE = "FROMPVZ"
+        order = self._create_order_with_items()
+        order.items.update(quantity=3)
+
+        request = order_services.build_cdek_order_request(order)
+
+        [package] = request["packages"]
+        assert package["weight"] == 1500
+        assert [item["amount"] for item in package["items"]] == [3]
+        assert package["items"][0]["weight"] == 500
+
+
+@pytest.mark.django_db
+class TestPrintCdekDocumentsAction:
+    """Admin-action печати накладных СДЭК по выбранным заказам."""
+
+    def test_prints_in_background_and_serves_file(
+        self, admin_client, monkeypatch, settings, tmp_path
+    ):
+        settings.CDEK_PRINT_ROOT = tmp_path
+        orders = [
+            Order.objects.create(
+                city_code=44,
+                products_total=100,
+                total=100,
+                recipient_name="Покупатель",
+                recipient_phone="+79990000000",
+                cdek_order_uuid=uuid,
+            )
+            for uuid in ("cdek-uuid-1", "cdek-uuid-2", "")
+        ]
+        with FakeCdekServer() as server:
+            monkeypatch.setattr("orders.admin.get_client", server.client)
+            monkeypatch.setattr("cdek.jobs.get_client", server.client)
+            response = admin_client.post(
+                reverse("admin:orders_order_changelist"),
+                {
+                    "action": "_print_cdek_waybills_action",
+                    "_selected_action": [o.pk for o in orders],
+                },
+            )
+            # Запрос админки не ждёт СДЭК — печать стоит в очереди.
+            assert response.status_code == 302
+            assert server.print_jobs == {}
+            job_obj = Job.objects.get()
+            url = reverse("admin_cdek_print", args=[job_obj.pk])
+            pending = admin_client.get(url)
+            assert pending.status_code == 302
+
+            call_command("run_jobs", once=True, stdout=StringIO())
+
+        response = admin_client.get(url)
+        content = b"".join(response.streaming_content)
+        assert response["Content-Type"] == "application/pdf"
+        assert content.endswith(b"cdek-uuid-1,cdek-uuid-2")
+        assert len(server.print_jobs) == 1
+
+
+class TestRepeatOrderView:
+    """Повтор заказа: одна вставка позиций заказа в корзину."""
+
+    def test_repeat_clamps_and_skips_inactive(self, client):
+        user = get_user_model().objects.create_user(
+            username="user",
+            email="user@example.com",
+            password="pass",
+        )
+        client.force_login(user)
+        product = _create_product()
+        variant = product.variants.first()
+        hidden = ProductVariant.objects.create(
+            product=product, price=500, discount_percent=0, is_active=False
+        )
+        order = Order.objects.create(
+            user=user,
+            products_total="9500.00",
+            total="9500.00",
+            recipient_name="Иванов Иван",
+            recipient_phone="+79990000000",
+        )
+        OrderItem.objects.create(
+            order=order, variant=variant, price="1000.00", quantity=8
+        )
+        OrderItem.objects.create(
+            order=order, variant=hidden, price="500.00", quantity=3
+        )
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, variant=variant, quantity=5)
+
+        response = client.post(reverse("orders:repeat", args=[order.pk]))
+
+        assert response.status_code == 302
+        items = list(cart.items.values_list("variant_id", "quantity"))
+        assert items == [(variant.pk, 10)]
+
+    def test_repeat_foreign_order_not_found(self, client):
+        user = get_user_model().objects.create_user(
+            username="user",
+            email="user@example.com",
+            password="pass",
+        )
+        client.force_login(user)
+        response = client.post(reverse("orders:repeat", args=[999]))
+        assert response.url == reverse("accounts:profile")
+
+
+class TestSignedDeliveryQuotes:
+    """Подписанные котировки: оформление без повторного расчёта СДЭК."""
+
+    PACKAGES = [{"weight": 500, "length": 100, "width": 100, "height": 100}]
+
+    def _place_order(self, client, monkeypatch, quote, city_code=44):
+        user = get_user_model().objects.create_user(
+            username="user", email="user@example.com", password="pass"
+        )
+        client.force_login(user)
+        product = _create_product()
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(
+            cart=cart, variant=product.variants.first(), quantity=1
+        )
+        class FailingTbankClient:
+            def init_payment(self, **kwargs):
+                raise RuntimeError("T-Bank unavailable")
+
+        monkeypatch.setattr(order_views, "TbankClient", FailingTbankClient)
+        return client.post(
+            reverse("cart:detail"),
+            {
+                "action": "place_order",
+                "recipient_name": "Иванов Иван",
+                "recipient_phone": "+79990000000",
+                "delivery_tariff": 136,
+                "delivery_mode": "office",
+                "city_code": city_code,
+                "pvz_code": "MSK1",
+                "delivery_quote": quote,
+            },
+        )
+
+    def test_quote_bound_to_cart_route_and_tariff(self):
+        quote = sign_quote(
+            self.PACKAGES, 137, 44, 136, {"delivery_sum": 250.5}
+        )
+        assert read_quote(quote, self.PACKAGES, 137, 44, 136) == {
+            "delivery_sum": "250.5",
+            "period_min": None,
+            "period_max": None,
+        }
+        assert read_quote(quote, self.PACKAGES, 137, 44, 137) is None
+        assert read_quote(quote, self.PACKAGES, 137, 45, 136) is None
+        assert read_quote(quote, self.PACKAGES * 2, 137, 44, 136) is None
+        assert read_quote(quote + "x", self.PACKAGES, 137, 44, 136) is None
+
+    def test_quote_without_delivery_sum_not_issued(self):
+        assert sign_quote(self.PACKAGES, 137, 44, 136, {}) == ""
+        # Токен старого формата со строкой "None" вместо суммы.
+        payload = {
+            "cart": packages_fingerprint(self.PACKAGES),
+            "from": 137,
+            "to": 44,
+            "tariff": 136,
+            "delivery_sum": "None",
+        }
+        token = signing.dumps(payload, salt=QUOTE_SALT, compress=True)
+        assert read_quote(token, self.PACKAGES, 137, 44, 136) is None
+
+    def test_expired_quote_rejected(self, settings):
+        settings.DELIVERY_QUOTE_MAX_AGE = -1
+        quote = sign_quote(self.PACKAGES, 137, 44, 136, {"delivery_sum": 1})
+        assert read_quote(quote, self.PACKAGES, 137, 44, 136) is None
+
+    def test_place_order_uses_quote_without_carrier_call(
+        self, client, monkeypatch, settings
+    ):
+        settings.CDEK_FROM_CITY_CODE = 137
+        quote = sign_quote(self.PACKAGES, 137, 44, 136, {"delivery_sum": 200})
+
+        def fail(**kwargs):
+            raise AssertionError("calculate_delivery не должен вызываться")
+
+        monkeypatch.setattr(order_views, "calculate_delivery", fail)
+        response = self._place_order(client, monkeypatch, quote)
+
+        assert response.status_code == 302
+        order = Order.objects.get()
+        # 200 ₽ + 10% с округлением до 10 ₽ вверх.
+        assert order.delivery_cost == 220
+
+    def test_place_order_recalculates_when_quote_does_not_match(
+        self, client, monkeypatch, settings
+    ):
+        settings.CDEK_FROM_CITY_CODE = 137
+        quote = sign_quote(self.PACKAGES, 137, 44, 136, {"delivery_sum": 200})
+        calls = []
+
+        def fake_calculate(**kwargs):
+            calls.append(kwargs["to_city_code"])
+            return {"delivery_sum": 300}
+
+        monkeypatch.setattr(order_views, "calculate_delivery", fake_calculate)
+        self._place_order(client, monkeypatch, quote, city_code=45)
+
+        assert calls == [45]
+        assert Order.objects.get().delivery_cost == 330
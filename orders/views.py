@@ -2,17 +2,20 @@
 Представления заказов: оформление заказа и список заказов.
 """
 import json
-from decimal import Decimal, ROUND_UP
+import logging
+from decimal import Decimal
 
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.shortcuts import redirect, render
+from django.urls import reverse
 from django.views.decorators.http import require_GET, require_http_methods
 
-from cart.utils import get_or_create_cart
+from cart.utils import add_order_items_to_cart, get_or_create_cart
 from cdek.services import (
     calculate_delivery,
     calculate_tarifflist,
@@ -20,12 +23,22 @@ from cdek.services import (
     delivery_sum_to_decimal,
     search_cities,
 )
+from core.circuit_breaker import CircuitOpenError, get_breaker
+from core.http import get_session
 from tbank.client import TbankClient, build_default_urls
 from tbank.utils import build_receipt, make_tbank_order_id
 
 from .forms import CheckoutForm
+from .jobs import enqueue_cdek_registration
 from .models import Order, OrderItem
-from .services import create_cdek_order, get_cdek_tracking_number
+from .quotes import read_quote, sign_quote
+from .services import (
+    adjust_delivery_cost_for_customer,
+    adjust_delivery_period,
+    filter_tariffs_for_response,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def _parse_tariffs_request_payload(request):
@@ -52,122 +65,6 @@ def _parse_tariffs_request_payload(request):
     return mode, point_type, to_city_code, city_name, formatted_address
 
 
-def _is_allowed_tariff_family(name: str) -> bool:
-    """Только тарифы семейства «Посылка» (включая экономичную)."""
-    n = (name or "").lower().strip()
-    return (
-        n.startswith("посылка ")
-        or n == "посылка"
-        or n.startswith("экономичная посылка ")
-    )
-
-
-def _tariff_kind_by_name(name: str) -> str | None:
-    """
-    Классификация тарифа по названию: только отправка из ПВЗ
-    (склад → склад/постамат/дверь). Возвращает office|pickup|door|None.
-    """
-    title = (name or "").lower().replace(" ", " ").strip()
-    normalized = title.replace(" - ", "-").replace(" – ", "-")
-    if not normalized:
-        return None
-    if "дверь-дверь" in normalized or "дверь дверь" in normalized:
-        return None
-    if "дверь-склад" in normalized or "дверь склад" in normalized:
-        return None
-    if "дверь-постамат" in normalized or "дверь постамат" in normalized:
-        return None
-    if "склад-склад" in normalized or "склад - склад" in title:
-        return "office"
-    has_postamat = "склад-постамат" in normalized or (
-        "постамат" in normalized and "склад" in normalized
-    )
-    if has_postamat:
-        return "pickup"
-    if (
-        "склад-двер" in normalized
-        or "до двери" in normalized
-        or "курьер" in normalized
-    ):
-        return "door"
-    return None
-
-
-def _adjust_delivery_cost_for_customer(
-    raw_sum: Decimal | int | float | None
-) -> Decimal:
-    """
-    Увеличивает стоимость доставки на 10%
-    и округляет до 10 рублей в большую сторону.
-    """
-    if raw_sum is None:
-        return Decimal("0")
-    try:
-        value = Decimal(str(raw_sum))
-    except Exception:
-        return Decimal("0")
-    if value <= 0:
-        return Decimal("0")
-    increased = (value * Decimal("1.10")).quantize(
-        Decimal("1"), rounding=ROUND_UP
-    )
-    # Округление вверх до ближайших 10 рублей
-    tens = (
-        (increased + Decimal("9")) // Decimal("10")
-    ) * Decimal("10")
-    return tens
-
-
-def _adjust_delivery_period(value, extra_days: int):
-    """
-    Прибавляет дополнительное число дней к сроку доставки.
-    """
-    if value is None:
-        return None
-    try:
-        return int(value) + extra_days
-    except (TypeError, ValueError):
-        return None
-
-
-def _filter_tariffs_for_response(raw_tariffs, mode: str, point_type: str):
-    """Фильтрует и сортирует тарифы по mode и point_type."""
-    filtered = []
-    for t in raw_tariffs:
-        name_str = str(t.get("tariff_name") or "")
-        if not _is_allowed_tariff_family(name_str):
-            continue
-        kind = _tariff_kind_by_name(name_str)
-        if not kind:
-            continue
-        if mode == "office" and kind != "office":
-            continue
-        if mode == "door" and kind != "door":
-            continue
-        raw_sum = t.get("delivery_sum")
-        adjusted_sum = int(
-            _adjust_delivery_cost_for_customer(raw_sum)
-        ) if raw_sum is not None else 0
-        filtered.append(
-            {
-                "tariff_code": t.get("tariff_code"),
-                "tariff_name": t.get("tariff_name"),
-                "tariff_description": t.get("tariff_description"),
-                "delivery_mode": t.get("delivery_mode"),
-                "period_min": _adjust_delivery_period(
-                    t.get("period_min"), extra_days=1
-                ),
-                "period_max": _adjust_delivery_period(
-                    t.get("period_max"), extra_days=3
-                ),
-                "delivery_sum": adjusted_sum,
-            }
-        )
-
-    filtered.sort(key=lambda x: (x.get("delivery_sum") or 0))
-    return filtered
-
-
 def _process_place_order(request, form, cart, items, products_total):
     """
     Обрабатывает действие «Оформить заказ». Возвращает redirect при успехе
@@ -180,7 +77,15 @@ def _process_place_order(request, form, cart, items, products_total):
     packages = cart_items_to_packages(
         cart.items.select_related("variant__product")
     )
-    result = calculate_delivery(
+    # Цена, показанная покупателю, подтверждается подписанным токеном;
+    # СДЭК вызывается, только если токена нет или он не подходит.
+    result = read_quote(
+        form.cleaned_data.get("delivery_quote"),
+        packages,
+        from_city_code,
+        to_city_code,
+        tariff_code,
+    ) or calculate_delivery(
         from_city_code=from_city_code,
         to_city_code=to_city_code,
         packages=packages,
@@ -195,7 +100,7 @@ def _process_place_order(request, form, cart, items, products_total):
         return None
 
     base_cost = delivery_sum_to_decimal(result)
-    delivery_cost = _adjust_delivery_cost_for_customer(base_cost)
+    delivery_cost = adjust_delivery_cost_for_customer(base_cost)
     delivery_type = (
         Order.DeliveryType.COURIER
         if form.cleaned_data.get("delivery_mode") == "door"
@@ -232,22 +137,13 @@ def _process_place_order(request, form, cart, items, products_total):
         )
     cart.items.all().delete()
 
-    cdek_uuid = create_cdek_order(order)
-    if cdek_uuid:
-        order.cdek_order_uuid = cdek_uuid
-        order.save(update_fields=["cdek_order_uuid"])
-        messages.success(
-            request,
-            f"Заказ #{order.pk} оформлен и зарегистрирован в СДЭК. "
-            f"Итого: {order.total:.0f} ₽.",
-        )
-    else:
-        messages.warning(
-            request,
-            f"Заказ #{order.pk} сохранён, но не удалось зарегистрировать "
-            f"его в СДЭК автоматически. Пожалуйста, свяжитесь с нами — "
-            f"мы оформим доставку вручную. Итого: {order.total:.0f} ₽.",
-        )
+    # Регистрация в СДЭК — фоновой задачей (manage.py run_jobs): покупатель
+    # сразу уходит на оплату, а сбой СДЭК повторяется, а не теряется.
+    enqueue_cdek_registration(order)
+    messages.success(
+        request,
+        f"Заказ #{order.pk} оформлен. Итого: {order.total:.0f} ₽.",
+    )
 
     # Инициация оплаты в T‑Банке и редирект на платёжную форму.
     # Используем уникальный OrderId (pk + timestamp), так как T‑Банк требует
@@ -272,6 +168,7 @@ def _process_place_order(request, form, cart, items, products_total):
             receipt=build_receipt(order),
         )
     except Exception:
+        logger.exception("T-Bank init_payment failed, order %s", order.pk)
         messages.error(
             request,
             "Заказ сохранён, но не удалось инициировать оплату в T‑Банке. "
@@ -296,6 +193,7 @@ def _get_checkout_context(request, cart, items, products_total):
     delivery_cost = None
     delivery_period_min = None
     delivery_period_max = None
+    delivery_quote = ""
     form = CheckoutForm(request.POST or None, user=request.user)
 
     if request.method == "POST":
@@ -317,14 +215,21 @@ def _get_checkout_context(request, cart, items, products_total):
                     tariff_code=tariff_code,
                 )
                 if result:
+                    delivery_quote = sign_quote(
+                        packages,
+                        from_city_code,
+                        to_city_code,
+                        tariff_code,
+                        result,
+                    )
                     base_cost = delivery_sum_to_decimal(result)
-                    delivery_cost = _adjust_delivery_cost_for_customer(
+                    delivery_cost = adjust_delivery_cost_for_customer(
                         base_cost
                     )
-                    delivery_period_min = _adjust_delivery_period(
+                    delivery_period_min = adjust_delivery_period(
                         result.get("period_min"), extra_days=1
                     )
-                    delivery_period_max = _adjust_delivery_period(
+                    delivery_period_max = adjust_delivery_period(
                         result.get("period_max"), extra_days=3
                     )
                 else:
@@ -348,7 +253,7 @@ def _get_checkout_context(request, cart, items, products_total):
                 )
 
     total = products_total + (delivery_cost or Decimal("0"))
-    cdek_service_url = request.build_absolute_uri("/service.php")
+    cdek_service_url = request.build_absolute_uri(reverse("cdek:offices"))
     yandex_key = getattr(settings, "YANDEX_MAPS_API_KEY", "") or ""
     context = {
         "form": form,
@@ -356,6 +261,7 @@ def _get_checkout_context(request, cart, items, products_total):
         "delivery_cost": delivery_cost,
         "delivery_period_min": delivery_period_min,
         "delivery_period_max": delivery_period_max,
+        "delivery_quote": delivery_quote,
         "total": total,
         "cdek_service_url": cdek_service_url,
         "yandex_maps_api_key": yandex_key,
@@ -408,13 +314,13 @@ def checkout_success(request, order_id):
         order.save(update_fields=["email_paid_sent"])
 
     # Трек-номер СДЭК показываем только после передачи заказа в доставку.
+    # Номер берётся из заказа (sync_cdek_order_statuses), без запроса к СДЭК.
     cdek_tracking_number = None
     if (
         order.status in (Order.Status.IN_DELIVERY, Order.Status.DELIVERED)
         and order.delivery_method == Order.DeliveryMethod.CDEK
-        and order.cdek_order_uuid
     ):
-        cdek_tracking_number = get_cdek_tracking_number(order)
+        cdek_tracking_number = order.cdek_tracking_number or None
     return render(
         request,
         "orders/checkout_success.html",
@@ -427,12 +333,12 @@ def checkout_success(request, order_id):
 
 
 @require_GET
-def checkout_cities(request):
+async def checkout_cities(request):
     """API: список городов СДЭК для автодополнения (GET ?q=...)."""
     q = (request.GET.get("q") or "").strip()
     if len(q) < 2:
         return JsonResponse({"cities": []})
-    cities = search_cities(q, limit=30)
+    cities = await sync_to_async(search_cities)(q, limit=30)
     return JsonResponse({"cities": cities})
 
 
@@ -470,8 +376,13 @@ def _dadata_post_suggest(
     payload: dict = {"query": f"{city}, {q}", "count": 10}
     if locations_boost is not None:
         payload["locations_boost"] = locations_boost
-    resp = requests.post(url, json=payload, headers=headers, timeout=5)
-    resp.raise_for_status()
+    # Подсказки только читают данные — POST можно повторять при сбоях.
+    session = get_session(url, idempotent_post_prefixes=("/",))
+    with get_breaker("dadata").guard():
+        resp = session.post(
+            url, json=payload, headers=headers, timeout=(2, 5)
+        )
+        resp.raise_for_status()
     return resp.json()
 
 
@@ -499,7 +410,7 @@ def _dadata_address_suggest(city: str, q: str) -> tuple[list[dict], int]:
         data = _dadata_post_suggest(
             city, q, _DADATA_SUGGEST_URL, headers, boost
         )
-    except (requests.RequestException, ValueError):
+    except (requests.RequestException, CircuitOpenError, ValueError):
         return [], 0
     raw = _dadata_suggestions_list_from_response(data)
     if not raw:
@@ -508,7 +419,7 @@ def _dadata_address_suggest(city: str, q: str) -> tuple[list[dict], int]:
                 city, q, _DADATA_SUGGEST_URL, headers, None
             )
             raw = _dadata_suggestions_list_from_response(data)
-        except (requests.RequestException, ValueError):
+        except (requests.RequestException, CircuitOpenError, ValueError):
             raw = []
     result = _dadata_items_to_suggestions(raw)
     return result, len(raw)
@@ -516,10 +427,11 @@ def _dadata_address_suggest(city: str, q: str) -> tuple[list[dict], int]:
 
 @login_required
 @require_GET
-def checkout_address_suggest(request):
+async def checkout_address_suggest(request):
     """
     API: подсказки адреса в выбранном городе (DaData).
     GET ?city=...&q=... — возвращает нормализованные адреса для выбора.
+    Запрос к DaData выполняется вне цикла событий и не занимает воркер.
     """
     city = (request.GET.get("city") or "").strip()
     q = (request.GET.get("q") or "").strip()
@@ -527,7 +439,9 @@ def checkout_address_suggest(request):
         return JsonResponse({"suggestions": []})
     if not getattr(settings, "DADATA_API_KEY", "").strip():
         return JsonResponse({"suggestions": []})
-    suggestions, dadata_raw_count = _dadata_address_suggest(city, q)
+    suggestions, dadata_raw_count = await sync_to_async(
+        _dadata_address_suggest, thread_sensitive=False
+    )(city, q)
     out = {"suggestions": suggestions}
     if settings.DEBUG:
         out["_debug"] = {
@@ -537,18 +451,27 @@ def checkout_address_suggest(request):
     return JsonResponse(out)
 
 
+def _cart_packages(request):
+    """Грузовые места по корзине пользователя (пустой список — нет товаров)."""
+    cart = get_or_create_cart(request)
+    return cart_items_to_packages(
+        cart.items.select_related("variant__product")
+    )
+
+
 @login_required
 @require_http_methods(["POST"])
-def checkout_tariffs(request):
+async def checkout_tariffs(request):
     """
     API: список тарифов СДЭК по выбранному адресу / ПВЗ.
 
     Принимает JSON: mode (office|door), city_code, city, point_type.
-    Возвращает JSON: {"tariffs": [...]}.
+    Возвращает JSON: {"tariffs": [...]}; у каждого тарифа есть quote —
+    подписанная котировка, которую форма передаёт при оформлении заказа.
+    Запрос к СДЭК выполняется вне цикла событий и не занимает воркер.
     """
-    cart = get_or_create_cart(request)
-    items = cart.items.select_related("variant__product")
-    if not items.exists():
+    packages = await sync_to_async(_cart_packages)(request)
+    if not packages:
         return JsonResponse({"tariffs": []})
 
     mode, point_type, to_city_code, city_name, formatted_address = (
@@ -562,20 +485,32 @@ def checkout_tariffs(request):
     # Только СДЭК: город задаётся выбором из справочника (шаг 1 в форме).
     # Для ПВЗ city_code приходит из виджета; для «до двери» — из поля города.
     if not to_city_code and city_name:
-        matches = search_cities(city_name, limit=1)
+        matches = await sync_to_async(search_cities)(city_name, limit=1)
         if matches:
             to_city_code = matches[0].get("code")
     if not to_city_code:
         return JsonResponse({"tariffs": []})
 
     from_city_code = getattr(settings, "CDEK_FROM_CITY_CODE", 137)
-    packages = cart_items_to_packages(items)
-    raw_tariffs = calculate_tarifflist(
+    raw_tariffs = await sync_to_async(
+        calculate_tarifflist, thread_sensitive=False
+    )(
         from_city_code=from_city_code,
         to_city_code=to_city_code,
         packages=packages,
     )
-    filtered = _filter_tariffs_for_response(raw_tariffs, mode, point_type)
+    filtered = filter_tariffs_for_response(raw_tariffs, mode, point_type)
+    raw_by_code = {t.get("tariff_code"): t for t in raw_tariffs}
+    for tariff in filtered:
+        if tariff["tariff_code"] not in raw_by_code:
+            continue
+        tariff["quote"] = sign_quote(
+            packages,
+            from_city_code,
+            to_city_code,
+            tariff["tariff_code"],
+            raw_by_code[tariff["tariff_code"]],
+        )
     response_data = {"tariffs": filtered}
     if to_city_code is not None:
         response_data["city_code"] = to_city_code
@@ -594,21 +529,14 @@ def repeat_order_view(request, order_id):
     """Повторить заказ:
     добавить товары заказа в корзину и перейти в корзину.
     """
-    order = Order.objects.filter(
-        user=request.user,
-        pk=order_id,
-    ).first()
-    if not order:
+    if not Order.objects.filter(user=request.user, pk=order_id).exists():
         messages.warning(request, "Заказ не найден.")
         return redirect("accounts:profile")
     cart = get_or_create_cart(request)
-    for item in order.items.select_related("variant"):
-        cart_item, created = cart.items.get_or_create(
-            variant=item.variant,
-            defaults={"quantity": item.quantity},
+    if add_order_items_to_cart(cart, order_id):
+        messages.success(request, "Товары заказа добавлены в корзину.")
+    else:
+        messages.warning(
+            request, "Товары из этого заказа больше не продаются."
         )
-        if not created:
-            cart_item.quantity += item.quantity
-            cart_item.save(update_fields=["quantity"])
-    messages.success(request, "Товары заказа добавлены в корзину.")
     return redirect("cart:detail")
@@ -12,10 +12,15 @@ import requests
 from django.conf import settings
 from django.urls import reverse
 
+from core.circuit_breaker import CircuitOpenError, get_breaker
+from core.http import get_session
+
 from .utils import build_token
 
 logger = logging.getLogger(__name__)
 
+CONNECT_TIMEOUT = 3.05
+
 
 class TbankAPIError(Exception):
     """Ошибка вызова API T‑Банка."""
@@ -54,6 +59,8 @@ class TbankClient:
             "https://securepay.tinkoff.ru",
         )
         self.timeout: int = int(getattr(settings, "TBANK_TIMEOUT", 15))
+        # POST не повторяется: Init и Cancel не идемпотентны.
+        self._session = get_session(self.base_url)
 
         if not self.terminal_key:
             raise TbankAPIError("Не задан TBANK_TERMINAL_KEY в настройках")
@@ -76,14 +83,18 @@ class TbankClient:
     ) -> dict[str, Any]:
         """Выполняет POST-запрос и возвращает тело ответа в виде словаря."""
         try:
-            response = requests.post(
-                self._url(path),
-                json=payload,
-                headers=self._headers(),
-                timeout=self.timeout,
-            )
-            response.raise_for_status()
+            with get_breaker("tbank").guard():
+                response = self._session.post(
+                    self._url(path),
+                    json=payload,
+                    headers=self._headers(),
+                    timeout=(CONNECT_TIMEOUT, self.timeout),
+                )
+                response.raise_for_status()
             return response.json()
+        except CircuitOpenError as exc:
+            logger.warning("%s: %s", error_message, exc)
+            raise TbankAPIError(error_message) from exc
         except requests.RequestException as exc:
             logger.exception("%s: %s", error_message, exc)
             raise TbankAPIError(
@@ -141,7 +141,7 @@ def test_make_and_parse_roundtrip():
     assert recovered == str(pk)
 
 
-@mock.patch("tbank.client.requests.post")
+@mock.patch("requests.Session.post")
 def test_tbank_client_init_payment_success(mock_post, settings):
     """Клиент корректно формирует запрос и возвращает PaymentURL."""
     settings.TBANK_TERMINAL_KEY = "123456"
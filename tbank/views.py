@@ -7,6 +7,7 @@ import json
 import logging
 from typing import Any
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -161,15 +162,37 @@ def _apply_notification(
         order.save(update_fields=update_fields)
 
 
+def _process_notification(payload: dict[str, Any]) -> None:
+    """Находит заказ по OrderId и применяет уведомление (БД и письмо)."""
+    raw_order_id = str(payload.get("OrderId") or "").strip()
+    if not raw_order_id:
+        logger.warning("T‑Bank notification without OrderId: %s", payload)
+        return
+
+    order_pk = parse_order_pk_from_tbank_id(raw_order_id)
+    try:
+        order = Order.objects.get(pk=order_pk)
+    except (Order.DoesNotExist, ValueError):
+        return
+
+    _apply_notification(
+        order,
+        success_flag=str(payload.get("Success") or "").lower() == "true",
+        status=str(payload.get("Status") or "").upper(),
+        payment_id=str(payload.get("PaymentId") or "").strip(),
+    )
+
+
 @csrf_exempt
 @require_POST
-def notification_view(request: HttpRequest) -> HttpResponse:
+async def notification_view(request: HttpRequest) -> HttpResponse:
     """
     Обработчик HTTP(S)-уведомлений T‑Банка (NotificationURL).
 
     Согласно документации:
     https://developer.tbank.ru/eacq/intro/developer/notification
     необходимо вернуть HTTP 200 OK c телом "OK" при успешной обработке.
+    Работа с БД и отправка письма об оплате выполняются вне цикла событий.
     """
     _OK = HttpResponse("OK")
 
@@ -193,21 +216,5 @@ def notification_view(request: HttpRequest) -> HttpResponse:
         )
         return _OK
 
-    raw_order_id = str(payload.get("OrderId") or "").strip()
-    if not raw_order_id:
-        logger.warning("T‑Bank notification without OrderId: %s", payload)
-        return _OK
-
-    order_pk = parse_order_pk_from_tbank_id(raw_order_id)
-    try:
-        order = Order.objects.get(pk=order_pk)
-    except (Order.DoesNotExist, ValueError):
-        return _OK
-
-    _apply_notification(
-        order,
-        success_flag=str(payload.get("Success") or "").lower() == "true",
-        status=str(payload.get("Status") or "").upper(),
-        payment_id=str(payload.get("PaymentId") or "").strip(),
-    )
+    await sync_to_async(_process_notification)(payload)
     return _OK